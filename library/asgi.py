@@ -14,3 +14,7 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'library.settings')
 
 application = get_asgi_application()
+
+# Build this worker's typeahead index now rather than on the first keystroke
+from library.suggest import suggester  # noqa: E402
+suggester.warm_up()
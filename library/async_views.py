@@ -0,0 +1,125 @@
+"""
+Native async versions of the read-heavy API views, for ASGI deployments.
+
+They answer the same URLs with the same payloads as their DRF counterparts
+but use the async ORM, so under uvicorn a worker can keep thousands of
+catalog and search requests in flight instead of one per thread. They
+replace the sync routes when ASYNC_READ_VIEWS is on (see library.urls).
+"""
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.urls import path
+from django.utils.cache import get_conditional_response
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import AuthenticationFailed, ParseError
+from rest_framework.request import Request
+from rest_framework.utils.encoders import JSONEncoder
+
+from . import facets
+from .authentication import SignedTokenAuthentication
+from .conditional import finish, make_etag
+from .models import Book
+from .pagination import KeysetPagination, RankedPagination
+from .serializers import BookSerializer, UserSerializer
+from .views import BookViewSet, category_filter, search_in_categories
+
+NOT_AUTHENTICATED = {'detail': 'Authentication credentials were not provided.'}
+
+
+def _json(data, status=200):
+    return JsonResponse(data, status=status, safe=False, encoder=JSONEncoder)
+
+
+async def authenticated_user(request):
+    """
+    Resolve the request's user without blocking; None if anonymous.
+
+    Checks the session first and then a Bearer token, like
+    DEFAULT_AUTHENTICATION_CLASSES. Raises AuthenticationFailed for a bad token.
+    """
+    user = await request.auser()
+    if user.is_authenticated:
+        return user
+    result = await sync_to_async(SignedTokenAuthentication().authenticate)(request)
+    return result[0] if result else None
+
+
+async def _require_user(request):
+    """(user, None) when authenticated, otherwise (None, error response)"""
+    try:
+        user = await authenticated_user(request)
+    except AuthenticationFailed as exc:
+        return None, _json({'detail': exc.detail}, status=403)
+    if user is None:
+        return None, _json(NOT_AUTHENTICATED, status=403)
+    return user, None
+
+
+_sync_book_list = BookViewSet.as_view({'get': 'list', 'post': 'create'})
+
+
+@csrf_exempt  # Like DRF views: SessionAuthentication enforces CSRF itself
+async def book_list(request):
+    if request.method != 'GET':
+        return await sync_to_async(_sync_book_list)(request)
+    user, error = await _require_user(request)
+    if error:
+        return error
+
+    drf_request = Request(request)
+    try:
+        category_ids = category_filter(drf_request)
+    except ParseError as exc:
+        return _json({'detail': exc.detail}, status=400)
+    books = Book.objects.all()
+    if category_ids:
+        books = facets.filter_books(books, category_ids)
+    paginator = KeysetPagination()
+    rows = await paginator.apaginate_queryset(books.values(*BookViewSet.validator_fields), drf_request)
+    etag = make_etag(request, [tuple(row.values()) for row in rows], paginator.has_next, paginator.has_previous)
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return finish(not_modified, etag)
+
+    queryset = BookSerializer.sparse_queryset(Book.objects.prefetch_related('categories'), drf_request)
+    books = await queryset.ain_bulk([row['id'] for row in rows])
+    page = [books[row['id']] for row in rows if row['id'] in books]
+    serializer = BookSerializer(page, many=True, context={'request': drf_request})
+    return finish(_json(paginator.get_paginated_response(serializer.data).data), etag)
+
+
+async def search(request):
+    if request.method != 'GET':
+        return _json({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return _json({'error': 'Search query is required'}, status=400)
+
+    drf_request = Request(request)
+    try:
+        category_ids = category_filter(drf_request)
+    except ParseError as exc:
+        return _json({'detail': exc.detail}, status=400)
+    ranked_ids = await sync_to_async(search_in_categories)(query, category_ids)
+    paginator = RankedPagination()
+    page_ids = paginator.paginate_list(ranked_ids, drf_request)
+    books = await Book.objects.prefetch_related('categories').ain_bulk(page_ids)
+    page = [books[book_id] for book_id in page_ids if book_id in books]
+    serializer = BookSerializer(page, many=True, context={'request': drf_request})
+    return _json(paginator.get_paginated_response(serializer.data).data)
+
+
+async def current_user(request):
+    if request.method != 'GET':
+        return _json({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+    user, error = await _require_user(request)
+    if error:
+        return error
+    return _json(UserSerializer(user).data)
+
+
+async_urlpatterns = [
+    path('api/books/', book_list, name='async-book-list'),
+    path('api/search/', search, name='async-search'),
+    path('api/user/me/', current_user, name='async-current-user'),
+]
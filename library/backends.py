@@ -1,8 +1,91 @@
+import copy
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
 from django.contrib.auth.backends import BaseBackend
 from django.contrib.auth import get_user_model
+from django.core.cache import caches
 
 User = get_user_model()
 
+# Cache backends whose contents other worker processes cannot see
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+class UserCache:
+    """
+    Per-process LRU of users by pk, used for session authentication.
+
+    Each entry remembers the user's version in the ``alias`` cache when it
+    was loaded. Saving or deleting a user bumps that version (see
+    library.signals) and drops this process's copy. Other workers only see
+    the new version when ``alias`` is a cache they share. Entries expire
+    after ``timeout`` seconds in case the version key is evicted. With a
+    per-process cache they expire after ``local_timeout`` instead, which
+    bounds how long other workers keep serving a stale user.
+    """
+
+    def __init__(self, max_size, timeout, alias, local_timeout=0):
+        self.max_size = max_size
+        self.alias = alias
+        self.shared = settings.CACHES[alias]['BACKEND'] not in PROCESS_LOCAL_CACHES
+        self.timeout = timeout if self.shared else min(timeout, local_timeout)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _version_key(user_id):
+        return f'library:user-version:{user_id}'
+
+    def _version(self, user_id):
+        return caches[self.alias].get(self._version_key(user_id))
+
+    def get(self, user_id):
+        version = self._version(user_id)
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                user, loaded_version, loaded_at = entry
+                if loaded_version == version and time.monotonic() - loaded_at < self.timeout:
+                    self._entries.move_to_end(user_id)
+                    # Callers may modify request.user; never hand out the shared instance
+                    return copy.copy(user)
+                del self._entries[user_id]
+
+        user = User.objects.filter(pk=user_id).first()
+        if user is None:
+            return None
+        with self._lock:
+            self._entries[user_id] = (user, version, time.monotonic())
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return copy.copy(user)
+
+    def invalidate(self, user_id):
+        caches[self.alias].set(self._version_key(user_id), uuid.uuid4().hex, None)
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache(
+    settings.AUTH_USER_CACHE_SIZE,
+    settings.AUTH_USER_CACHE_TIMEOUT,
+    settings.AUTH_USER_CACHE_ALIAS,
+    getattr(settings, 'AUTH_USER_CACHE_LOCAL_TIMEOUT', 0),
+)
+
+
 class EmailBackend(BaseBackend):
     def authenticate(self, request, email=None, password=None, **kwargs):
         try:
@@ -14,6 +97,6 @@ class EmailBackend(BaseBackend):
 
     def get_user(self, user_id):
         try:
-            return User.objects.get(pk=user_id)
-        except User.DoesNotExist:
-            return None
\ No newline at end of file
+            return user_cache.get(int(user_id))
+        except (TypeError, ValueError):
+            return None
@@ -0,0 +1,79 @@
+"""
+Cache of rendered BookSerializer payloads.
+
+Entries are keyed by (book id, updated_at, active_loans, scheme and host,
+field set), so any change that affects the payload produces a new key and
+stale entries simply age out of the cache. Book saves and borrow/return
+bump updated_at (active_loans stays in the key for changes that share a
+timestamp), and category m2m changes and category deletes bump updated_at
+from signal handlers. The scheme is part of the key
+because payloads hold absolute cover URLs.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+
+HITS_KEY = 'library:book-cache:hits'
+MISSES_KEY = 'library:book-cache:misses'
+
+
+class SerializedBookCache:
+    def __init__(self, alias='default', timeout=None):
+        self.alias = alias
+        self.timeout = timeout
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def key(self, book, host='', variant=''):
+        return f'library:book:{book.pk}:{book.updated_at.timestamp()}:{book.active_loans}:{host}:{variant}'
+
+    def render_many(self, books, serializer):
+        """Return serializer.to_representation() for each book, reusing cached payloads"""
+        request = serializer.context.get('request')
+        host = f'{request.scheme}://{request.get_host()}' if request is not None else ''
+        # Sparse fieldsets (?fields=/?omit=) render different payloads for the same book
+        variant = hashlib.md5(','.join(serializer.fields).encode()).hexdigest()[:8]
+        keys = [self.key(book, host, variant) for book in books]
+        cached = self.cache.get_many(keys)
+
+        missing = {}
+        rendered = []
+        for key, book in zip(keys, books):
+            if key in cached:
+                rendered.append(cached[key])
+            else:
+                data = serializer.to_representation(book)
+                missing[key] = data
+                rendered.append(data)
+        if missing:
+            self.cache.set_many(missing, self.timeout)
+        self._record(len(keys) - len(missing), len(missing))
+        return rendered
+
+    def _record(self, hits, misses):
+        for key, delta in ((HITS_KEY, hits), (MISSES_KEY, misses)):
+            if delta:
+                self.cache.add(key, 0, None)
+                self.cache.incr(key, delta)
+
+    def stats(self):
+        counts = self.cache.get_many([HITS_KEY, MISSES_KEY])
+        hits, misses = counts.get(HITS_KEY, 0), counts.get(MISSES_KEY, 0)
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / total if total else None,
+        }
+
+    def reset_stats(self):
+        self.cache.delete_many([HITS_KEY, MISSES_KEY])
+
+
+book_cache = SerializedBookCache(
+    alias=getattr(settings, 'BOOK_CACHE_ALIAS', 'default'),
+    timeout=getattr(settings, 'BOOK_CACHE_TIMEOUT', 3600),
+)
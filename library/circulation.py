@@ -0,0 +1,164 @@
+"""
+Borrow and return transactions.
+
+Book.active_loans is the single source of truth for how many copies are out.
+Every change to it goes through this module or BorrowedBook.return_book(),
+and always as a conditional UPDATE, so concurrent requests can never lend
+more copies than Book.number_of_copies. Each change bumps Book.updated_at
+so incremental exports pick up the new count, reports to
+facets.loans_moved() so the per-category available counts follow, and
+appends to the loan history (loan_history.record) in the same transaction.
+"""
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import facets, loan_history, recommendations
+from .models import Book, BorrowedBook, LoanEvent
+
+BORROW_LIMIT = 6
+
+
+class CirculationError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def borrow_book(user, book_id):
+    """Lend one copy of a book to user and return the active BorrowedBook"""
+    with transaction.atomic():
+        # Serialize concurrent borrows by the same user so the limit holds
+        # (a no-op on SQLite, where IMMEDIATE transactions already serialize writers)
+        get_user_model().objects.select_for_update().filter(pk=user.pk).first()
+
+        if BorrowedBook.objects.filter(user=user, returned=False).count() >= BORROW_LIMIT:
+            raise CirculationError('Borrow limit reached. Return some books first.')
+
+        claimed = Book.objects.filter(pk=book_id, active_loans__lt=F('number_of_copies')).update(
+            active_loans=F('active_loans') + 1, updated_at=timezone.now()
+        )
+        if not claimed:
+            if not Book.objects.filter(pk=book_id).exists():
+                raise CirculationError('Book not found.', status=404)
+            raise CirculationError('No copies available for this book.')
+        facets.loans_moved([book_id], 1)
+
+        reopened = BorrowedBook.objects.filter(user=user, book_id=book_id, returned=True).update(
+            returned=False, return_date=None, borrow_date=timezone.now().date()
+        )
+        if not reopened:
+            try:
+                with transaction.atomic():
+                    BorrowedBook.objects.create(user=user, book_id=book_id)
+            except IntegrityError:
+                raise CirculationError('You already borrowed this book.')
+        loan_history.record(LoanEvent.BORROW, user.pk, [book_id])
+
+    return BorrowedBook.objects.select_related('book').get(user=user, book_id=book_id)
+
+
+def return_book(user, book_id):
+    """Close the user's active loan of a book and return it"""
+    try:
+        borrowed_book = BorrowedBook.objects.select_related('book').get(
+            user=user, book_id=book_id, returned=False
+        )
+    except BorrowedBook.DoesNotExist:
+        raise CirculationError('No borrowed book found to return.', status=404)
+    if not borrowed_book.return_book():
+        raise CirculationError('No borrowed book found to return.', status=404)
+    return borrowed_book
+
+
+def _unique_ids(book_ids):
+    return list(dict.fromkeys(int(book_id) for book_id in book_ids))
+
+
+def borrow_books(user, book_ids):
+    """
+    Borrow several books in one transaction with a handful of set-based queries.
+    Returns {book_id: BorrowedBook or CirculationError} in request order.
+    """
+    book_ids = _unique_ids(book_ids)
+    results = {}
+    with transaction.atomic():
+        get_user_model().objects.select_for_update().filter(pk=user.pk).first()
+        remaining = BORROW_LIMIT - BorrowedBook.objects.filter(user=user, returned=False).count()
+
+        books = {
+            row['id']: row
+            for row in Book.objects.select_for_update()
+            .filter(pk__in=book_ids)
+            .values('id', 'number_of_copies', 'active_loans')
+        }
+        loans = dict(
+            BorrowedBook.objects.filter(user=user, book_id__in=book_ids).values_list('book_id', 'returned')
+        )
+
+        claimed = []
+        for book_id in book_ids:
+            book = books.get(book_id)
+            if book is None:
+                results[book_id] = CirculationError('Book not found.', status=404)
+            elif loans.get(book_id) is False:
+                results[book_id] = CirculationError('You already borrowed this book.')
+            elif book['active_loans'] >= book['number_of_copies']:
+                results[book_id] = CirculationError('No copies available for this book.')
+            elif remaining <= 0:
+                results[book_id] = CirculationError('Borrow limit reached. Return some books first.')
+            else:
+                claimed.append(book_id)
+                remaining -= 1
+
+        if claimed:
+            Book.objects.filter(pk__in=claimed).update(
+                active_loans=F('active_loans') + 1, updated_at=timezone.now()
+            )
+            facets.loans_moved(claimed, 1)
+            reopen = [book_id for book_id in claimed if book_id in loans]
+            BorrowedBook.objects.filter(user=user, book_id__in=reopen).update(
+                returned=False, return_date=None, borrow_date=timezone.now().date()
+            )
+            first_loans = [book_id for book_id in claimed if book_id not in loans]
+            BorrowedBook.objects.bulk_create(BorrowedBook(user=user, book_id=book_id) for book_id in first_loans)
+            recommendations.interactions_added(user.pk, first_loans)  # bulk_create sends no post_save
+            loan_history.record(LoanEvent.BORROW, user.pk, claimed)
+
+    for loan in BorrowedBook.objects.select_related('book').filter(user=user, book_id__in=claimed):
+        results[loan.book_id] = loan
+    return {book_id: results[book_id] for book_id in book_ids}
+
+
+def return_books(user, book_ids):
+    """
+    Return several books in one transaction.
+    Returns {book_id: BorrowedBook or CirculationError} in request order.
+    """
+    book_ids = _unique_ids(book_ids)
+    with transaction.atomic():
+        closable = list(
+            BorrowedBook.objects.select_for_update()
+            .filter(user=user, book_id__in=book_ids, returned=False)
+            .values_list('book_id', flat=True)
+        )
+        if closable:
+            BorrowedBook.objects.filter(user=user, book_id__in=closable).update(
+                returned=True, return_date=timezone.now().date()
+            )
+            Book.objects.filter(pk__in=closable).update(
+                active_loans=F('active_loans') - 1, updated_at=timezone.now()
+            )
+            facets.loans_moved(closable, -1)
+            loan_history.record(LoanEvent.RETURN, user.pk, closable)
+
+    loans = {
+        loan.book_id: loan
+        for loan in BorrowedBook.objects.select_related('book').filter(user=user, book_id__in=closable)
+    }
+    return {
+        book_id: loans.get(book_id) or CirculationError('No borrowed book found to return.', status=404)
+        for book_id in book_ids
+    }
@@ -0,0 +1,78 @@
+"""
+Conditional GET for catalog endpoints.
+
+List pages and detail responses carry a weak ETag. It is a hash of a narrow
+``values()`` query over the rows they would render: ids, updated_at and, for
+books, active_loans, so borrowing and returning change it too. A matching
+If-None-Match is answered with 304 before the full rows are loaded or a
+serializer runs.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+
+def make_etag(request, rows, *extra):
+    """Weak ETag for a response built from ``rows`` (tuples of validator values)"""
+    digest = hashlib.sha1()
+    # Scheme, host and query string shape the payload too (absolute links, cursors, filters)
+    digest.update(request.build_absolute_uri().encode())
+    for part in (*rows, *extra):
+        digest.update(repr(part).encode())
+    return f'W/"{digest.hexdigest()}"'
+
+
+def finish(response, etag):
+    response['ETag'] = etag
+    # Let browsers keep the body but revalidate on every poll
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    For ModelViewSets: list() and retrieve() answer If-None-Match first.
+
+    ``validator_fields`` must cover everything the representation depends on
+    besides the URL (updated_at plus any counters that change without it).
+    Object-level permissions are not checked on a 304, so only use this on
+    views that have none.
+    """
+    validator_fields = ('id', 'updated_at')
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_page(self.filter_queryset(self.get_queryset()))
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = (
+            self.filter_queryset(self.get_queryset())
+            .filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+            .values_list(*self.validator_fields)
+            .first()
+        )
+        if row is None:
+            return super().retrieve(request, *args, **kwargs)  # The usual 404
+        etag = make_etag(request, [row])
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return finish(not_modified, etag)
+        return finish(super().retrieve(request, *args, **kwargs), etag)
+
+    def conditional_page(self, queryset):
+        """Paginated list whose page ETag is computed before any object is loaded"""
+        paginator = self.paginator
+        rows = paginator.paginate_queryset(
+            queryset.prefetch_related(None).values(*self.validator_fields), self.request, view=self
+        )
+        etag = make_etag(
+            self.request, [tuple(row.values()) for row in rows], paginator.has_next, paginator.has_previous
+        )
+        not_modified = get_conditional_response(self.request, etag=etag)
+        if not_modified is not None:
+            return finish(not_modified, etag)
+
+        objects = queryset.in_bulk([row['id'] for row in rows])
+        page = [objects[row['id']] for row in rows if row['id'] in objects]
+        serializer = self.get_serializer(page, many=True)
+        return finish(paginator.get_paginated_response(serializer.data), etag)
@@ -0,0 +1,159 @@
+"""
+Per-category facet counts for catalog browsing.
+
+Category.book_count and Category.available_book_count describe the whole
+catalog. They are kept current incrementally, so the unfiltered facet list
+is a plain read of the category table:
+
+* category links added or removed: ``links_changed`` (m2m_changed handler)
+* a book deleted: ``links_changed`` with its categories (pre_delete handler)
+* a book's last copy lent out or first copy returned: ``loans_moved``
+  (library.circulation) or ``availability_changed`` (copy count edits)
+* bulk imports that skip signals: ``books_added``
+
+``recount()`` rebuilds both columns from scratch. Facets of a filtered or
+searched result set are counted over the through table, restricted to the
+result's book ids (see ``for_books``).
+"""
+from collections import Counter, defaultdict
+
+from django.db.models import Count, F, Q
+from django.db.models.expressions import Col
+
+from .models import Book, Category
+from .pagination import KEY_ALIAS
+
+Through = Book.categories.through
+
+
+def parse_category_ids(value):
+    """``"3"`` or ``"3,5"`` -> [3, 5]; raises ValueError on anything else"""
+    ids = [int(part) for part in value.split(',') if part.strip()]
+    if not ids:
+        raise ValueError(value)
+    return list(dict.fromkeys(ids))
+
+
+class LinkedBookId(F):
+    """The through table's book_id on the query's existing categories join"""
+
+    def __init__(self):
+        super().__init__('categories')
+
+    def resolve_expression(self, *args, **kwargs):
+        category_id = super().resolve_expression(*args, **kwargs)  # Through.category_id, join reused
+        return Col(category_id.alias, Through._meta.get_field('book'))
+
+
+def filter_books(queryset, category_ids):
+    """Books in any of the categories, as a join on the through table's (category_id, book_id) index"""
+    if len(category_ids) == 1:
+        # A book is linked to a category at most once, so the join cannot duplicate rows.
+        # Keyset pages order by the through table's book_id: SQLite cannot tell it
+        # equals book.id, and ordering by book.id sorts the whole category per page.
+        return queryset.filter(categories=category_ids[0]).alias(**{KEY_ALIAS: LinkedBookId()})
+    return queryset.filter(pk__in=Through.objects.filter(category_id__in=category_ids).values('book_id'))
+
+
+def _apply(book_deltas, available_deltas):
+    """Move the counters of several categories, one UPDATE per distinct pair of deltas"""
+    grouped = defaultdict(list)
+    for category_id in set(book_deltas) | set(available_deltas):
+        delta = (book_deltas.get(category_id, 0), available_deltas.get(category_id, 0))
+        if delta != (0, 0):
+            grouped[delta].append(category_id)
+    for (books, available), category_ids in grouped.items():
+        Category.objects.filter(pk__in=category_ids).update(
+            book_count=F('book_count') + books,
+            available_book_count=F('available_book_count') + available,
+        )
+
+
+def links_changed(book_ids, category_ids, sign):
+    """Every book in book_ids was linked to (sign=1) or unlinked from (sign=-1) every category"""
+    book_ids, category_ids = list(book_ids), list(category_ids)
+    if not book_ids or not category_ids:
+        return
+    available = Book.objects.filter(pk__in=book_ids).available().count()
+    _apply(
+        {category_id: sign * len(book_ids) for category_id in category_ids},
+        {category_id: sign * available for category_id in category_ids},
+    )
+
+
+def availability_changed(book_ids, sign):
+    """The books became available (sign=1) or unavailable (sign=-1)"""
+    if not book_ids:
+        return
+    per_category = (
+        Through.objects.filter(book_id__in=book_ids)
+        .values('category_id').annotate(n=Count('id')).values_list('category_id', 'n')
+    )
+    _apply({}, {category_id: sign * n for category_id, n in per_category})
+
+
+def loans_moved(book_ids, delta):
+    """
+    Call in the same transaction after active_loans of each book moved by
+    delta (1 = lent out, -1 = returned). Only books that crossed the
+    available/unavailable line touch the counters.
+    """
+    rows = Book.objects.filter(pk__in=list(book_ids)).values_list('id', 'number_of_copies', 'active_loans')
+    if delta > 0:
+        crossed = [pk for pk, copies, loans in rows if loans == copies]  # The last copy just went out
+    else:
+        crossed = [pk for pk, copies, loans in rows if loans == copies - 1]  # The first copy came back
+    availability_changed(crossed, -delta)
+
+
+def books_added(links, available_book_ids):
+    """Count freshly inserted books; links is an iterable of (book_id, category_id)"""
+    available_book_ids = set(available_book_ids)
+    book_deltas, available_deltas = Counter(), Counter()
+    for book_id, category_id in links:
+        book_deltas[category_id] += 1
+        if book_id in available_book_ids:
+            available_deltas[category_id] += 1
+    _apply(book_deltas, available_deltas)
+
+
+def recount():
+    """Recompute every category's counters from the through table"""
+    counts = _count(Through.objects.all())
+    Category.objects.exclude(pk__in=list(counts)).update(book_count=0, available_book_count=0)
+    for category_id, (books, available) in counts.items():
+        Category.objects.filter(pk=category_id).update(book_count=books, available_book_count=available)
+
+
+def _count(links):
+    """{category_id: (books, available books)} over a through table queryset"""
+    rows = links.values('category_id').annotate(
+        books=Count('book_id'),
+        available=Count('book_id', filter=Q(book__number_of_copies__gt=F('book__active_loans'))),
+    ).values_list('category_id', 'books', 'available')
+    return {category_id: (books, available) for category_id, books, available in rows}
+
+
+def catalog():
+    """Facets of the whole catalog, read from the maintained counters"""
+    rows = Category.objects.filter(book_count__gt=0).order_by('name').values_list(
+        'id', 'name', 'book_count', 'available_book_count'
+    )
+    return [
+        {'id': category_id, 'name': name, 'books': books, 'available': available}
+        for category_id, name, books, available in rows
+    ]
+
+
+def for_books(books):
+    """Facets of a result set, given as a Book queryset or a list of book ids"""
+    if isinstance(books, list):
+        links = Through.objects.filter(book_id__in=books)
+    else:
+        links = Through.objects.filter(book_id__in=books.order_by().values('pk'))
+    counts = _count(links)
+    names = Category.objects.filter(pk__in=list(counts)).order_by('name').values_list('id', 'name')
+    return [
+        {'id': category_id, 'name': name, 'books': counts[category_id][0], 'available': counts[category_id][1]}
+        for category_id, name in names
+    ]
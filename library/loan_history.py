@@ -0,0 +1,162 @@
+"""
+Loan history and the daily rollups that loan reports read.
+
+BorrowedBook only keeps the latest state of each (user, book) loan; a
+re-borrow reopens the same row. Every borrow and return therefore also
+appends a LoanEvent, in the same transaction as the circulation change
+(``record``, called from library.circulation). Events are never updated.
+Nothing emits renew events yet, as loans have no due date to extend.
+
+Reports don't scan events. ``roll_up`` recounts whole days of events into
+DailyBookLoans and DailyCategoryLoans, and the report queries sum those
+rows. Run it periodically (see the rollup_loans command): each run redoes
+the last rolled-up day, which may have been partial, and every day since.
+A book's categories are taken at rollup time. ``recent_popular_books``
+adds the events since the last rollup to the rolled-up counts, for figures
+that must not wait for the next run.
+"""
+import datetime
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Book, DailyBookLoans, DailyCategoryLoans, LoanEvent
+
+BATCH_SIZE = 2000
+
+# Rollup column -> event kind it counts
+COLUMNS = {'borrows': LoanEvent.BORROW, 'returns': LoanEvent.RETURN, 'renewals': LoanEvent.RENEW}
+
+
+def record(kind, user_id, book_ids):
+    """Append one event of kind per book (call inside the circulation change's transaction)"""
+    from . import stats  # stats imports this module
+
+    ts = timezone.now()
+    LoanEvent.objects.bulk_create(
+        LoanEvent(user_id=user_id, book_id=book_id, kind=kind, ts=ts) for book_id in book_ids
+    )
+    # Every borrow and return passes through here
+    transaction.on_commit(stats.invalidate)
+
+
+def book_history(book_id):
+    """A book's events, newest first (served by loan_event_book_ts_idx)"""
+    return LoanEvent.objects.filter(book_id=book_id).order_by('-ts', '-id')
+
+
+def user_history(user):
+    """A user's events, newest first (served by loan_event_user_ts_idx)"""
+    return LoanEvent.objects.filter(user=user).order_by('-ts', '-id')
+
+
+# ---------------------
+# ROLLUPS
+# ---------------------
+def _day_start(day):
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def last_rollup_day():
+    """The latest day with rollup rows (possibly partial), or None before the first rollup"""
+    return DailyBookLoans.objects.aggregate(day=Max('day'))['day']
+
+
+def pending_start():
+    """First day whose rollup may be out of date, or None if there are no events"""
+    last = last_rollup_day()
+    if last is not None:
+        return last
+    first = LoanEvent.objects.order_by('ts').values_list('ts', flat=True).first()
+    return timezone.localdate(first) if first else None
+
+
+def roll_up(start, end=None):
+    """Recount the rollups of every day from start through end (default today). Returns the rows written."""
+    end = end or timezone.localdate()
+    events = (
+        LoanEvent.objects.filter(ts__gte=_day_start(start), ts__lt=_day_start(end + datetime.timedelta(days=1)))
+        .annotate(day=TruncDate('ts'))
+    )
+    counts = {column: Count('id', filter=Q(kind=kind)) for column, kind in COLUMNS.items()}
+    per_book = events.values('day', 'book_id').annotate(**counts).values_list('day', 'book_id', *COLUMNS)
+    # One row per (event, category link); events of uncategorized books drop out of the join
+    per_category = (
+        events.values('day', category_id=F('book__categories'))
+        .filter(category_id__isnull=False)
+        .annotate(**counts).values_list('day', 'category_id', *COLUMNS)
+    )
+    book_rows = [DailyBookLoans(day=day, book_id=book_id, **dict(zip(COLUMNS, n))) for day, book_id, *n in per_book]
+    category_rows = [
+        DailyCategoryLoans(day=day, category_id=category_id, **dict(zip(COLUMNS, n)))
+        for day, category_id, *n in per_category
+    ]
+
+    with transaction.atomic():
+        DailyBookLoans.objects.filter(day__range=(start, end)).delete()
+        DailyCategoryLoans.objects.filter(day__range=(start, end)).delete()
+        DailyBookLoans.objects.bulk_create(book_rows, batch_size=BATCH_SIZE)
+        DailyCategoryLoans.objects.bulk_create(category_rows, batch_size=BATCH_SIZE)
+    return len(book_rows) + len(category_rows)
+
+
+# ---------------------
+# REPORTS
+# ---------------------
+def popular_books(start, end, limit=10):
+    """The most borrowed books between start and end inclusive, annotated with ``loans``"""
+    return (
+        Book.objects.filter(daily_loans__day__range=(start, end))
+        .annotate(loans=Sum('daily_loans__borrows'))
+        .filter(loans__gt=0)
+        .order_by('-loans', 'id')[:limit]
+    )
+
+
+def live_borrows(start):
+    """Book ids of the borrow events from the start of day start onward, one per event"""
+    # Counted by the caller: a GROUP BY book_id makes SQLite walk the book index
+    # over every event instead of searching loan_event_ts_idx for the window
+    return LoanEvent.objects.filter(ts__gte=_day_start(start), kind=LoanEvent.BORROW).values_list('book_id', flat=True)
+
+
+def recent_popular_books(start, limit=10):
+    """
+    The most borrowed books from start through now, as ([{id, title, author, loans}], last rollup day).
+
+    Days before the last rolled-up day are read from the rollups; that day,
+    which may be partial, and everything after it are counted from events.
+    """
+    last = last_rollup_day()
+    live_start = max(start, last) if last else start
+    live = Counter(live_borrows(live_start))
+    rolled = {}
+    if last and start < live_start:
+        rolled_end = live_start - datetime.timedelta(days=1)
+        # A book outside the rolled-up top can only climb into the top through live borrows
+        rolled.update(popular_books(start, rolled_end, limit).values_list('id', 'loans'))
+        rolled.update(
+            DailyBookLoans.objects.filter(book_id__in=list(live), day__range=(start, rolled_end))
+            .values('book_id').annotate(borrows=Sum('borrows')).values_list('book_id', 'borrows')
+        )
+    loans = Counter(rolled) + live
+    top = sorted(loans, key=lambda book_id: (-loans[book_id], book_id))[:limit]
+    books = {book['id']: book for book in Book.objects.filter(pk__in=top).values('id', 'title', 'author')}
+    return [{**books[book_id], 'loans': loans[book_id]} for book_id in top if book_id in books], last
+
+
+def category_usage(start, end):
+    """[{id, name, borrows, returns, renewals}] per category between start and end inclusive, busiest first"""
+    rows = (
+        DailyCategoryLoans.objects.filter(day__range=(start, end))
+        .values('category_id', name=F('category__name'))
+        .annotate(**{column: Sum(column) for column in COLUMNS})
+        .order_by('-borrows', 'category_id')
+    )
+    return [
+        {'id': row['category_id'], 'name': row['name'], **{column: row[column] for column in COLUMNS}}
+        for row in rows
+    ]
@@ -0,0 +1,105 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Count, F
+from django.utils import timezone
+
+from library import facets, loan_history, recommendations, search
+from library.models import (
+    Book, BookCoverRendition, BookSearchPosting, BorrowedBook, FavoriteBook,
+    LoanEvent, PasswordResetToken, User,
+)
+
+# Hot queries, written the way the views and services issue them. Any
+# placeholder value works: only the plan is inspected, never the rows.
+HOT_QUERIES = {
+    'circulation.borrow_limit': lambda: BorrowedBook.objects.filter(user_id=1, returned=False).values('pk'),
+    'circulation.open_loans_for_book': lambda: BorrowedBook.objects.filter(book_id=1, returned=False).values('pk'),
+    'circulation.claim_copy': lambda: Book.objects.filter(pk=1, active_loans__lt=F('number_of_copies')),
+    'circulation.existing_loans': lambda: BorrowedBook.objects.filter(user_id=1, book_id__in=[1, 2, 3]),
+    'borrowed.page': lambda: (
+        BorrowedBook.objects.filter(user_id=1, id__gt=1).select_related('book').order_by('id')[:51]
+    ),
+    'favorites.page': lambda: (
+        FavoriteBook.objects.filter(user_id=1, id__gt=1).select_related('book').order_by('id')[:51]
+    ),
+    'books.page': lambda: Book.objects.filter(id__gt=1).order_by('id')[:51],
+    'books.categories_prefetch': lambda: Book.categories.through.objects.filter(book_id__in=[1, 2, 3]),
+    'books.category_page': lambda: (
+        facets.filter_books(Book.objects.all(), [1]).filter(keyset_id__gt=1).order_by('keyset_id')[:51]
+    ),
+    'books.categories_page': lambda: (
+        facets.filter_books(Book.objects.filter(id__gt=1), [1, 2]).order_by('id')[:51]
+    ),
+    'facets.search_hits': lambda: (
+        Book.categories.through.objects.filter(book_id__in=[1, 2, 3])
+        .values('category_id').annotate(n=Count('book_id'))
+    ),
+    'recommendations.similar': lambda: recommendations.similar_books(1).values('pk')[:10],
+    'recommendations.for_user': lambda: recommendations.for_user(1).values('pk')[:10],
+    'loans.user_history': lambda: loan_history.user_history(1).filter(ts__lt=timezone.now())[:51],
+    'loans.book_history': lambda: loan_history.book_history(1).filter(ts__lt=timezone.now())[:51],
+    'loans.rollup_window': lambda: LoanEvent.objects.filter(ts__gte=timezone.now()).values('book_id', 'kind'),
+    'loans.popular_books': lambda: loan_history.popular_books(timezone.localdate(), timezone.localdate()).values('pk'),
+    'loans.live_borrows': lambda: loan_history.live_borrows(timezone.localdate()),
+    'stats.overdue_loans': lambda: BorrowedBook.objects.filter(returned=False, borrow_date__lt='2025-01-01').values('pk'),
+    'search.term': lambda: BookSearchPosting.objects.filter(term='tolkien'),
+    'search.prefix': lambda: search.prefix_expansions('tol', ['john']),
+    'covers.rendition': lambda: BookCoverRendition.objects.filter(book_id=1, width=240, format='webp'),
+    'auth.user_by_email': lambda: User.objects.filter(email='reader@example.com'),
+    'tokens.reset_lookup': lambda: PasswordResetToken.objects.filter(token_hash='0' * 64),
+    'tokens.expired': lambda: PasswordResetToken.objects.filter(expires_at__lte=timezone.now()).values('pk')[:500],
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Run EXPLAIN QUERY PLAN on the hot queries in HOT_QUERIES and fail if any of '
+        'them scans a whole table instead of using an index'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Database alias to explain against')
+        parser.add_argument('--verbose-plans', action='store_true', help='Print the full plan of every query')
+        parser.add_argument('--analyze', action='store_true',
+                            help='Run ANALYZE first: with table statistics SQLite may pick different plans')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'sqlite':
+            raise CommandError('audit_query_plans reads SQLite EXPLAIN QUERY PLAN output')
+
+        if options['analyze']:
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        failures = []
+        for name, build in HOT_QUERIES.items():
+            queryset = build().using(options['database'])
+            plan = self.plan(connection, queryset)
+            scans = [step for step in plan if self.is_full_scan(step, name)]
+            if scans:
+                failures.append(name)
+            status = self.style.ERROR('SCAN') if scans else self.style.SUCCESS('ok')
+            self.stdout.write(f'{name:<34}{status}')
+            for step in plan if options['verbose_plans'] else scans:
+                self.stdout.write(f'    {step}')
+
+        if failures:
+            raise CommandError(f"{len(failures)} hot queries fall back to a full scan: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS(f'All {len(HOT_QUERIES)} hot queries use an index'))
+
+    @staticmethod
+    def plan(connection, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    @staticmethod
+    def is_full_scan(step, name=''):
+        # Index lookups show up as "SEARCH t USING ...". "SCAN t" reads every
+        # row, and "SCAN t USING [COVERING] INDEX i" still walks the whole index.
+        if step.startswith('SCAN ') and not step.startswith('SCAN CONSTANT ROW'):
+            return True
+        # A keyset page that sorts reads every row past the cursor before the LIMIT
+        return name.endswith('.page') and step.startswith('USE TEMP B-TREE FOR ORDER BY')
@@ -0,0 +1,276 @@
+import datetime
+import json
+import math
+import platform
+import random
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from library import facets, loan_history, recommendations, search
+from library.backends import user_cache
+from library.models import Book, BorrowedBook, Category, FavoriteBook, LoanEvent
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / 'benchmarks' / 'baseline.json'
+
+WORDS = (
+    'shadow river empire garden winter silent golden broken hidden ancient '
+    'machine ocean forest stone glass night city journey memory fire'
+).split()
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the API hot paths against a freshly seeded test database and '
+        'compare latency, query counts, response size and memory with a baseline'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=2000)
+        parser.add_argument('--categories', type=int, default=12)
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--loans', type=int, default=1000)
+        parser.add_argument('--favorites', type=int, default=1000)
+        parser.add_argument('--iterations', type=int, default=20, help='Timed requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=2, help='Untimed requests per endpoint')
+        parser.add_argument('--seed', type=int, default=1234, help='Random seed for the dataset')
+        parser.add_argument('--output', help='Write the results as JSON to this path')
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE),
+                            help='Baseline JSON to compare against')
+        parser.add_argument('--update-baseline', action='store_true',
+                            help='Overwrite the baseline with this run instead of comparing')
+        parser.add_argument('--latency-tolerance', type=float, default=0.5,
+                            help='Allowed relative p95 slowdown before failing (0.5 = +50%%)')
+        parser.add_argument('--size-tolerance', type=float, default=0.1,
+                            help='Allowed relative response size growth before failing')
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        # With a per-process cache the user cache reloads users every few seconds,
+        # which would add a query to whichever scenario runs then. This is one
+        # process, so keep users for the whole run and compare like with like.
+        local_timeout, user_cache.timeout = user_cache.timeout, settings.AUTH_USER_CACHE_TIMEOUT
+        try:
+            for cache in caches.all():
+                cache.clear()
+            user_cache.clear()
+            self.seed(options)
+            results = self.run(options)
+        finally:
+            user_cache.timeout = local_timeout
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        report = {
+            'dataset': {key: options[key] for key in ('books', 'categories', 'users', 'loans', 'favorites')},
+            'iterations': options['iterations'],
+            'python': platform.python_version(),
+            'database': connection.vendor,
+            'results': results,
+        }
+        self.print_table(results)
+
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(report, indent=2) + '\n')
+        baseline_path = Path(options['baseline'])
+        if options['update_baseline']:
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_text(json.dumps(report, indent=2) + '\n')
+            self.stdout.write(self.style.SUCCESS(f'Baseline written to {baseline_path}'))
+        elif baseline_path.exists():
+            self.compare(report, json.loads(baseline_path.read_text()), options)
+
+    # ---------------------
+    # DATASET
+    # ---------------------
+    def seed(self, options):
+        rng = random.Random(options['seed'])
+        User = get_user_model()
+
+        categories = Category.objects.bulk_create(
+            Category(name=f'Category {i}') for i in range(options['categories'])
+        )
+        books = Book.objects.bulk_create(
+            Book(
+                title=' '.join(rng.sample(WORDS, 3)).title(),
+                author=f'{rng.choice(WORDS).title()} {rng.choice(WORDS).title()}',
+                description=' '.join(rng.choices(WORDS, k=40)),
+                published_date=datetime.date(1950, 1, 1) + datetime.timedelta(days=rng.randrange(25000)),
+                number_of_copies=rng.randint(1, 5),
+            )
+            for _ in range(options['books'])
+        )
+        Through = Book.categories.through
+        Through.objects.bulk_create(
+            Through(book_id=book.pk, category_id=category.pk)
+            for book in books
+            for category in rng.sample(categories, min(2, len(categories)))
+        )
+
+        self.admin = User.objects.create_user(email='bench-admin@example.invalid', password='x', is_admin=True)
+        self.reader = User.objects.create_user(email='bench-reader@example.invalid', password='x')
+        users = User.objects.bulk_create(
+            User(email=f'bench-{i}@example.invalid') for i in range(options['users'])
+        )
+
+        pairs = set()
+        while len(pairs) < min(options['loans'], len(users) * len(books)):
+            pairs.add((rng.choice(users).pk, rng.choice(books).pk))
+        BorrowedBook.objects.bulk_create(
+            BorrowedBook(user_id=user_id, book_id=book_id, returned=rng.random() < 0.5)
+            for user_id, book_id in pairs
+        )
+        reader_books = rng.sample(books, min(10, len(books)))
+        BorrowedBook.objects.bulk_create(BorrowedBook(user=self.reader, book=book) for book in reader_books[:5])
+        FavoriteBook.objects.bulk_create(FavoriteBook(user=self.reader, book=book) for book in reader_books)
+
+        pairs = set()
+        while len(pairs) < min(options['favorites'], len(users) * len(books)):
+            pairs.add((rng.choice(users).pk, rng.choice(books).pk))
+        FavoriteBook.objects.bulk_create(FavoriteBook(user_id=u, book_id=b) for u, b in pairs)
+
+        # Loan history over the last 60 days: a borrow per loan, and a return for the closed ones
+        now = timezone.now()
+        events = []
+        for user_id, book_id, returned in BorrowedBook.objects.values_list('user_id', 'book_id', 'returned'):
+            borrowed_at = now - datetime.timedelta(days=rng.randrange(60), seconds=rng.randrange(86400))
+            events.append(LoanEvent(user_id=user_id, book_id=book_id, kind=LoanEvent.BORROW, ts=borrowed_at))
+            if returned:
+                events.append(LoanEvent(user_id=user_id, book_id=book_id, kind=LoanEvent.RETURN,
+                                        ts=borrowed_at + (now - borrowed_at) * rng.random()))
+        LoanEvent.objects.bulk_create(sorted(events, key=lambda event: event.ts), batch_size=1000)
+
+        # bulk_create skips save() and signals, so recount loans and facets and index by hand
+        active = dict(
+            BorrowedBook.objects.filter(returned=False).values('book').annotate(n=Count('id')).values_list('book', 'n')
+        )
+        for book in books:
+            book.active_loans = active.get(book.pk, 0)
+            book.number_of_copies = max(book.number_of_copies, book.active_loans + 1)
+        Book.objects.bulk_update(books, ['active_loans', 'number_of_copies'], batch_size=500)
+        facets.recount()
+        search.rebuild_index()
+        recommendations.rebuild()
+        loan_history.roll_up(loan_history.pending_start())
+
+        self.circulation_book = Book.objects.exclude(borrowed_by__user=self.reader).order_by('id').first()
+        self.search_term = WORDS[0]
+
+    # ---------------------
+    # SCENARIOS
+    # ---------------------
+    def scenarios(self):
+        reader, admin = Client(), Client()
+        reader.force_login(self.reader)
+        admin.force_login(self.admin)
+        book_id = self.circulation_book.pk
+        etags = {}
+
+        def poll_books():
+            # A client polling the list: a 304 while nothing changed, a full page after each
+            # borrow/return cycle below (circulation bumps updated_at)
+            response = reader.get('/api/books/', HTTP_IF_NONE_MATCH=etags.get('books', ''))
+            etags['books'] = response['ETag']
+            return response
+
+        category_id = Category.objects.order_by('id').values_list('id', flat=True).first()
+
+        return [
+            ('books.list', lambda: reader.get('/api/books/')),
+            ('books.category', lambda: reader.get('/api/books/', {'category': category_id})),
+            ('books.facets', lambda: reader.get('/api/books/facets/')),
+            ('books.poll', poll_books),
+            ('books.titles', lambda: reader.get('/api/books/', {'fields': 'id,title'})),
+            ('books.available', lambda: reader.get('/api/books/available/')),
+            ('search', lambda: reader.get('/api/search/', {'q': self.search_term})),
+            ('search.suggest', lambda: reader.get('/api/search/suggest/', {'q': self.search_term[:3]})),
+            ('search.facets', lambda: reader.get('/api/search/facets/', {'q': self.search_term})),
+            ('books.similar', lambda: reader.get(f'/api/books/{book_id}/similar/')),
+            ('recommendations', lambda: reader.get('/api/user/me/recommendations/')),
+            ('borrowed.get', lambda: reader.get('/api/borrowed-books/')),
+            ('borrowed.post', lambda: reader.post(
+                '/api/borrowed-books/', {'book': book_id}, content_type='application/json')),
+            ('borrowed.patch', lambda: reader.patch(
+                '/api/borrowed-books/', {'book_id': book_id}, content_type='application/json')),
+            ('borrowed.history', lambda: reader.get('/api/borrowed-books/history/')),
+            ('favorites.get', lambda: reader.get('/api/favorite-books/')),
+            ('admin.books', lambda: admin.get('/api/admin/books/')),
+            ('admin.users', lambda: admin.get('/api/admin/users/')),
+            ('admin.stats', lambda: admin.get('/api/admin/stats/')),
+            ('admin.loan_report', lambda: admin.get('/api/admin/loan-report/')),
+            ('categories', lambda: admin.get('/api/categories/')),
+        ]
+
+    def run(self, options):
+        scenarios = self.scenarios()
+        timings = {name: [] for name, _ in scenarios}
+        results = {}
+
+        # Interleave borrow/return so each POST has a copy to lend and each PATCH a loan to close
+        for iteration in range(options['warmup'] + options['iterations']):
+            for name, request in scenarios:
+                started = time.perf_counter()
+                with CaptureQueriesContext(connection) as queries:
+                    response = request()
+                elapsed = (time.perf_counter() - started) * 1000
+                # Let queued recommendation updates finish: their writes would otherwise
+                # collide with the next request on the shared in-memory test database
+                recommendations.drain()
+                if response.status_code >= 400:
+                    raise CommandError(f'{name} returned HTTP {response.status_code}: {response.content[:200]!r}')
+                if iteration >= options['warmup']:
+                    timings[name].append(elapsed)
+                results[name] = {'queries': len(queries), 'bytes': len(response.content)}
+
+        for name, request in scenarios:
+            tracemalloc.start()
+            request()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            samples = sorted(timings[name])
+            results[name].update({
+                'p50_ms': round(statistics.median(samples), 3),
+                'p95_ms': round(samples[max(0, math.ceil(len(samples) * 0.95) - 1)], 3),
+                'peak_kb': round(peak / 1024, 1),
+            })
+        return results
+
+    # ---------------------
+    # REPORTING
+    # ---------------------
+    def print_table(self, results):
+        self.stdout.write(f"{'endpoint':<18}{'p50 ms':>10}{'p95 ms':>10}{'queries':>9}{'bytes':>10}{'peak kB':>10}")
+        for name, row in results.items():
+            self.stdout.write(
+                f"{name:<18}{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}"
+                f"{row['queries']:>9}{row['bytes']:>10}{row['peak_kb']:>10.1f}"
+            )
+
+    def compare(self, report, baseline, options):
+        if baseline.get('dataset') != report['dataset']:
+            self.stdout.write(self.style.WARNING('Baseline was recorded with a different dataset; skipping comparison'))
+            return
+        regressions = []
+        for name, row in report['results'].items():
+            before = baseline['results'].get(name)
+            if before is None:
+                continue
+            if row['queries'] > before['queries']:
+                regressions.append(f"{name}: queries {before['queries']} -> {row['queries']}")
+            if row['bytes'] > before['bytes'] * (1 + options['size_tolerance']):
+                regressions.append(f"{name}: bytes {before['bytes']} -> {row['bytes']}")
+            if row['p95_ms'] > before['p95_ms'] * (1 + options['latency_tolerance']):
+                regressions.append(f"{name}: p95 {before['p95_ms']}ms -> {row['p95_ms']}ms")
+        if regressions:
+            raise CommandError('Performance regressions against baseline:\n  ' + '\n  '.join(regressions))
+        self.stdout.write(self.style.SUCCESS('No regressions against baseline'))
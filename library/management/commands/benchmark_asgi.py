@@ -0,0 +1,110 @@
+import asyncio
+import math
+import statistics
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import caches
+from django.db import connection, connections
+from django.test import AsyncClient, Client, override_settings
+
+from library import urls
+from library.async_views import async_urlpatterns
+
+from .benchmark_api import Command as BenchmarkCommand
+
+ENDPOINTS = [
+    ('books.list', '/api/books/', {}),
+    ('search', '/api/search/', {'q': 'shadow'}),
+    ('user.me', '/api/user/me/', {}),
+]
+
+
+class Command(BenchmarkCommand):
+    help = (
+        'Compare the WSGI (sync DRF) and ASGI (library.async_views) read paths '
+        'under concurrent load against a freshly seeded test database'
+    )
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint and mode')
+        parser.add_argument('--concurrency', type=int, default=32, help='Requests in flight at once')
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            for cache in caches.all():
+                cache.clear()
+            self.seed(options)
+            results = {
+                'wsgi': self.run_wsgi(options),
+                'asgi': asyncio.run(self.run_asgi(options)),
+            }
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        self.stdout.write(
+            f"{'endpoint':<14}{'mode':<6}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}"
+        )
+        for name, _, _ in ENDPOINTS:
+            for mode in ('wsgi', 'asgi'):
+                row = results[mode][name]
+                self.stdout.write(
+                    f"{name:<14}{mode:<6}{row['rps']:>10.0f}{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}"
+                )
+
+    @staticmethod
+    def summarize(latencies, elapsed):
+        samples = sorted(latencies)
+        return {
+            'rps': len(samples) / elapsed,
+            'p50_ms': statistics.median(samples),
+            'p95_ms': samples[max(0, math.ceil(len(samples) * 0.95) - 1)],
+        }
+
+    def run_wsgi(self, options):
+        results = {}
+        clients = []
+        for _ in range(options['concurrency']):
+            client = Client()
+            client.force_login(self.reader)
+            clients.append(client)
+
+        for name, url, params in ENDPOINTS:
+            def timed(index):
+                client = clients[index % len(clients)]
+                started = time.perf_counter()
+                response = client.get(url, params)
+                assert response.status_code == 200, (name, response.status_code)
+                return (time.perf_counter() - started) * 1000
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+                latencies = list(pool.map(timed, range(options['requests'])))
+            results[name] = self.summarize(latencies, time.perf_counter() - started)
+        return results
+
+    async def run_asgi(self, options):
+        urlconf = types.ModuleType('benchmark_async_urls')
+        urlconf.urlpatterns = async_urlpatterns + urls.urlpatterns
+        results = {}
+        with override_settings(ROOT_URLCONF=urlconf):
+            client = AsyncClient()
+            await client.aforce_login(self.reader)
+            limit = asyncio.Semaphore(options['concurrency'])
+
+            for name, url, params in ENDPOINTS:
+                async def timed():
+                    async with limit:
+                        started = time.perf_counter()
+                        response = await client.get(url, params)
+                        assert response.status_code == 200, (name, response.status_code)
+                        return (time.perf_counter() - started) * 1000
+
+                started = time.perf_counter()
+                latencies = await asyncio.gather(*(timed() for _ in range(options['requests'])))
+                results[name] = self.summarize(latencies, time.perf_counter() - started)
+        return results
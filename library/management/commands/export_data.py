@@ -0,0 +1,38 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from library import exports
+
+
+class Command(BaseCommand):
+    help = 'Stream a table as CSV or JSONL, optionally gzipped, to a file or stdout'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=sorted(exports.EXPORTS))
+        parser.add_argument('--format', choices=sorted(exports.FORMATS), default='csv')
+        parser.add_argument('--since', help='Only rows created or changed since this ISO date/datetime')
+        parser.add_argument('--gzip', action='store_true', help='Compress the output')
+        parser.add_argument('--output', default='-', help='Output file (default: stdout)')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = exports.parse_since(options['since'])
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        chunks = exports.stream(options['dataset'], options['format'], since=since, compress=options['gzip'])
+        if options['output'] == '-':
+            target = sys.stdout.buffer
+            for chunk in chunks:
+                target.write(chunk)
+            target.flush()
+            return
+        written = 0
+        with open(options['output'], 'wb') as target:
+            for chunk in chunks:
+                target.write(chunk)
+                written += len(chunk)
+        self.stderr.write(self.style.SUCCESS(f"Wrote {written} bytes to {options['output']}"))
@@ -0,0 +1,32 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from library import thumbnails
+from library.models import BookCover
+
+
+class Command(BaseCommand):
+    help = 'Generate missing or stale cover thumbnail renditions for every book'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Parallel rendering threads')
+
+    def handle(self, *args, **options):
+        book_ids = list(BookCover.objects.values_list('book_id', flat=True).order_by('book_id'))
+
+        def work(book_id):
+            try:
+                return thumbnails.generate_renditions(book_id)
+            finally:
+                close_old_connections()
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            written = sum(pool.map(work, book_ids))
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {written} renditions for {len(book_ids)} covers in {elapsed:.1f}s'
+        ))
@@ -0,0 +1,263 @@
+import csv
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from itertools import islice
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from library import facets, search, thumbnails
+from library.models import Book, BookCover, BookCoverRendition, Category, guess_image_type
+
+CATEGORY_SEPARATOR = '|'
+
+
+def read_records(path, fmt):
+    """Yield (line number, record dict or None if unparseable) without loading the whole file"""
+    with open(path, newline='', encoding='utf-8') as stream:
+        if fmt == 'csv':
+            reader = csv.DictReader(stream)
+            for record in reader:
+                yield reader.line_num, record
+            return
+        for line_num, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                yield line_num, json.loads(line)
+            except ValueError:
+                yield line_num, None
+
+
+def parse_record(record):
+    """Return (unsaved Book, category names, cover path) or raise ValueError"""
+    if not isinstance(record, dict):
+        raise ValueError('not a JSON object')
+    title = str(record.get('title') or '').strip()
+    author = str(record.get('author') or '').strip()
+    if not title or not author:
+        raise ValueError('title and author are required')
+    if len(title) > 100 or len(author) > 100:
+        raise ValueError('title and author are limited to 100 characters')
+    published_date = date.fromisoformat(str(record.get('published_date') or '').strip())
+    copies = record.get('number_of_copies')
+    # Default only a missing value (an empty CSV cell); an explicit 0 stays 0
+    copies = 1 if copies is None or copies == '' else int(copies)
+    if copies < 0:
+        raise ValueError('number_of_copies must not be negative')
+
+    categories = record.get('categories') or []
+    if isinstance(categories, str):
+        categories = categories.split(CATEGORY_SEPARATOR)
+    names = list(dict.fromkeys(str(name).strip() for name in categories if str(name).strip()))
+    if any(len(name) > 50 for name in names):
+        raise ValueError('category names are limited to 50 characters')
+
+    book = Book(
+        title=title,
+        author=author,
+        description=str(record.get('description') or ''),
+        published_date=published_date,
+        number_of_copies=copies,
+    )
+    return book, names, str(record.get('cover') or '').strip()
+
+
+def load_cover(path, with_renditions):
+    """Read, hash and thumbnail one cover file. Runs in the process pool."""
+    with open(path, 'rb') as stream:
+        data = stream.read()
+    renditions = thumbnails.render_all(data) if with_renditions else []
+    return data, hashlib.sha256(data).hexdigest(), renditions
+
+
+class Command(BaseCommand):
+    help = (
+        'Stream books from a CSV or JSONL file into the catalog in batches. Columns/keys: '
+        'title, author, description, published_date (YYYY-MM-DD), number_of_copies, '
+        f'categories (list, or "{CATEGORY_SEPARATOR}"-separated in CSV) and cover (file path)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSONL file')
+        parser.add_argument('--format', choices=['csv', 'jsonl'],
+                            help='Input format (default: from the file extension)')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Books inserted per transaction')
+        parser.add_argument('--covers-dir', help='Directory cover paths are relative to; covers are skipped without it')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 2,
+                            help='Processes reading and thumbnailing covers')
+        parser.add_argument('--no-renditions', action='store_true',
+                            help='Store covers only; run generate_cover_renditions later')
+        parser.add_argument('--no-index', action='store_true',
+                            help='Skip search indexing; run rebuild_search_index afterwards')
+        parser.add_argument('--checkpoint', help='Checkpoint file (default: <path>.checkpoint)')
+        parser.add_argument('--resume', action='store_true', help='Continue after the last committed batch')
+        parser.add_argument('--report-every', type=float, default=5, help='Seconds between progress lines')
+
+    def handle(self, *args, **options):
+        path = os.path.abspath(options['path'])
+        if not os.path.exists(path):
+            raise CommandError(f'{path} does not exist')
+        fmt = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        self.options = options
+        self.checkpoint_path = options['checkpoint'] or f'{path}.checkpoint'
+        self.category_ids = dict(Category.objects.values_list('name', 'id'))
+        self.stats = {'imported': 0, 'invalid': 0, 'covers': 0}
+
+        skip = self.load_checkpoint(path) if options['resume'] else 0
+        records = read_records(path, fmt)
+        for _ in islice(records, skip):
+            pass
+        self.processed = skip
+
+        self.pool = None
+        if options['covers_dir']:
+            self.pool = ProcessPoolExecutor(max_workers=options['workers'], initializer=django.setup)
+        self.started = self.last_report = time.monotonic()
+        try:
+            # Keep one batch in flight: its covers are rendered while the previous batch is inserted
+            pending = None
+            while True:
+                batch = list(islice(records, options['batch_size']))
+                prepared = self.prepare(batch) if batch else None
+                if pending is not None:
+                    self.commit(pending, path)
+                if prepared is None:
+                    break
+                pending = prepared
+        finally:
+            if self.pool is not None:
+                self.pool.shutdown(cancel_futures=True)
+
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {self.stats['imported']} books ({self.stats['covers']} covers, "
+            f"{self.stats['invalid']} invalid records skipped) in {elapsed:.1f}s, "
+            f"{self.stats['imported'] / max(elapsed, 1e-9):.0f} books/s"
+        ))
+
+    def prepare(self, batch):
+        """Parse a batch and start loading its covers"""
+        rows = []
+        for line_num, record in batch:
+            try:
+                book, names, cover = parse_record(record)
+            except (TypeError, ValueError) as exc:
+                self.stats['invalid'] += 1
+                self.stderr.write(f'Line {line_num}: skipped ({exc})')
+                continue
+            future = None
+            if cover and self.pool is not None:
+                future = self.pool.submit(
+                    load_cover,
+                    os.path.join(self.options['covers_dir'], cover),
+                    not self.options['no_renditions'],
+                )
+            rows.append((line_num, book, names, future))
+        return len(batch), rows
+
+    def commit(self, prepared, path):
+        size, rows = prepared
+        covers = {}
+        for line_num, book, _, future in rows:
+            if future is None:
+                continue
+            try:
+                covers[line_num] = future.result()
+            except Exception as exc:
+                self.stderr.write(f'Line {line_num}: cover skipped ({exc})')
+                continue
+            book.cover_etag = covers[line_num][1]
+
+        with transaction.atomic():
+            self.resolve_categories({name for _, _, names, _ in rows for name in names})
+            books = Book.objects.bulk_create([book for _, book, _, _ in rows])
+
+            Through = Book.categories.through
+            links = [
+                Through(book_id=book.pk, category_id=self.category_ids[name])
+                for _, book, names, _ in rows
+                for name in names
+            ]
+            Through.objects.bulk_create(links)
+            # bulk_create skips m2m_changed, so count the new links here
+            facets.books_added(
+                [(link.book_id, link.category_id) for link in links],
+                [book.pk for book in books if book.number_of_copies > 0],
+            )
+            if not self.options['no_index']:
+                search.index_new_books(books, {book.pk: names for _, book, names, _ in rows})
+
+            cover_rows, rendition_rows = [], []
+            for line_num, book, _, _ in rows:
+                if line_num not in covers:
+                    continue
+                data, etag, renditions = covers[line_num]
+                cover_rows.append(BookCover(
+                    book_id=book.pk, data=data, content_type=guess_image_type(data), etag=etag, size=len(data),
+                ))
+                rendition_rows.extend(
+                    BookCoverRendition(
+                        book_id=book.pk,
+                        width=width,
+                        format=fmt,
+                        source_etag=etag,
+                        data=rendered,
+                        content_type=thumbnails.CONTENT_TYPES[fmt],
+                        etag=hashlib.sha256(rendered).hexdigest(),
+                        size=len(rendered),
+                    )
+                    for width, fmt, rendered in renditions
+                )
+            # Covers are large: keep each INSERT statement small
+            BookCover.objects.bulk_create(cover_rows, batch_size=100)
+            BookCoverRendition.objects.bulk_create(rendition_rows, batch_size=100)
+
+        self.processed += size
+        self.stats['imported'] += len(books)
+        self.stats['covers'] += len(cover_rows)
+        self.save_checkpoint(path)
+        self.report()
+
+    def resolve_categories(self, names):
+        """Make sure every name is in self.category_ids, creating missing categories"""
+        missing = [name for name in names if name not in self.category_ids]
+        if not missing:
+            return
+        Category.objects.bulk_create([Category(name=name) for name in missing], ignore_conflicts=True)
+        self.category_ids.update(Category.objects.filter(name__in=missing).values_list('name', 'id'))
+
+    def load_checkpoint(self, path):
+        try:
+            with open(self.checkpoint_path) as stream:
+                checkpoint = json.load(stream)
+        except FileNotFoundError:
+            return 0
+        if checkpoint.get('source') != path:
+            raise CommandError(f"{self.checkpoint_path} belongs to {checkpoint.get('source')}, not {path}")
+        self.stdout.write(f"Resuming after {checkpoint['records']} records")
+        return checkpoint['records']
+
+    def save_checkpoint(self, path):
+        temporary = f'{self.checkpoint_path}.tmp'
+        with open(temporary, 'w') as stream:
+            json.dump({'source': path, 'records': self.processed}, stream)
+        os.replace(temporary, self.checkpoint_path)
+
+    def report(self):
+        now = time.monotonic()
+        if now - self.last_report < self.options['report_every']:
+            return
+        self.last_report = now
+        elapsed = now - self.started
+        self.stdout.write(
+            f"{self.processed} records read, {self.stats['imported']} books imported, "
+            f"{self.stats['imported'] / elapsed:.0f} books/s"
+        )
@@ -0,0 +1,15 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from library import recommendations
+
+
+class Command(BaseCommand):
+    help = 'Recompute every book\'s "readers also liked" neighbours from favorites and loans'
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        written = recommendations.rebuild()
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} similar-book rows in {elapsed:.1f}s'))
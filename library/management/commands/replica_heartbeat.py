@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from library.models import ReplicaHeartbeat
+
+
+class Command(BaseCommand):
+    help = (
+        'Stamp the replication heartbeat on the primary. Replicas whose copy is older '
+        'than REPLICA_MAX_LAG are skipped by the router, so run this continuously '
+        '(--interval) wherever DATABASE_REPLICAS is set'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0, help='Repeat every N seconds (0 = once)')
+
+    def handle(self, *args, **options):
+        while True:
+            ReplicaHeartbeat.beat()
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS('Heartbeat written'))
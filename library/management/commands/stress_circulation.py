@@ -0,0 +1,112 @@
+import datetime
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from library import circulation, recommendations
+from library.circulation import CirculationError
+from library.models import Book, BorrowedBook
+
+
+class Command(BaseCommand):
+    help = (
+        'Hammer a single title with concurrent borrows and returns and verify '
+        'that no more copies are lent out than exist'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--copies', type=int, default=10, help='Copies of the test title')
+        parser.add_argument('--users', type=int, default=200, help='Concurrent borrowers')
+        parser.add_argument('--rounds', type=int, default=3, help='Borrow/return rounds per user')
+        parser.add_argument('--workers', type=int, default=16, help='Worker threads')
+        parser.add_argument('--keep', action='store_true', help='Keep the generated book and users (with --force)')
+        parser.add_argument('--force', action='store_true',
+                            help='Run against the configured database instead of a throwaway test database')
+
+    def handle(self, *args, **options):
+        if options['force']:
+            return self.stress(options)
+        # Like benchmark_api: a throwaway database, so a run never touches real data
+        test_settings = connection.settings_dict.setdefault('TEST', {})
+        if connection.vendor == 'sqlite' and not test_settings.get('NAME'):
+            # The in-memory test database fails concurrent writers with "table is
+            # locked" instead of letting them wait, so use a file
+            test_settings['NAME'] = os.path.join(tempfile.gettempdir(), 'test_stress_circulation.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            return self.stress(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def stress(self, options):
+        User = get_user_model()
+        run_id = uuid.uuid4().hex[:8]
+        book = Book.objects.create(
+            title=f'Circulation stress {run_id}',
+            author='stress_circulation',
+            description='Temporary book created by the stress_circulation command',
+            published_date=datetime.date.today(),
+            number_of_copies=options['copies'],
+        )
+        User.objects.bulk_create(
+            User(email=f'stress-{run_id}-{i}@example.invalid') for i in range(options['users'])
+        )
+        users = list(User.objects.filter(email__startswith=f'stress-{run_id}-'))
+
+        outcomes = {'borrowed': 0, 'rejected': 0, 'returned': 0}
+        max_on_loan = 0
+        lock = threading.Lock()
+
+        def record(outcome, on_loan=0):
+            nonlocal max_on_loan
+            with lock:
+                outcomes[outcome] += 1
+                max_on_loan = max(max_on_loan, on_loan)
+
+        def worker(user):
+            try:
+                for _ in range(options['rounds']):
+                    try:
+                        circulation.borrow_book(user, book.pk)
+                    except CirculationError:
+                        record('rejected')
+                        continue
+                    record('borrowed', BorrowedBook.objects.filter(book=book, returned=False).count())
+                    circulation.return_book(user, book.pk)
+                    record('returned')
+            finally:
+                connection.close()
+
+        started = time.monotonic()
+        try:
+            with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+                list(pool.map(worker, users))
+            elapsed = time.monotonic() - started
+            # Let the recommendation updates queued by first loans finish before cleanup
+            recommendations.drain()
+
+            book.refresh_from_db()
+            operations = outcomes['borrowed'] + outcomes['rejected'] + outcomes['returned']
+            self.stdout.write(
+                f"{outcomes['borrowed']} borrows, {outcomes['rejected']} rejected, "
+                f"{outcomes['returned']} returns in {elapsed:.2f}s "
+                f"({outcomes['borrowed'] / elapsed:.0f} borrows/s, {operations / elapsed:.0f} ops/s)"
+            )
+            self.stdout.write(
+                f"Peak copies on loan: {max_on_loan}/{book.number_of_copies}, "
+                f"active_loans after run: {book.active_loans}"
+            )
+            if max_on_loan > book.number_of_copies or book.active_loans != 0:
+                raise CommandError('Over-lending detected')
+            self.stdout.write(self.style.SUCCESS('No over-lending detected'))
+        finally:
+            if not options['keep']:
+                book.delete()
+                User.objects.filter(email__startswith=f'stress-{run_id}-').delete()
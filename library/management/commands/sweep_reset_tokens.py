@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from library.tokens import get_token_store
+
+
+class Command(BaseCommand):
+    help = 'Delete expired password reset tokens'
+
+    def handle(self, *args, **options):
+        removed = get_token_store().sweep()
+        self.stdout.write(self.style.SUCCESS(f'Removed {removed} expired tokens'))
@@ -0,0 +1,48 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from library.models import ReplicaHeartbeat
+
+
+class Command(BaseCommand):
+    help = (
+        'Copy the primary SQLite database into every SQLite replica in DATABASE_REPLICAS, '
+        'stamping the heartbeat first. Stands in for real replication when trying the '
+        'replica router locally'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0, help='Repeat every N seconds (0 = once)')
+
+    def handle(self, *args, **options):
+        primary = settings.DATABASES[DEFAULT_DB_ALIAS]
+        replicas = [settings.DATABASES[alias] for alias in settings.DATABASE_REPLICAS]
+        for config in [primary, *replicas]:
+            if config['ENGINE'] != 'django.db.backends.sqlite3':
+                raise CommandError('sync_sqlite_replicas only works with SQLite databases')
+        if not replicas:
+            raise CommandError('No replicas configured; set LIBRARY_REPLICA_DB')
+
+        timeout = primary.get('OPTIONS', {}).get('timeout', 5)
+        while True:
+            ReplicaHeartbeat.beat()
+            source = sqlite3.connect(primary['NAME'], timeout=timeout)
+            try:
+                for config in replicas:
+                    target = sqlite3.connect(config['NAME'], timeout=timeout)
+                    try:
+                        source.backup(target)
+                    finally:
+                        target.close()
+            finally:
+                source.close()
+            if options['verbosity'] > 1:
+                self.stdout.write(f'Synced {len(replicas)} replica(s)')
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f'Synced {len(replicas)} replica(s)'))
@@ -0,0 +1,163 @@
+import json
+import logging
+import random
+import sys
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework.serializers import BaseSerializer
+
+from . import routers
+
+logger = logging.getLogger('library.instrumentation')
+
+
+class QueryCollector:
+    """execute_wrapper that records duration and a call site for every statement"""
+
+    def __init__(self, n_plus_one_threshold):
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.count = 0
+        self.total = 0.0
+        self.statements = []
+        self.fingerprints = defaultdict(int)
+        self.culprits = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.count += 1
+            self.total += duration
+            self.statements.append((duration, sql))
+            # sql still has %s placeholders here, so it is already a fingerprint
+            self.fingerprints[sql] += 1
+            if self.fingerprints[sql] == self.n_plus_one_threshold:
+                self.culprits[sql] = self._serializer_in_stack()
+
+    @staticmethod
+    def _serializer_in_stack():
+        """Name the innermost serializer on the stack (only walked once per repeated query)"""
+        frame = sys._getframe(2)
+        while frame is not None:
+            owner = frame.f_locals.get('self')
+            if isinstance(owner, BaseSerializer):
+                return f'{type(owner).__name__}.{frame.f_code.co_name}'
+            frame = frame.f_back
+        return None
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Records query count, DB time, the slowest statements and repeated query
+    fingerprints for a sample of requests. Results go out as a Server-Timing
+    header and one JSON log line on the ``library.instrumentation`` logger;
+    repeated fingerprints are flagged as likely N+1 patterns together with
+    the view and serializer that issued them.
+
+    Controlled by QUERY_INSTRUMENTATION_SAMPLE_RATE (0 removes the middleware).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'QUERY_INSTRUMENTATION_SAMPLE_RATE', 0.0)
+        self.slowest = getattr(settings, 'QUERY_INSTRUMENTATION_SLOWEST', 3)
+        self.n_plus_one_threshold = getattr(settings, 'QUERY_INSTRUMENTATION_N_PLUS_ONE', 5)
+        if self.sample_rate <= 0:
+            raise MiddlewareNotUsed
+
+    def __call__(self, request):
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        collector = QueryCollector(self.n_plus_one_threshold)
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(collector))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        view = self._view_name(request)
+        repeated = [
+            {'sql': sql, 'count': count, 'serializer': collector.culprits.get(sql)}
+            for sql, count in collector.fingerprints.items()
+            if count >= self.n_plus_one_threshold
+        ]
+        slowest = sorted(collector.statements, key=lambda item: item[0], reverse=True)[:self.slowest]
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={collector.total * 1000:.1f};desc="{collector.count} queries"',
+            f'app;dur={elapsed * 1000:.1f}',
+        ])
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': view,
+            'status': response.status_code,
+            'queries': collector.count,
+            'db_ms': round(collector.total * 1000, 2),
+            'total_ms': round(elapsed * 1000, 2),
+            'slowest': [{'ms': round(duration * 1000, 2), 'sql': sql} for duration, sql in slowest],
+            'repeated': repeated,
+        }
+        if repeated:
+            logger.warning('possible N+1 in %s: %s', view, json.dumps(record))
+        else:
+            logger.info(json.dumps(record))
+        return response
+
+    @staticmethod
+    def _view_name(request):
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return None
+        func = match.func
+        view_class = getattr(func, 'cls', None) or getattr(func, 'view_class', None)
+        if view_class is not None:
+            return view_class.__name__
+        return f'{func.__module__}.{func.__name__}'
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Lets PrimaryReplicaRouter send this request's reads to a replica.
+
+    A request that writes sets a short-lived cookie. Requests that carry the
+    cookie read from the primary, so clients see their own writes while the
+    replicas catch up.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+
+    def __call__(self, request):
+        cookie = settings.REPLICA_PIN_COOKIE
+        try:
+            pinned = float(request.COOKIES.get(cookie, 0)) > time.time()
+        except ValueError:
+            pinned = False
+
+        state, token = routers.begin_request(pinned)
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.end_request(token)
+
+        if state.wrote:
+            response.set_cookie(
+                cookie,
+                str(time.time() + settings.REPLICA_PIN_SECONDS),
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:04
+
+import base64
+import binascii
+import hashlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def guess_image_type(data):
+    if data.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if data.startswith(b'GIF87a') or data.startswith(b'GIF89a'):
+        return 'image/gif'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    return 'image/jpeg'
+
+
+def move_covers_to_blobs(apps, schema_editor):
+    Book = apps.get_model('library', 'Book')
+    BookCover = apps.get_model('library', 'BookCover')
+    books = Book.objects.exclude(cover__isnull=True).exclude(cover='').values_list('id', 'cover')
+    for book_id, encoded in books.iterator(chunk_size=100):
+        if encoded.startswith('data:'):
+            encoded = encoded.split(',', 1)[-1]
+        try:
+            data = base64.b64decode(encoded)
+        except (binascii.Error, ValueError):
+            continue
+        etag = hashlib.sha256(data).hexdigest()
+        BookCover.objects.create(
+            book_id=book_id,
+            data=data,
+            content_type=guess_image_type(data),
+            etag=etag,
+            size=len(data),
+        )
+        Book.objects.filter(id=book_id).update(cover_etag=etag)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0002_alter_book_cover'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='cover_etag',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.CreateModel(
+            name='BookCover',
+            fields=[
+                ('book', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='cover_image', serialize=False, to='library.book')),
+                ('data', models.BinaryField()),
+                ('content_type', models.CharField(default='image/jpeg', max_length=50)),
+                ('etag', models.CharField(max_length=64)),
+                ('size', models.PositiveIntegerField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(move_covers_to_blobs, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='book',
+            name='cover',
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:05
+
+import django.db.models.expressions
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_active_loans(apps, schema_editor):
+    Book = apps.get_model('library', 'Book')
+    BorrowedBook = apps.get_model('library', 'BorrowedBook')
+    active = (
+        BorrowedBook.objects.filter(book=OuterRef('pk'), returned=False)
+        .values('book')
+        .annotate(n=Count('id'))
+        .values('n')
+    )
+    Book.objects.update(active_loans=Coalesce(Subquery(active, output_field=IntegerField()), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0003_book_cover_blob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='active_loans',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_active_loans, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(django.db.models.expressions.CombinedExpression(models.F('number_of_copies'), '-', models.F('active_loans')), name='book_available_idx'),
+        ),
+    ]
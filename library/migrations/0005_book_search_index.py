@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_search_index(apps, schema_editor):
+    from library.search import book_terms
+
+    Book = apps.get_model('library', 'Book')
+    BookSearchPosting = apps.get_model('library', 'BookSearchPosting')
+    postings = []
+    for book in Book.objects.prefetch_related('categories').iterator(chunk_size=500):
+        frequencies = book_terms(book)
+        doc_length = sum(frequencies.values())
+        postings.extend(
+            BookSearchPosting(term=term, book_id=book.pk, frequency=frequency, doc_length=doc_length)
+            for term, frequency in frequencies.items()
+        )
+        if len(postings) >= 5000:
+            BookSearchPosting.objects.bulk_create(postings)
+            postings = []
+    BookSearchPosting.objects.bulk_create(postings)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0004_book_active_loans'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookSearchPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('frequency', models.PositiveIntegerField()),
+                ('doc_length', models.PositiveIntegerField()),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_postings', to='library.book')),
+            ],
+            options={
+                'unique_together': {('term', 'book')},
+            },
+        ),
+        migrations.RunPython(build_search_index, migrations.RunPython.noop),
+    ]
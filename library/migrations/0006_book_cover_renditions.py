@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0005_book_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookCoverRendition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('width', models.PositiveSmallIntegerField()),
+                ('format', models.CharField(max_length=10)),
+                ('source_etag', models.CharField(max_length=64)),
+                ('data', models.BinaryField()),
+                ('content_type', models.CharField(max_length=50)),
+                ('etag', models.CharField(max_length=64)),
+                ('size', models.PositiveIntegerField()),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cover_renditions', to='library.book')),
+            ],
+            options={
+                'unique_together': {('book', 'width', 'format')},
+            },
+        ),
+    ]
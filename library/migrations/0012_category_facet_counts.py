@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:40
+
+from django.db import migrations, models
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_category_books(apps, schema_editor):
+    Book = apps.get_model('library', 'Book')
+    Category = apps.get_model('library', 'Category')
+    Through = Book.categories.through
+
+    def per_category(**filters):
+        counts = (
+            Through.objects.filter(category=OuterRef('pk'), **filters)
+            .values('category')
+            .annotate(n=Count('id'))
+            .values('n')
+        )
+        return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+    Category.objects.update(
+        book_count=per_category(),
+        available_book_count=per_category(book__number_of_copies__gt=F('book__active_loans')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0011_category_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='available_book_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='book_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(count_category_books, migrations.RunPython.noop),
+        # ?category= pages walk one category's books in id order; the auto-created
+        # through table only has single-column indexes on each side
+        migrations.RunSQL(
+            'CREATE INDEX library_book_categories_category_book_idx '
+            'ON library_book_categories (category_id, book_id)',
+            'DROP INDEX library_book_categories_category_book_idx',
+        ),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:54
+
+import datetime
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def seed_history_from_loans(apps, schema_editor):
+    # Only each loan's latest borrow and return survive in BorrowedBook, at day precision
+    BorrowedBook = apps.get_model('library', 'BorrowedBook')
+    LoanEvent = apps.get_model('library', 'LoanEvent')
+
+    def midnight(day):
+        return datetime.datetime.combine(day, datetime.time.min, tzinfo=datetime.timezone.utc)
+
+    events = []
+    loans = BorrowedBook.objects.order_by('pk').values_list('user_id', 'book_id', 'borrow_date', 'return_date', 'returned')
+    for user_id, book_id, borrow_date, return_date, returned in loans.iterator(chunk_size=2000):
+        events.append(LoanEvent(user_id=user_id, book_id=book_id, kind='borrow', ts=midnight(borrow_date)))
+        if returned and return_date:
+            events.append(LoanEvent(user_id=user_id, book_id=book_id, kind='return', ts=midnight(return_date)))
+    LoanEvent.objects.bulk_create(sorted(events, key=lambda event: event.ts), batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0013_similar_books'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyBookLoans',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('borrows', models.PositiveIntegerField(default=0)),
+                ('returns', models.PositiveIntegerField(default=0)),
+                ('renewals', models.PositiveIntegerField(default=0)),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_loans', to='library.book')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='daily_book_loans_day_idx')],
+                'unique_together': {('book', 'day')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyCategoryLoans',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('borrows', models.PositiveIntegerField(default=0)),
+                ('returns', models.PositiveIntegerField(default=0)),
+                ('renewals', models.PositiveIntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_loans', to='library.category')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='daily_category_loans_day_idx')],
+                'unique_together': {('category', 'day')},
+            },
+        ),
+        migrations.CreateModel(
+            name='LoanEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('borrow', 'Borrow'), ('return', 'Return'), ('renew', 'Renew')], max_length=10)),
+                ('ts', models.DateTimeField(default=django.utils.timezone.now)),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='loan_events', to='library.book')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='loan_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['book', 'ts'], name='loan_event_book_ts_idx'), models.Index(fields=['user', 'ts'], name='loan_event_user_ts_idx'), models.Index(fields=['ts'], name='loan_event_ts_idx')],
+            },
+        ),
+        migrations.RunPython(seed_history_from_loans, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations
+from django.db.models import Count, F, Q
+
+
+def recount_category_facets(apps, schema_editor):
+    # Same as facets.recount(), on the historical models: counters kept by
+    # earlier releases may have drifted from the through table
+    Book = apps.get_model('library', 'Book')
+    Category = apps.get_model('library', 'Category')
+    Through = Book.categories.through
+
+    rows = Through.objects.values('category_id').annotate(
+        books=Count('book_id'),
+        available=Count('book_id', filter=Q(book__number_of_copies__gt=F('book__active_loans'))),
+    ).values_list('category_id', 'books', 'available')
+    counts = {category_id: (books, available) for category_id, books, available in rows}
+    Category.objects.exclude(pk__in=list(counts)).update(book_count=0, available_book_count=0)
+    for category_id, (books, available) in counts.items():
+        Category.objects.filter(pk=category_id).update(book_count=books, available_book_count=available)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0015_open_loan_date_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(recount_category_facets, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,9 @@
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
-from django.db import models
+import hashlib
+
+from django.db import models, transaction
+from django.db.models import F, Q
+from django.urls import reverse
 from django.utils import timezone
 
 
@@ -49,6 +53,10 @@ class Category(models.Model):
     name = models.CharField(max_length=50, unique=True)
     description = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Facet counters, maintained incrementally by library.facets
+    book_count = models.IntegerField(default=0)
+    available_book_count = models.IntegerField(default=0)
 
     def __str__(self):
         return self.name
@@ -57,17 +65,30 @@ class Category(models.Model):
 # ---------------------
 # BOOK
 # ---------------------
-import base64
+COVER_RENDITION_WIDTHS = (96, 240, 600)  # Thumbnail widths in px, see library.thumbnails
+COVER_RENDITION_FORMATS = ('webp', 'jpeg')
+
+
+class BookQuerySet(models.QuerySet):
+    def with_availability(self):
+        """Annotate each book with its available copy count, computed in the database"""
+        return self.annotate(available=F('number_of_copies') - F('active_loans'))
+
+    def available(self):
+        """Books with at least one copy on the shelf (matches the book_available_idx expression index)"""
+        return self.alias(available=F('number_of_copies') - F('active_loans')).filter(available__gt=0)
+
 
 class Book(models.Model):
     # id = models.CharField(max_length=5, primary_key=True)  # Make sure to generate IDs consistently
     title = models.CharField(max_length=100)
     author = models.CharField(max_length=100)
     categories = models.ManyToManyField(Category, related_name='books')
-    cover = models.TextField(blank=True, null=True)  # Store base64 string here
+    cover_etag = models.CharField(max_length=64, blank=True)  # Hash of the current BookCover, empty if none
     description = models.TextField()
     published_date = models.DateField()
     number_of_copies = models.PositiveIntegerField(default=1)
+    active_loans = models.PositiveIntegerField(default=0)  # Copies currently lent out, see library.circulation
     added_by = models.ForeignKey(
         User,
         on_delete=models.SET_NULL,
@@ -78,27 +99,130 @@ class Book(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = BookQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(F('number_of_copies') - F('active_loans'), name='book_available_idx'),
+            models.Index(fields=['updated_at'], name='book_updated_at_idx'),  # Incremental exports
+        ]
+
     def __str__(self):
         return self.title
 
     def available_copies(self):
-        return self.number_of_copies - self.borrowed_by.filter(returned=False).count()
+        return self.number_of_copies - self.active_loans
+
+    @staticmethod
+    def adjust_active_loans(book_id, delta):
+        """Atomically move a book's active loan counter by delta (call inside a transaction)"""
+        from . import facets  # facets imports this module
+
+        Book.objects.filter(pk=book_id).update(active_loans=F('active_loans') + delta, updated_at=timezone.now())
+        facets.loans_moved([book_id], delta)
 
     def is_available(self):
         return self.available_copies() > 0
 
     def set_cover_from_file(self, file):
-        """Utility to convert an uploaded image file to base64 and save it"""
+        """Store an uploaded image file as this book's cover blob"""
         if file:
-            encoded_string = base64.b64encode(file.read()).decode('utf-8')
-            self.cover = encoded_string
+            self.set_cover_data(file.read(), getattr(file, 'content_type', None))
+
+    def set_cover_data(self, data, content_type=None):
+        """Save raw image bytes as the cover and bump the cover ETag"""
+        etag = hashlib.sha256(data).hexdigest()
+        BookCover.objects.update_or_create(
+            book=self,
+            defaults={
+                'data': data,
+                'content_type': content_type or guess_image_type(data),
+                'etag': etag,
+                'size': len(data),
+            },
+        )
+        self.cover_etag = etag
+        Book.objects.filter(pk=self.pk).update(cover_etag=etag, updated_at=timezone.now())
+
+    def get_cover_url(self, request=None, width=None, fmt=None):
+        """Return the versioned cover endpoint URL (optionally of a resized rendition), or None"""
+        if not self.cover_etag:
+            return None
+        url = f"{reverse('book-cover', args=[self.pk])}?v={self.cover_etag[:16]}"
+        if width:
+            url += f"&w={width}&fmt={fmt or 'jpeg'}"
+        return request.build_absolute_uri(url) if request is not None else url
+
+    def get_cover_renditions(self, request=None):
+        """Return {format: {width: url}} for every thumbnail size, or None if the book has no cover"""
+        if not self.cover_etag:
+            return None
+        return {
+            fmt: {str(width): self.get_cover_url(request, width, fmt) for width in COVER_RENDITION_WIDTHS}
+            for fmt in COVER_RENDITION_FORMATS
+        }
+
+
+def guess_image_type(data):
+    """Sniff the image MIME type from its magic bytes"""
+    if data.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if data.startswith(b'GIF87a') or data.startswith(b'GIF89a'):
+        return 'image/gif'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    return 'image/jpeg'
+
+
+# ---------------------
+# BOOK COVER
+# ---------------------
+class BookCover(models.Model):
+    book = models.OneToOneField(Book, on_delete=models.CASCADE, primary_key=True, related_name='cover_image')
+    data = models.BinaryField()
+    content_type = models.CharField(max_length=50, default='image/jpeg')
+    etag = models.CharField(max_length=64)
+    size = models.PositiveIntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Cover for {self.book_id}"
+
+
+class BookCoverRendition(models.Model):
+    """A resized, re-encoded copy of a BookCover, generated by library.thumbnails"""
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='cover_renditions')
+    width = models.PositiveSmallIntegerField()
+    format = models.CharField(max_length=10)
+    source_etag = models.CharField(max_length=64)  # BookCover.etag this was rendered from
+    data = models.BinaryField()
+    content_type = models.CharField(max_length=50)
+    etag = models.CharField(max_length=64)
+    size = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ('book', 'width', 'format')
+
+    def __str__(self):
+        return f"{self.width}px {self.format} cover for {self.book_id}"
+
 
-    def get_cover_image_data(self):
-        """Return base64 string to be used in HTML img src"""
-        if self.cover:
-            return f"data:image/jpeg;base64,{self.cover}"
-        return None
 
+# ---------------------
+# SEARCH INDEX
+# ---------------------
+class BookSearchPosting(models.Model):
+    """One row per (term, book) of the inverted index maintained by library.search"""
+    term = models.CharField(max_length=64)
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='search_postings')
+    frequency = models.PositiveIntegerField()  # Field-weighted term frequency
+    doc_length = models.PositiveIntegerField()  # Weighted token count of the whole book document
+
+    class Meta:
+        unique_together = ('term', 'book')
+
+    def __str__(self):
+        return f"{self.term} -> {self.book_id}"
 
 
 # ---------------------
@@ -113,14 +237,96 @@ class BorrowedBook(models.Model):
 
     class Meta:
         unique_together = ('user', 'book')
+        indexes = [
+            # Open loans only: the borrow-limit count and active_loans recounts
+            # never touch the (much larger) history of returned loans
+            models.Index(fields=['user'], condition=Q(returned=False), name='borrowed_open_by_user_idx'),
+            models.Index(fields=['book'], condition=Q(returned=False), name='borrowed_open_by_book_idx'),
+            # Dashboard open and overdue loan counts
+            models.Index(fields=['borrow_date'], condition=Q(returned=False), name='borrowed_open_by_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.email} borrowed {self.book.title}"
 
     def return_book(self):
+        """Close this loan and put the copy back. Returns False if it was already returned."""
+        from . import loan_history  # loan_history imports this module
+
+        today = timezone.now().date()
+        with transaction.atomic():
+            closed = BorrowedBook.objects.filter(pk=self.pk, returned=False).update(
+                returned=True, return_date=today
+            )
+            if closed:
+                Book.adjust_active_loans(self.book_id, -1)
+                loan_history.record(LoanEvent.RETURN, self.user_id, [self.book_id])
         self.returned = True
-        self.return_date = timezone.now().date()
-        self.save()
+        self.return_date = today
+        return bool(closed)
+
+
+# ---------------------
+# LOAN HISTORY
+# ---------------------
+class LoanEvent(models.Model):
+    """
+    One circulation change, appended by library.circulation in the same
+    transaction and never updated. BorrowedBook only holds each loan's
+    latest state; this is the history (see library.loan_history).
+    """
+    BORROW = 'borrow'
+    RETURN = 'return'
+    RENEW = 'renew'
+    KIND_CHOICES = [(BORROW, 'Borrow'), (RETURN, 'Return'), (RENEW, 'Renew')]
+
+    # Kept when the user is deleted, so book and category history stays whole
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='loan_events')
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='loan_events')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    ts = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['book', 'ts'], name='loan_event_book_ts_idx'),
+            models.Index(fields=['user', 'ts'], name='loan_event_user_ts_idx'),
+            models.Index(fields=['ts'], name='loan_event_ts_idx'),  # Rollups and exports by time range
+        ]
+
+    def __str__(self):
+        return f"{self.kind} of {self.book_id} by {self.user_id} at {self.ts}"
+
+
+class DailyBookLoans(models.Model):
+    """A book's loan events on one day, rolled up from LoanEvent by library.loan_history"""
+    day = models.DateField()
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='daily_loans')
+    borrows = models.PositiveIntegerField(default=0)
+    returns = models.PositiveIntegerField(default=0)
+    renewals = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('book', 'day')
+        indexes = [models.Index(fields=['day'], name='daily_book_loans_day_idx')]
+
+    def __str__(self):
+        return f"{self.book_id} on {self.day}: {self.borrows} borrowed"
+
+
+class DailyCategoryLoans(models.Model):
+    """Loan events on one day of the books in a category, rolled up by library.loan_history"""
+    day = models.DateField()
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='daily_loans')
+    borrows = models.PositiveIntegerField(default=0)
+    returns = models.PositiveIntegerField(default=0)
+    renewals = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('category', 'day')
+        indexes = [models.Index(fields=['day'], name='daily_category_loans_day_idx')]
+
+    def __str__(self):
+        return f"{self.category_id} on {self.day}: {self.borrows} borrowed"
 
 
 # ---------------------
@@ -135,4 +341,49 @@ class FavoriteBook(models.Model):
         unique_together = ('user', 'book')
 
     def __str__(self):
-        return f"{self.user.email} favorited {self.book.title}"
\ No newline at end of file
+        return f"{self.user.email} favorited {self.book.title}"
+
+
+# ---------------------
+# SIMILAR BOOKS
+# ---------------------
+class SimilarBook(models.Model):
+    """One of a book's top "readers also liked" neighbours, maintained by library.recommendations"""
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='similar_books')
+    similar = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='recommended_with')
+    score = models.FloatField()  # Cosine similarity of the two books' reader sets
+
+    class Meta:
+        unique_together = ('book', 'similar')
+        indexes = [models.Index(fields=['book', '-score'], name='similar_book_rank_idx')]
+
+    def __str__(self):
+        return f"{self.similar_id} is similar to {self.book_id} ({self.score:.3f})"
+
+
+# ---------------------
+# PASSWORD RESET TOKEN
+# ---------------------
+class PasswordResetToken(models.Model):
+    """Outstanding reset token for library.tokens.DatabaseResetTokenStore (only its hash is kept)"""
+    token_hash = models.CharField(max_length=64, unique=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='password_reset_tokens')
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"Reset token for {self.user_id}"
+
+
+# ---------------------
+# REPLICA HEARTBEAT
+# ---------------------
+class ReplicaHeartbeat(models.Model):
+    """Single row stamped on the primary; its age on a replica is that replica's lag (see library.routers)"""
+    beat_at = models.DateTimeField()
+
+    @classmethod
+    def beat(cls):
+        cls.objects.using('default').update_or_create(pk=1, defaults={'beat_at': timezone.now()})
+
+    def __str__(self):
+        return f"Heartbeat at {self.beat_at}"
@@ -0,0 +1,111 @@
+from rest_framework.pagination import Cursor, CursorPagination
+from rest_framework.utils.urls import remove_query_param
+
+
+# Queryset alias that KeysetPagination pages on instead of ``id``
+KEY_ALIAS = 'keyset_id'
+
+
+def _row_id(row):
+    return row['id'] if isinstance(row, dict) else row.id
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination keyed on the primary key.
+    Each page is a ``WHERE id > <cursor> ORDER BY id LIMIT n`` query, so deep
+    pages cost the same as the first one. Cursors are opaque, and clients can
+    pick a page size with ``?page_size=`` up to ``max_page_size``.
+
+    A queryset can alias KEY_ALIAS to a joined column that always equals
+    ``id``, e.g. the through table's book_id in facets.filter_books. Pages
+    then filter and order on that column, so they walk its index.
+    """
+    ordering = 'id'
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    def get_ordering(self, request, queryset, view):
+        if KEY_ALIAS in queryset.query.annotations:
+            return (KEY_ALIAS,)
+        return super().get_ordering(request, queryset, view)
+
+    def _get_position_from_instance(self, instance, ordering):
+        return str(_row_id(instance))  # The key always equals the id
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        Async-ORM version of paginate_queryset for the async read views.
+        Ordering is always the unique ``id`` (or its KEY_ALIAS), so cursors
+        never need an offset.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = bool(self.cursor and self.cursor.reverse)
+        current_position = self.cursor.position if self.cursor else None
+
+        key = self.ordering[0]
+        queryset = queryset.order_by(f'-{key}' if reverse else key)
+        if current_position is not None:
+            queryset = queryset.filter(**{f'{key}__lt' if reverse else f'{key}__gt': current_position})
+        results = [obj async for obj in queryset[:self.page_size + 1]]
+        self.page = results[:self.page_size]
+        has_following_position = len(results) > len(self.page)
+        following_position = str(_row_id(results[-1])) if has_following_position else None
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = current_position is not None
+            self.has_previous = has_following_position
+            self.next_position = current_position
+            self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = current_position is not None
+            self.next_position = following_position
+            self.previous_position = current_position
+        return self.page
+
+
+class RankedPagination(KeysetPagination):
+    """
+    Pages through an already-ranked list of items (e.g. search hits) using
+    the same opaque cursor format. The cursor carries the offset into the
+    ranked list, which is bounded by the search result limit.
+    """
+    offset_cutoff = None
+
+    def paginate_list(self, items, request):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        cursor = self.decode_cursor(request)
+        self.offset = cursor.offset if cursor else 0
+        self.has_next = self.offset + self.page_size < len(items)
+        return items[self.offset:self.offset + self.page_size]
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(Cursor(offset=self.offset + self.page_size, reverse=False, position=None))
+
+    def get_previous_link(self):
+        if self.offset <= 0:
+            return None
+        if self.offset <= self.page_size:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(Cursor(offset=self.offset - self.page_size, reverse=False, position=None))
+
+
+class HistoryPagination(CursorPagination):
+    """
+    Newest-first cursor pagination over append-only event rows. Pages are
+    ``WHERE ts < <cursor> ORDER BY ts DESC`` walks of a (owner, ts) index;
+    events sharing a timestamp are told apart by the cursor offset.
+    """
+    ordering = ('-ts', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = 500
@@ -0,0 +1,231 @@
+"""
+"Readers also liked" recommendations from favorite and loan co-occurrence.
+
+A reader interacted with a book if they favorited or ever borrowed it. Two
+books are similar when the same readers interacted with both: the score is
+the cosine similarity of their reader sets,
+
+    readers of both / sqrt(readers of a * readers of b)
+
+The top RECOMMENDATION_NEIGHBOURS neighbours of every book are stored as
+SimilarBook rows, so the similar-books and per-user recommendation
+endpoints are single indexed queries.
+
+``rebuild()`` recomputes every row (see the rebuild_recommendations
+command). New favorites and loans are folded in after commit on a
+background thread (``interactions_added``). That is exact for the book
+that gained a reader and for its links to that reader's other books.
+Other books that already list it keep their row with its new score, but
+are not re-ranked until the next rebuild.
+"""
+import heapq
+import logging
+import math
+import threading
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count, F, Q, Sum
+
+from .models import Book, BorrowedBook, FavoriteBook, SimilarBook
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 2000
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _neighbours():
+    return settings.RECOMMENDATION_NEIGHBOURS
+
+
+# ---------------------
+# FULL REBUILD
+# ---------------------
+def _reader_books():
+    """Yield (user_id, set of book ids) for every reader, streamed in user order"""
+    streams = [
+        model.objects.order_by('user_id', 'book_id').values_list('user_id', 'book_id').iterator(chunk_size=BATCH_SIZE)
+        for model in (FavoriteBook, BorrowedBook)
+    ]
+    for user_id, rows in groupby(heapq.merge(*streams), key=itemgetter(0)):
+        yield user_id, {book_id for _, book_id in rows}
+
+
+def rebuild():
+    """Recompute every book's neighbours from scratch. Returns the number of rows written."""
+    readers = Counter()
+    together = defaultdict(Counter)
+    for _, book_ids in _reader_books():
+        book_ids = sorted(book_ids)
+        readers.update(book_ids)
+        for i, a in enumerate(book_ids):
+            for b in book_ids[i + 1:]:
+                together[a][b] += 1
+                together[b][a] += 1
+
+    rows = []
+    for book_id, counts in together.items():
+        scores = {
+            other: shared / math.sqrt(readers[book_id] * readers[other])
+            for other, shared in counts.items()
+        }
+        rows.extend(_rows(book_id, scores))
+
+    with transaction.atomic():
+        SimilarBook.objects.all().delete()
+        SimilarBook.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+    return len(rows)
+
+
+def _rows(book_id, scores):
+    best = heapq.nlargest(_neighbours(), scores.items(), key=lambda item: (item[1], -item[0]))
+    return [SimilarBook(book_id=book_id, similar_id=other, score=score) for other, score in best]
+
+
+# ---------------------
+# INCREMENTAL UPDATES
+# ---------------------
+def _reader_counts(book_ids):
+    """{book_id: distinct readers}, counting a reader who both favorited and borrowed once"""
+    counts = Counter()
+    for model in (FavoriteBook, BorrowedBook):
+        counts.update(dict(
+            model.objects.filter(book_id__in=book_ids).values('book').annotate(n=Count('id')).values_list('book', 'n')
+        ))
+    both = (
+        BorrowedBook.objects.filter(book_id__in=book_ids, user__favorite_books__book=F('book'))
+        .values('book').annotate(n=Count('id')).values_list('book', 'n')
+    )
+    counts.subtract(dict(both))
+    return counts
+
+
+def scores_for(book_id):
+    """{other book id: similarity} for every book sharing a reader with book_id"""
+    readers = set()
+    for model in (FavoriteBook, BorrowedBook):
+        readers.update(model.objects.filter(book_id=book_id).values_list('user_id', flat=True))
+    if not readers:
+        return {}
+    pairs = set()
+    for model in (FavoriteBook, BorrowedBook):
+        pairs.update(
+            model.objects.filter(user_id__in=readers).exclude(book_id=book_id).values_list('user_id', 'book_id')
+        )
+    together = Counter(other for _, other in pairs)
+    counts = _reader_counts([book_id, *together])
+    return {
+        other: shared / math.sqrt(counts[book_id] * counts[other])
+        for other, shared in together.items()
+    }
+
+
+def update_book(book_id, linked_book_ids=()):
+    """
+    Refresh the neighbours of a book that gained a reader. linked_book_ids
+    are that reader's other books: their similarity to book_id went up, so
+    it may now belong in their lists.
+    """
+    scores = scores_for(book_id)
+    with transaction.atomic():
+        SimilarBook.objects.filter(book_id=book_id).delete()
+        SimilarBook.objects.bulk_create(_rows(book_id, scores))
+
+        # book_id has more readers now, so every score pointing at it moved
+        pointing = list(SimilarBook.objects.filter(similar_id=book_id))
+        for row in pointing:
+            row.score = scores.get(row.book_id, 0)
+        SimilarBook.objects.bulk_update(pointing, ['score'], batch_size=BATCH_SIZE)
+
+        listed = {row.book_id for row in pointing}
+        for other in linked_book_ids:
+            if other not in listed and other in scores:
+                _offer(other, book_id, scores[other])
+
+
+def _offer(book_id, candidate_id, score):
+    """Add candidate to book_id's neighbours if it ranks in the top RECOMMENDATION_NEIGHBOURS"""
+    current = list(SimilarBook.objects.filter(book_id=book_id).order_by('-score').values_list('id', 'score'))
+    if len(current) < _neighbours():
+        SimilarBook.objects.create(book_id=book_id, similar_id=candidate_id, score=score)
+    elif score > current[-1][1]:
+        SimilarBook.objects.filter(pk=current[-1][0]).delete()
+        SimilarBook.objects.create(book_id=book_id, similar_id=candidate_id, score=score)
+
+
+def _run(user_id, book_ids):
+    close_old_connections()
+    try:
+        history = set()
+        for model in (FavoriteBook, BorrowedBook):
+            history.update(model.objects.filter(user_id=user_id).values_list('book_id', flat=True))
+        for book_id in book_ids:
+            update_book(book_id, history - {book_id})
+    except Exception:
+        logger.exception('Failed to update recommendations for user %s', user_id)
+    finally:
+        close_old_connections()
+
+
+def executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'RECOMMENDATION_WORKERS', 1),
+                thread_name_prefix='recommendations',
+            )
+        return _executor
+
+
+def drain():
+    """Wait for every queued neighbour update to finish; the next executor() call starts a new pool"""
+    global _executor
+    with _executor_lock:
+        pool, _executor = _executor, None
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+
+def interactions_added(user_id, book_ids):
+    """Queue neighbour updates for a reader's new favorites or loans, after the current transaction commits"""
+    book_ids = list(book_ids)
+    if book_ids:
+        transaction.on_commit(lambda: executor().submit(_run, user_id, book_ids))
+
+
+# ---------------------
+# QUERIES
+# ---------------------
+def similar_books(book_id, queryset=None):
+    """Books most similar to book_id, best first, annotated with ``similarity``"""
+    queryset = Book.objects.all() if queryset is None else queryset
+    return (
+        queryset.filter(recommended_with__book_id=book_id)
+        .annotate(similarity=F('recommended_with__score'))
+        .order_by('-similarity', 'id')
+    )
+
+
+def for_user(user, queryset=None):
+    """
+    Books similar to any the user favorited or borrowed, minus those, ranked
+    by summed similarity and annotated with ``similarity``
+    """
+    queryset = Book.objects.all() if queryset is None else queryset
+    favorites = FavoriteBook.objects.filter(user=user).values('book_id')
+    loans = BorrowedBook.objects.filter(user=user).values('book_id')
+    return (
+        queryset.filter(Q(recommended_with__book_id__in=favorites) | Q(recommended_with__book_id__in=loans))
+        .exclude(pk__in=favorites)
+        .exclude(pk__in=loans)
+        .annotate(similarity=Sum('recommended_with__score'))
+        .order_by('-similarity', 'id')
+    )
@@ -0,0 +1,124 @@
+"""
+Primary/replica database routing.
+
+Writes always go to ``default``. Reads made while handling a request go to
+one of DATABASE_REPLICAS, except when:
+
+* they run inside a transaction on the primary,
+* the request, or a request from the same client in the last
+  REPLICA_PIN_SECONDS, wrote something, so it must see its own writes, or
+* no replica is healthy, i.e. reachable and at most REPLICA_MAX_LAG seconds
+  behind according to its ReplicaHeartbeat row.
+
+Outside requests (management commands, background threads) everything stays
+on the primary. ReplicaRoutingMiddleware turns routing on for a request.
+"""
+import contextvars
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.utils import timezone
+
+logger = logging.getLogger('library.routers')
+
+
+class RoutingState:
+    """Per-request routing flags, shared by every context the request runs in"""
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+_state = contextvars.ContextVar('library_routing_state', default=None)
+
+
+def begin_request(pinned=False):
+    """Enable replica reads for the current request; returns a token for end_request"""
+    state = RoutingState(pinned)
+    return state, _state.set(state)
+
+
+def end_request(token):
+    _state.reset(token)
+
+
+class ReplicaHealth:
+    """Caches a per-replica health verdict for REPLICA_CHECK_INTERVAL seconds"""
+
+    def __init__(self):
+        self._verdicts = {}
+        self._lock = threading.Lock()
+
+    def is_healthy(self, alias):
+        now = time.monotonic()
+        with self._lock:
+            verdict = self._verdicts.get(alias)
+            if verdict is not None and now - verdict[0] < settings.REPLICA_CHECK_INTERVAL:
+                return verdict[1]
+            # Claim the check; until it finishes other threads reuse the old
+            # verdict (or the primary, if there is none yet)
+            self._verdicts[alias] = (now, verdict[1] if verdict else False)
+        healthy = self.probe(alias)
+        with self._lock:
+            self._verdicts[alias] = (time.monotonic(), healthy)
+        return healthy
+
+    def probe(self, alias):
+        from .models import ReplicaHeartbeat
+
+        try:
+            beat_at = ReplicaHeartbeat.objects.using(alias).values_list('beat_at', flat=True).first()
+        except DatabaseError as exc:
+            logger.warning('Replica %s is unreachable, reading from the primary: %s', alias, exc)
+            return False
+        if beat_at is None:
+            logger.warning('Replica %s has no heartbeat, reading from the primary', alias)
+            return False
+        lag = (timezone.now() - beat_at).total_seconds()
+        if lag > settings.REPLICA_MAX_LAG:
+            logger.warning('Replica %s is %.1fs behind, reading from the primary', alias, lag)
+            return False
+        return True
+
+    def reset(self):
+        with self._lock:
+            self._verdicts.clear()
+
+
+replica_health = ReplicaHealth()
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if (
+            state is None
+            or state.pinned
+            or state.wrote
+            or not settings.DATABASE_REPLICAS
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        healthy = [alias for alias in settings.DATABASE_REPLICAS if replica_health.is_healthy(alias)]
+        return random.choice(healthy) if healthy else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary, not from migrate
+        return db not in settings.DATABASE_REPLICAS
@@ -0,0 +1,250 @@
+"""
+Inverted-index full-text search over books.
+
+Each book is tokenized from its title, author, description and category
+names into BookSearchPosting rows (term -> book, weighted frequency).
+Queries are matched term by term (the last term as a prefix, for
+search-as-you-type) and ranked with BM25.
+"""
+import math
+import re
+import unicodedata
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import connections, router, transaction
+from django.db.models import Case, Count, F, FloatField, Q, Sum, Value, When
+
+from .models import Book, BookSearchPosting
+
+FIELD_WEIGHTS = {
+    'title': 3,
+    'author': 2,
+    'categories': 2,
+    'description': 1,
+}
+
+STOPWORDS = frozenset(
+    'a an and are as at be by for from in into is it of on or the to with'.split()
+)
+
+MAX_TERM_LENGTH = 64
+MAX_PREFIX_EXPANSIONS = 50
+MAX_RESULTS = 1000
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+CORPUS_STATS_CACHE_KEY = 'library:search:corpus-stats'
+CORPUS_STATS_TTL = 300
+
+_token_re = re.compile(r'\w+')
+
+
+def fold(text):
+    """Lower-case and strip diacritics ("Émile" -> "emile")"""
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+
+
+def tokenize(text):
+    """Split text into folded index terms, dropping stopwords"""
+    return [
+        token[:MAX_TERM_LENGTH]
+        for token in _token_re.findall(fold(text or ''))
+        if token not in STOPWORDS
+    ]
+
+
+def book_terms(book, category_names=None):
+    """Return the field-weighted term frequencies for a book"""
+    if category_names is None:
+        category_names = [category.name for category in book.categories.all()]
+    fields = {
+        'title': book.title,
+        'author': book.author,
+        'description': book.description,
+        'categories': ' '.join(category_names),
+    }
+    frequencies = Counter()
+    for field, text in fields.items():
+        for token in tokenize(text):
+            frequencies[token] += FIELD_WEIGHTS[field]
+    return frequencies
+
+
+def _postings_for(book, category_names=None):
+    frequencies = book_terms(book, category_names)
+    doc_length = sum(frequencies.values())
+    return [
+        BookSearchPosting(term=term, book_id=book.pk, frequency=frequency, doc_length=doc_length)
+        for term, frequency in frequencies.items()
+    ]
+
+
+def index_book(book):
+    """(Re)build the postings of a single book"""
+    with transaction.atomic():
+        BookSearchPosting.objects.filter(book_id=book.pk).delete()
+        BookSearchPosting.objects.bulk_create(_postings_for(book))
+    # corpus_stats is left to expire: one book barely moves the BM25 averages,
+    # and recounting them scans every posting
+
+
+def index_books(book_ids):
+    """Reindex several books, e.g. every book of a renamed category"""
+    for book in Book.objects.filter(pk__in=list(book_ids)).prefetch_related('categories'):
+        index_book(book)
+
+
+def index_new_books(books, category_names):
+    """
+    Index books that have just been bulk-inserted and have no postings yet.
+    ``category_names`` maps book id to category names, so no queries are needed.
+    Rows go straight to executemany: at millions of postings, building model
+    instances for bulk_create costs more than tokenizing.
+    """
+    rows = []
+    for book in books:
+        frequencies = book_terms(book, category_names.get(book.pk, ()))
+        doc_length = sum(frequencies.values())
+        rows.extend((term, book.pk, frequency, doc_length) for term, frequency in frequencies.items())
+
+    connection = connections[router.db_for_write(BookSearchPosting)]
+    opts = BookSearchPosting._meta
+    columns = ', '.join(
+        connection.ops.quote_name(opts.get_field(name).column)
+        for name in ('term', 'book', 'frequency', 'doc_length')
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {connection.ops.quote_name(opts.db_table)} ({columns}) VALUES (%s, %s, %s, %s)',
+            rows,
+        )
+    cache.delete(CORPUS_STATS_CACHE_KEY)
+
+
+def rebuild_index(batch_size=1000):
+    """Drop and rebuild the whole index in batches. Returns the number of books indexed."""
+    indexed = 0
+    BookSearchPosting.objects.all().delete()
+    books = Book.objects.only('id', 'title', 'author', 'description').order_by('id')
+    last_id = 0
+    while True:
+        batch = list(books.filter(id__gt=last_id).prefetch_related('categories')[:batch_size])
+        if not batch:
+            break
+        postings = []
+        for book in batch:
+            postings.extend(_postings_for(book))
+        BookSearchPosting.objects.bulk_create(postings, batch_size=batch_size)
+        indexed += len(batch)
+        last_id = batch[-1].id
+    cache.delete(CORPUS_STATS_CACHE_KEY)
+    return indexed
+
+
+def corpus_stats():
+    """
+    Return (indexed book count, average document length). Counting them scans
+    the whole index, so they are cached for CORPUS_STATS_TTL and only dropped
+    early by bulk indexing, not by single-book edits.
+    """
+    stats = cache.get(CORPUS_STATS_CACHE_KEY)
+    if stats is None:
+        totals = BookSearchPosting.objects.aggregate(
+            books=Count('book', distinct=True), length=Sum('frequency')
+        )
+        books = totals['books'] or 0
+        stats = (books, (totals['length'] or 0) / books if books else 0.0)
+        cache.set(CORPUS_STATS_CACHE_KEY, stats, CORPUS_STATS_TTL)
+    return stats
+
+
+def _prefix_range(token):
+    # A range scan on the (term, book) index instead of LIKE 'token%'
+    return {'term__gte': token, 'term__lt': token + '\uffff'}
+
+
+def _document_frequencies(terms):
+    """{term: number of books containing it}, counted on the (term, book) index"""
+    return dict(
+        BookSearchPosting.objects.filter(term__in=terms)
+        .values('term').annotate(df=Count('book_id')).values_list('term', 'df')
+    )
+
+
+def _books_with_all(terms):
+    """Subquery of the ids of books that contain every one of terms"""
+    return (
+        BookSearchPosting.objects.filter(term__in=terms)
+        .values('book_id').annotate(matched=Count('id')).filter(matched=len(terms))
+        .values('book_id')
+    )
+
+
+def prefix_expansions(token, full_terms=()):
+    """
+    Up to MAX_PREFIX_EXPANSIONS indexed terms starting with token. Only terms
+    of books that contain every full term count, and the terms found in the
+    most such books come first, so the cap drops the rarest expansions
+    rather than the alphabetically last ones.
+    """
+    postings = BookSearchPosting.objects.filter(**_prefix_range(token))
+    if full_terms:
+        postings = postings.filter(book_id__in=_books_with_all(full_terms))
+    return (
+        postings.values('term').annotate(books=Count('book_id'))
+        .order_by('-books', 'term').values_list('term', flat=True)[:MAX_PREFIX_EXPANSIONS]
+    )
+
+
+def search_books(query, limit=MAX_RESULTS):
+    """
+    Return up to ``limit`` book ids matching every query term, best first.
+    The last term also matches as a prefix unless the query ends with a space.
+    """
+    tokens = list(dict.fromkeys(tokenize(query)))
+    if not tokens:
+        return []
+    prefix = tokens.pop() if not query[-1:].isspace() else None
+
+    total_books, avg_length = corpus_stats()
+    if not total_books:
+        return []
+
+    # Terms each query token matches: itself, or its prefix expansions
+    token_terms = [[token] for token in tokens]
+    if prefix is not None:
+        token_terms.append(list(prefix_expansions(prefix, tokens)))
+    if not all(token_terms):
+        return []
+    # A term matched by several tokens ("harry har") scores once for each
+    weights = Counter(term for terms in token_terms for term in terms)
+    frequencies = _document_frequencies(list(weights))
+    if len(frequencies) < len(weights):
+        return []
+
+    # BM25, summed over the matching postings of each book in a single query
+    idf = Case(
+        *(
+            When(term=term, then=Value(weight * math.log(1 + (total_books - df + 0.5) / (df + 0.5))))
+            for term, weight in weights.items() for df in [frequencies[term]]
+        ),
+        output_field=FloatField(),
+    )
+    norm = Value(BM25_K1 * (1 - BM25_B)) + Value(BM25_K1 * BM25_B / avg_length) * F('doc_length')
+    term_score = idf * F('frequency') * Value(BM25_K1 + 1) / (F('frequency') + norm)
+    # Every token must match: one conditional count per token
+    matched = {
+        f'matched_{i}': Count('id', filter=Q(term__in=terms)) for i, terms in enumerate(token_terms)
+    }
+    ranked = (
+        BookSearchPosting.objects.filter(term__in=list(weights))
+        .values('book_id')
+        .annotate(score=Sum(term_score, output_field=FloatField()), **matched)
+        .filter(**{f'{name}__gt': 0 for name in matched})
+        .order_by('-score', 'book_id')
+        .values_list('book_id', flat=True)
+    )
+    return list(ranked[:limit])
@@ -1,7 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from .models import Book, BorrowedBook, FavoriteBook, Category
-import base64
+from .models import Book, BorrowedBook, FavoriteBook, Category, LoanEvent
+from .cache import book_cache
 
 
 User = get_user_model()
@@ -10,6 +10,7 @@ class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = '__all__'
+        read_only_fields = ['book_count', 'available_book_count']  # See library.facets
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -43,36 +44,146 @@ class AdminUserSerializer(serializers.ModelSerializer):
         return super().update(instance, validated_data)
 
 
-class BookSerializer(serializers.ModelSerializer):
+def _sparse_params(request):
+    """(fields, omit) query parameters of a GET, or None if it asked for full payloads"""
+    if request is None or request.method not in ('GET', 'HEAD'):
+        return None
+    params = getattr(request, 'query_params', request.GET)
+    fields, omit = params.get('fields'), params.get('omit')
+    return (fields, omit) if fields or omit else None
+
+
+def requested_fields(request, available):
+    """The field names picked by ?fields=a,b and/or ?omit=c on a GET, or None for all of them"""
+    params = _sparse_params(request)
+    if params is None:
+        return None
+    fields, omit = params
+    selected = set(available)
+    if fields:
+        selected &= {name.strip() for name in fields.split(',')}
+    if omit:
+        selected -= {name.strip() for name in omit.split(',')}
+    return selected
+
+
+class SparseFieldsMixin:
+    """
+    Sparse fieldsets: GET requests can trim the representation with
+    ``?fields=`` or ``?omit=``. Dropped SerializerMethodFields are never called,
+    and ``sparse_queryset()`` loads only the columns the remaining fields read.
+
+    ``field_columns`` lists the columns read by fields whose source is not a
+    plain model field (method fields, mostly). ``always_load`` is loaded
+    regardless, e.g. what the payload cache keys on.
+    """
+    field_columns = {}
+    always_load = ('id',)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        selected = requested_fields(self.context.get('request'), self.fields)
+        if selected is not None:
+            for name in set(self.fields) - selected:
+                self.fields.pop(name)
+
+    @classmethod
+    def sparse_queryset(cls, queryset, request):
+        """Restrict queryset to the columns (and prefetches) the requested fields need"""
+        if _sparse_params(request) is None:
+            return queryset  # Without building a serializer: this runs on every list request
+
+        serializer = cls(context={'request': request})
+
+        columns, prefetches = set(cls.always_load), []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if name in cls.field_columns:
+                columns.update(cls.field_columns[name])
+                continue
+            path = field.source.replace('.', '__')
+            model_field = queryset.model._meta.get_field(path.split('__')[0])
+            if model_field.many_to_many:
+                prefetches.append(path)
+            else:
+                columns.add(path)
+
+        # Drop prefetches (e.g. categories) that no remaining field reads
+        lookups = [lookup for lookup in queryset._prefetch_related_lookups if lookup in prefetches]
+        return queryset.prefetch_related(None).prefetch_related(*lookups).only(*columns)
+
+
+class CachedBookListSerializer(serializers.ListSerializer):
+    """Serializes book lists through the versioned payload cache"""
+
+    def to_representation(self, data):
+        books = list(data.all() if hasattr(data, 'all') else data)
+        return book_cache.render_many(books, self.child)
+
+
+class BookSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     categories = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
     available_copies = serializers.SerializerMethodField()
+    cover_url = serializers.SerializerMethodField()
+    cover_renditions = serializers.SerializerMethodField()
+
+    field_columns = {
+        'available_copies': ['number_of_copies', 'active_loans'],
+        'cover_url': ['cover_etag'],
+        'cover_renditions': ['cover_etag'],
+    }
+    always_load = ('id', 'updated_at', 'active_loans')  # Payload cache key
 
     class Meta:
         model = Book
-        fields = '__all__'
+        exclude = ['cover_etag', 'active_loans']
+        list_serializer_class = CachedBookListSerializer
 
     def get_available_copies(self, obj):
         return obj.available_copies()
 
+    def get_cover_url(self, obj):
+        return obj.get_cover_url(self.context.get('request'))
 
-class AdminBookSerializer(serializers.ModelSerializer):
-    cover = serializers.ImageField(write_only=True, required=False) 
-    cover_string = serializers.CharField(read_only=True)  
+    def get_cover_renditions(self, obj):
+        return obj.get_cover_renditions(self.context.get('request'))
+
+
+class AdminBookSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    cover = serializers.ImageField(write_only=True, required=False)
+    cover_url = serializers.SerializerMethodField()
+    cover_renditions = serializers.SerializerMethodField()
+
+    field_columns = {
+        'cover_url': ['cover_etag'],
+        'cover_renditions': ['cover_etag'],
+    }
 
     class Meta:
         model = Book
-        fields = '__all__'
+        exclude = ['cover_etag', 'active_loans']
+
+    def get_cover_url(self, obj):
+        return obj.get_cover_url(self.context.get('request'))
+
+    def get_cover_renditions(self, obj):
+        return obj.get_cover_renditions(self.context.get('request'))
 
     def create(self, validated_data):
         image_file = validated_data.pop('cover', None)
-        if image_file:
-            
-            image_data = base64.b64encode(image_file.read()).decode('utf-8')
-            validated_data['cover'] = image_data
-        return super().create(validated_data)
+        book = super().create(validated_data)
+        book.set_cover_from_file(image_file)
+        return book
+
+    def update(self, instance, validated_data):
+        image_file = validated_data.pop('cover', None)
+        book = super().update(instance, validated_data)
+        book.set_cover_from_file(image_file)
+        return book
 
 
-class BorrowedBookSerializer(serializers.ModelSerializer):
+class BorrowedBookSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     book = serializers.PrimaryKeyRelatedField(
         queryset=Book.objects.all(), write_only=True
     )
@@ -80,34 +191,36 @@ class BorrowedBookSerializer(serializers.ModelSerializer):
     title = serializers.CharField(source='book.title', read_only=True)
     author = serializers.CharField(source='book.author', read_only=True)
     cover_url = serializers.SerializerMethodField()
-    
+    cover_renditions = serializers.SerializerMethodField()
+
+    field_columns = {
+        'cover_url': ['book__cover_etag'],
+        'cover_renditions': ['book__cover_etag'],
+    }
+    always_load = ('id', 'book')  # select_related('book') needs the FK loaded
+
     def get_cover_url(self, obj):
-        return obj.book.get_cover_image_data()
+        return obj.book.get_cover_url(self.context.get('request'))
+
+    def get_cover_renditions(self, obj):
+        return obj.book.get_cover_renditions(self.context.get('request'))
 
     class Meta:
         model = BorrowedBook
-        fields = ['book', 'book_id', 'title', 'author', 'cover_url', 'borrow_date', 'return_date', 'returned']
-        read_only_fields = ['book_id', 'title', 'author', 'cover_url', 'borrow_date', 'return_date', 'returned']
+        fields = ['book', 'book_id', 'title', 'author', 'cover_url', 'cover_renditions', 'borrow_date', 'return_date', 'returned']
+        read_only_fields = ['book_id', 'title', 'author', 'cover_url', 'cover_renditions', 'borrow_date', 'return_date', 'returned']
 
-    def create(self, validated_data):
-        book = validated_data['book']
-        # Decrease number_of_copies only when creating a new borrowed record
-        if book.available_copies() > 0:
-            book.number_of_copies -= 1
-            book.save()
-        return super().create(validated_data)
-
-    def update(self, instance, validated_data):
-        if 'returned' in validated_data and validated_data['returned']:
-            # Increase number_of_copies only when returning a book
-            instance.book.number_of_copies += 1
-            instance.book.save()
-        return super().update(instance, validated_data)
 
+class LoanEventSerializer(serializers.ModelSerializer):
+    title = serializers.CharField(source='book.title', read_only=True)
 
+    class Meta:
+        model = LoanEvent
+        fields = ['id', 'kind', 'ts', 'user_id', 'book_id', 'title']
+        read_only_fields = fields
 
 
-class FavoriteBookSerializer(serializers.ModelSerializer):
+class FavoriteBookSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     # Write-only book field for POST
     book = serializers.PrimaryKeyRelatedField(queryset=Book.objects.all(), write_only=True)
 
@@ -116,14 +229,24 @@ class FavoriteBookSerializer(serializers.ModelSerializer):
     book_title = serializers.CharField(source='book.title', read_only=True)
     book_author = serializers.CharField(source='book.author', read_only=True)
     book_cover_url = serializers.SerializerMethodField()
+    book_cover_renditions = serializers.SerializerMethodField()
+
+    field_columns = {
+        'book_cover_url': ['book__cover_etag'],
+        'book_cover_renditions': ['book__cover_etag'],
+    }
+    always_load = ('id', 'book')  # select_related('book') needs the FK loaded
 
     class Meta:
         model = FavoriteBook
-        fields = ['book', 'book_id', 'book_title', 'book_author', 'book_cover_url']
-        read_only_fields = ['book_id', 'book_title', 'book_author', 'book_cover_url']
+        fields = ['book', 'book_id', 'book_title', 'book_author', 'book_cover_url', 'book_cover_renditions']
+        read_only_fields = ['book_id', 'book_title', 'book_author', 'book_cover_url', 'book_cover_renditions']
 
     def get_book_cover_url(self, obj):
-        return obj.book.get_cover_image_data()  # or whatever method you use to get base64 cover
+        return obj.book.get_cover_url(self.context.get('request'))
+
+    def get_book_cover_renditions(self, obj):
+        return obj.book.get_cover_renditions(self.context.get('request'))
 
     def validate(self, data):
         user = self.context['request'].user
@@ -45,6 +45,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'library.middleware.QueryInstrumentationMiddleware',  # Off unless QUERY_INSTRUMENTATION_SAMPLE_RATE > 0
+    'library.middleware.ReplicaRoutingMiddleware',  # Off unless DATABASE_REPLICAS is set
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -56,6 +58,23 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
 ]
 
+# Per-request SQL instrumentation (library/middleware.py).
+# Fraction of requests to instrument: 0 disables it, 1 instruments everything.
+QUERY_INSTRUMENTATION_SAMPLE_RATE = float(os.environ.get('QUERY_INSTRUMENTATION_SAMPLE_RATE', 0))
+QUERY_INSTRUMENTATION_SLOWEST = 3  # Slowest statements included in the log line
+QUERY_INSTRUMENTATION_N_PLUS_ONE = 5  # Repeats of one statement that flag a likely N+1
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'library.instrumentation': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
 CORS_ALLOWED_ORIGINS = [
     "http://127.0.0.1:5500",
     "http://localhost:5500",
@@ -91,6 +110,11 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'library.wsgi.application'
 
+# Serve book list, search and current user from the async views in
+# library/async_views.py. Only useful under ASGI, e.g.:
+#   LIBRARY_ASYNC_VIEWS=1 uvicorn library.asgi:application
+ASYNC_READ_VIEWS = os.environ.get('LIBRARY_ASYNC_VIEWS') == '1'
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -99,18 +123,76 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Take the write lock at BEGIN so read-then-write transactions
+            # (borrow/return) queue up instead of failing with "database is locked"
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        # Tests use a file: the shared in-memory test database fails concurrent
+        # writers with "table is locked" instead of letting them wait, and the
+        # circulation tests borrow from several threads at once
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+    }
+}
+
+# Read replicas (library/routers.py). To try them locally with two SQLite
+# files, point LIBRARY_REPLICA_DB at a second file and keep it in sync with
+# `python manage.py sync_sqlite_replicas --interval 2`.
+if os.environ.get('LIBRARY_REPLICA_DB'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.environ['LIBRARY_REPLICA_DB'],
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['library.routers.PrimaryReplicaRouter']
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+REPLICA_MAX_LAG = 5  # Seconds behind the primary before a replica is skipped
+REPLICA_CHECK_INTERVAL = 2  # Seconds between health checks, per process and replica
+REPLICA_PIN_SECONDS = 10  # Read-your-writes window after a client writes
+REPLICA_PIN_COOKIE = 'library_primary'
+
+# Caches
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 20000,  # LRU-evicted past this size
+        },
     }
 }
 
+# Rendered book payloads (library/cache.py)
+BOOK_CACHE_ALIAS = 'default'
+BOOK_CACHE_TIMEOUT = 60 * 60
+
+# Typeahead suggestions (library/suggest.py). Each worker keeps its own
+# prefix index and rebuilds it every SEARCH_SUGGEST_REFRESH seconds, so
+# popularity and edits made by other workers show up within that time.
+SEARCH_SUGGEST_MAX_ENTRIES = 100_000  # Roughly 0.6 kB each
+SEARCH_SUGGEST_REFRESH = 10 * 60
+
+# Signed API tokens (library/authentication.py). The user cache is per
+# process with LocMemCache, so a change made in one worker can take up to
+# API_TOKEN_USER_CACHE_TIMEOUT seconds to reach the others.
+API_TOKEN_TTL = 12 * 60 * 60
+API_TOKEN_USER_CACHE_ALIAS = 'default'
+API_TOKEN_USER_CACHE_TIMEOUT = 60
+
 # Add REST framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
-        # 'rest_framework.authentication.TokenAuthentication',
+        'library.authentication.SignedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
-    ]
+    ],
+    'DEFAULT_PAGINATION_CLASS': 'library.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
 }
 
 
@@ -150,6 +232,40 @@ AUTHENTICATION_BACKENDS = [
     'library.backends.EmailBackend',  # ✅ make sure path matches your app
 ]
 
+# EmailBackend.get_user serves users from a per-process LRU (library/backends.py).
+# Edits reach other workers through AUTH_USER_CACHE_ALIAS, which only works
+# when that cache is shared (e.g. Redis). With a per-process cache such as
+# LocMemCache, entries live AUTH_USER_CACHE_LOCAL_TIMEOUT seconds instead:
+# that long, other workers may still see a deactivated user or old password.
+AUTH_USER_CACHE_SIZE = 1024
+AUTH_USER_CACHE_TIMEOUT = 5 * 60
+AUTH_USER_CACHE_LOCAL_TIMEOUT = 5
+AUTH_USER_CACHE_ALIAS = 'default'
+
+# Sessions are read from the cache and written through to django_session,
+# so they survive restarts and cache evictions
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'default'
+
+# Password reset tokens (library/tokens.py). CacheResetTokenStore needs a
+# cache shared by all workers (e.g. Redis) to work across processes.
+PASSWORD_RESET_TOKEN_STORE = 'library.tokens.DatabaseResetTokenStore'
+PASSWORD_RESET_TOKEN_TTL = 24 * 60 * 60
+
+# Background threads that render cover thumbnails (library/thumbnails.py)
+COVER_RENDITION_WORKERS = 2
+
+# "Readers also liked" (library/recommendations.py): neighbours kept per book,
+# and the background thread that folds new favorites and loans into them
+RECOMMENDATION_NEIGHBOURS = 20
+RECOMMENDATION_WORKERS = 1
+
+# Admin dashboard (library/stats.py). Loans have no due date: open loans
+# older than LOAN_PERIOD_DAYS count as overdue
+LOAN_PERIOD_DAYS = 14
+ADMIN_STATS_CACHE_ALIAS = 'default'
+ADMIN_STATS_TIMEOUT = 30
+
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
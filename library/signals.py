@@ -0,0 +1,135 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import facets, recommendations, search, thumbnails
+from .authentication import invalidate_cached_user
+from .backends import user_cache
+from .models import Book, BookCover, BookCoverRendition, BorrowedBook, Category, FavoriteBook, User
+from .suggest import suggester
+
+
+@receiver(post_delete, sender=BorrowedBook)
+def release_deleted_loan(sender, instance, **kwargs):
+    """Give the copy back when an active loan row is deleted (e.g. user cascade)"""
+    if not instance.returned:
+        Book.adjust_active_loans(instance.book_id, -1)
+
+
+@receiver(post_save, sender=BorrowedBook)
+@receiver(post_save, sender=FavoriteBook)
+def recommend_from_new_reader(sender, instance, created, raw=False, **kwargs):
+    # Re-borrowing reopens the old row, so only first loans and new favorites count
+    if created and not raw:
+        recommendations.interactions_added(instance.user_id, [instance.book_id])
+
+
+# ---------------------
+# SEARCH INDEX
+# ---------------------
+@receiver(post_save, sender=Book)
+def index_saved_book(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(lambda: search.index_books([instance.pk]))
+        transaction.on_commit(lambda: suggester.book_saved(instance))
+
+
+@receiver(post_delete, sender=Book)
+def unsuggest_deleted_book(sender, instance, **kwargs):
+    book_id = instance.pk
+    transaction.on_commit(lambda: suggester.book_deleted(book_id))
+
+
+@receiver(m2m_changed, sender=Book.categories.through)
+def book_categories_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # instance is a Book and pk_set holds category ids, or the reverse when
+    # the change was made from a Category
+    if action in ('pre_remove', 'pre_clear'):
+        # Remember the links that really go away before the through rows disappear
+        # (remove() reports every id it was given, linked or not)
+        mine, other = ('category_id', 'book_id') if reverse else ('book_id', 'category_id')
+        links = Book.categories.through.objects.filter(**{mine: instance.pk})
+        if action == 'pre_remove':
+            links = links.filter(**{f'{other}__in': pk_set})
+        instance._unlinked_ids = list(links.values_list(other, flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    other_ids = list(pk_set) if action == 'post_add' else getattr(instance, '_unlinked_ids', [])
+    book_ids, category_ids = (other_ids, [instance.pk]) if reverse else ([instance.pk], other_ids)
+    facets.links_changed(book_ids, category_ids, 1 if action == 'post_add' else -1)
+    # Category ids are part of the cached book payload, so bump its version
+    Book.objects.filter(pk__in=book_ids).update(updated_at=timezone.now())
+    transaction.on_commit(lambda: search.index_books(book_ids))
+
+
+@receiver(pre_save, sender=Book)
+def count_copy_changes(sender, instance, raw=False, **kwargs):
+    """Editing number_of_copies can make a book (un)available without a loan"""
+    if raw or instance.pk is None:
+        return
+    row = Book.objects.filter(pk=instance.pk).values_list('number_of_copies', 'active_loans').first()
+    if row is None:
+        return
+    copies, loans = row
+    was_available, is_available = copies > loans, instance.number_of_copies > loans
+    if was_available != is_available:
+        facets.availability_changed([instance.pk], 1 if is_available else -1)
+
+
+@receiver(pre_delete, sender=Book)
+def uncount_deleted_book(sender, instance, **kwargs):
+    # The through rows are deleted without m2m_changed
+    facets.links_changed([instance.pk], list(instance.categories.values_list('pk', flat=True)), -1)
+
+
+@receiver(post_save, sender=Category)
+def index_renamed_category(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    transaction.on_commit(lambda: suggester.category_saved(instance))
+    if created:
+        return
+    book_ids = list(instance.books.values_list('pk', flat=True))
+    transaction.on_commit(lambda: search.index_books(book_ids))
+
+
+@receiver(pre_delete, sender=Category)
+def remember_category_books(sender, instance, **kwargs):
+    instance._deleted_book_ids = list(instance.books.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Category)
+def index_deleted_category(sender, instance, **kwargs):
+    book_ids = getattr(instance, '_deleted_book_ids', ())
+    category_id = instance.pk
+
+    def reindex():
+        # The cascade removed the links without m2m_changed: bump updated_at so
+        # cached payloads and ETags of these books change like on any unlink
+        Book.objects.filter(pk__in=book_ids).update(updated_at=timezone.now())
+        search.index_books(book_ids)
+
+    transaction.on_commit(reindex)
+    transaction.on_commit(lambda: suggester.category_deleted(category_id))
+
+
+# ---------------------
+# COVER RENDITIONS
+# ---------------------
+@receiver(post_save, sender=BookCover)
+def render_cover_thumbnails(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # Drop renditions of the previous image so the endpoint falls back to the original meanwhile
+    BookCoverRendition.objects.filter(book_id=instance.book_id).exclude(source_etag=instance.etag).delete()
+    thumbnails.schedule_renditions(instance.book_id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_principal(sender, instance, **kwargs):
+    # Flags or password changed: session and token requests must see the new state
+    invalidate_cached_user(instance.pk)
+    user_cache.invalidate(instance.pk)
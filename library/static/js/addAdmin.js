@@ -4,14 +4,8 @@ document.addEventListener("DOMContentLoaded", async function () {
 
     try {
         // Load categories into dropdown
-        const categories = await ApiService.getCategories();
         categorySelect.innerHTML = '<option value="">Select category</option>';
-        categories.forEach(cat => {
-            const option = document.createElement("option");
-            option.value = cat.name; 
-            option.textContent = cat.name;
-            categorySelect.appendChild(option);
-        });
+        appendCategoryOptions(categorySelect, await ApiService.getCategories());
     } catch (err) {
         console.error("Error loading categories:", err);
         alert("❌ Failed to load categories");
@@ -29,11 +23,8 @@ document.addEventListener("DOMContentLoaded", async function () {
         formData.append("cover", document.getElementById("cover").files[0]);  
         formData.append("number_of_copies", document.getElementById("numberOfCopies").value);
 
-        // Get category ID from selected name
-        const categoryName = document.getElementById("category").value;
-        const categories = await ApiService.getCategories();
-        const category = categories.find(c => c.name === categoryName);
-        formData.append("categories", category.id);
+        // Options are keyed by category ID
+        formData.append("categories", document.getElementById("category").value);
 
         try {
             await ApiService.addBook(formData);
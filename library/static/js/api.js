@@ -9,8 +9,69 @@ function getCookie(name) {
   return cookieValue ? cookieValue.pop() : '';
 }
 
+// List endpoints are cursor-paginated ({ next, previous, results }).
+// Read one page as { results, next }; pass `next` to ApiService.getPage for
+// the following page when the user asks for more (see appendLoadMore).
+async function readPage(response) {
+  const page = await response.json();
+  return { results: page.results || [], next: page.next || null };
+}
+
+// Add a "Load more" button after container while `next` is set. onPage(page)
+// renders each further page; the button re-appears until the last page.
+function appendLoadMore(container, next, onPage) {
+  if (!next) return;
+  const button = document.createElement('button');
+  button.type = 'button';
+  button.className = 'load-more';
+  button.textContent = 'Load more';
+  button.addEventListener('click', async () => {
+    button.disabled = true;
+    button.textContent = 'Loading...';
+    try {
+      const page = await ApiService.getPage(next);
+      button.remove();
+      onPage(page);
+      appendLoadMore(container, page.next, onPage);
+    } catch (error) {
+      console.error('Error loading more results:', error);
+      button.disabled = false;
+      button.textContent = 'Load more';
+    }
+  });
+  container.insertAdjacentElement('afterend', button);
+}
+
+// Add a page of categories to a <select>, keyed by id. While there are more
+// pages, a last "More categories..." option loads the next one when picked.
+function appendCategoryOptions(select, page) {
+  page.results.forEach(category => select.add(new Option(category.name, category.id)));
+  if (!page.next) return;
+  const more = new Option('More categories...', '');
+  select.add(more);
+  const loadNext = async () => {
+    if (select.selectedOptions[0] !== more) return;
+    select.removeEventListener('change', loadNext);
+    more.remove();
+    select.value = '';
+    appendCategoryOptions(select, await ApiService.getPage(page.next));
+  };
+  select.addEventListener('change', loadNext);
+}
+
 // API Service object with authentication methods
 const ApiService = {
+  /**
+   * Fetch the page behind a `next` link of a list endpoint
+   * @param {string} url - The `next` URL of the previous page
+   * @returns {Promise} - Promise resolving to { results, next }
+   */
+  async getPage(url) {
+    const response = await fetch(url, { credentials: 'include' });
+    if (!response.ok) throw new Error(`Failed to load page: ${response.status}`);
+    return await readPage(response);
+  },
+
   /**
    * Register a new user
    * @param {Object} userData - User registration data (username, email, password)
@@ -221,7 +282,7 @@ const ApiService = {
           'Content-Type': 'application/json',
           'X-CSRFToken': csrfToken,
         },
-        body: JSON.stringify({ book: bookId })
+        body: JSON.stringify({ book: Number(bookId) })
       });
 
       if (!response.ok) {
@@ -246,8 +307,8 @@ const ApiService = {
   },
 
   /**
-   * Get borrowed books
-   * @returns {Promise} - Promise resolving to the borrowed books list
+   * Get the first page of borrowed books
+   * @returns {Promise} - Promise resolving to { results, next }
    */
   async getBorrowedBooks() {
     try {
@@ -265,7 +326,7 @@ const ApiService = {
         throw new Error(errorData?.error || `Failed to fetch borrowed books: ${response.status}`);
       }
 
-      return await response.json();
+      return await readPage(response);
     } catch (error) {
       console.error('Error fetching borrowed books:', error);
       throw error;
@@ -287,7 +348,7 @@ const ApiService = {
                 'Content-Type': 'application/json',
                 'X-CSRFToken': csrfToken,
             },
-            body: JSON.stringify({ book_id: bookId }),
+            body: JSON.stringify({ book_id: Number(bookId) }),
         });
 
         if (!response.ok) {
@@ -353,15 +414,15 @@ const ApiService = {
    */
   async checkIfFavorited(bookId) {
     try {
-      const response = await fetch(`${API_BASE_URL}/favorite-books/`, {
+      const response = await fetch(`${API_BASE_URL}/favorite-books/?book=${encodeURIComponent(bookId)}`, {
         method: 'GET',
         credentials: 'include',
       });
       
       if (!response.ok) return false;
       
-      const favoriteBooks = await response.json();
-      return favoriteBooks.some(fav => fav.book_id == bookId);
+      const { results } = await readPage(response);
+      return results.length > 0;
     } catch (error) {
       console.error('Error checking favorite status:', error);
       return false;
@@ -369,8 +430,8 @@ const ApiService = {
   },
 
   /**
-   * Get favorite books
-   * @returns {Promise} - Promise resolving to the favorite books list
+   * Get the first page of favorite books
+   * @returns {Promise} - Promise resolving to { results, next }
    */
   async getFavoriteBooks() {
     try {
@@ -388,7 +449,7 @@ const ApiService = {
         throw new Error(errorData?.error || `Failed to fetch favorite books: ${response.status}`);
       }
 
-      return await response.json();
+      return await readPage(response);
     } catch (error) {
       console.error('Error fetching favorite books:', error);
       throw error;
@@ -431,14 +492,20 @@ const ApiService = {
     }
   },
 
- async getBooks() {
+  /**
+   * Get the first page of available books, optionally of one category
+   * @param {number} [categoryId] - Only books in this category
+   * @returns {Promise} - Promise resolving to { results, next }
+   */
+  async getBooks(categoryId) {
     // Fetch only available books for the user page
-    const response = await fetch(`${API_BASE_URL}/books/available/`, {
+    const query = categoryId ? `?category=${encodeURIComponent(categoryId)}` : '';
+    const response = await fetch(`${API_BASE_URL}/books/available/${query}`, {
       method: 'GET',
       credentials: 'include',
     });
     if (!response.ok) throw new Error(`Failed to get books: ${response.status}`);
-    return await response.json();
+    return await readPage(response);
   },
 
   async getBookById(id) {
@@ -465,10 +532,8 @@ const ApiService = {
         if (book.categories && !Array.isArray(book.categories)) {
             book.categories = [book.categories]; 
         }
-        // Ensure cover image is formatted for display
-        if (book.cover && !book.cover.startsWith('data:image')) {
-             book.cover = `data:image/jpeg;base64,${book.cover}`;
-         }
+        // Covers are served from their own cacheable endpoint
+        book.cover = book.cover_url;
         return book;
     } catch (error) {
         console.error('Get book error:', error);
@@ -561,9 +626,15 @@ const ApiService = {
     }
   },
 
-  async getCategories() {
+  /**
+   * Get the first page of categories, or the category with the given name
+   * @param {string} [name] - Case-insensitive category name
+   * @returns {Promise} - Promise resolving to { results, next }
+   */
+  async getCategories(name) {
     try {
-      const response = await fetch(`${API_BASE_URL}/categories/`, {
+      const query = name ? `?name=${encodeURIComponent(name)}` : '';
+      const response = await fetch(`${API_BASE_URL}/categories/${query}`, {
         method: 'GET',
         credentials: 'include',
         headers: {
@@ -573,13 +644,36 @@ const ApiService = {
       if (!response.ok) {
         throw new Error(`Failed to load categories: ${response.status}`);
       }
-      return await response.json();
+      return await readPage(response);
     } catch (error) {
       console.error('Get categories error:', error);
       throw error;
     }
   },
 
+  /**
+   * Dashboard totals for admins (one small cached payload)
+   * @returns {Promise} - Promise resolving to the stats object
+   */
+  async getAdminStats() {
+    try {
+      const response = await fetch(`${API_BASE_URL}/admin/stats/`, {
+        method: 'GET',
+        credentials: 'include',
+        headers: {
+          'Content-Type': 'application/json'
+        }
+      });
+      if (!response.ok) {
+        throw new Error(`Failed to load stats: ${response.status}`);
+      }
+      return await response.json();
+    } catch (error) {
+      console.error('Get admin stats error:', error);
+      throw error;
+    }
+  },
+
   async searchBooks(query) {
     try {
       const response = await fetch(`${API_BASE_URL}/search/?q=${encodeURIComponent(query)}`, {
@@ -594,15 +688,8 @@ const ApiService = {
         throw new Error(`Search failed: ${response.status}`);
       }
       
-      const results = await response.json();
-      return {
-        count: results.length,
-        results: results.map(book => ({
-          ...book,
-          cover: book.cover ? `data:image/jpeg;base64,${book.cover}` : null,
-          borrowed: !book.is_available
-        }))
-      };
+      const page = await readPage(response);
+      return { results: page.results.map(searchResult), next: page.next };
     } catch (error) {
       console.error('Search error:', error);
       throw error;
@@ -611,19 +698,25 @@ const ApiService = {
 };
 
 
+// Search hits in the shape the results page renders
+function searchResult(book) {
+  return { ...book, cover: book.cover_url, borrowed: !book.is_available };
+}
+
+
 // Add this new function to check if a book is borrowed
 async function checkIfBorrowed(bookId) {
     try {
-        const response = await fetch(`${API_BASE_URL}/borrowed-books/`, {
+        const response = await fetch(`${API_BASE_URL}/borrowed-books/?book=${encodeURIComponent(bookId)}`, {
             method: 'GET',
             credentials: 'include' // Send session cookies
         });
         
         if (!response.ok) return false;
         
-        const borrowedBooks = await response.json();
+        const { results } = await readPage(response);
         // Check if this book is borrowed and not returned
-        return borrowedBooks.some(b => b.book_id == bookId && !b.returned);
+        return results.some(b => !b.returned);
     } catch (error) {
         console.error('Error checking borrow status:', error);
         return false;
@@ -1,18 +1,17 @@
 // Remove mock data and localStorage usage
 // import { currentBorrowedBooks, favouriteBooks } from "./bookCollection.js";
 
-// Fetch all available books from the backend API using ApiService
+// Grid tiles only need the 240px thumbnail; fall back to the original cover
+function withThumbnails(page) {
+    page.results.forEach(book => {
+        book.cover = book.cover_renditions?.webp?.['240'] || book.cover_url;
+    });
+    return page;
+}
+
+// Fetch the first page of available books from the backend API using ApiService
 async function getBooks() {
-    const books = await ApiService.getBooks();
-    // Ensure cover images are formatted for display
-    if (Array.isArray(books)) {
-        books.forEach(book => {
-            if (book.cover && !book.cover.startsWith('data:image')) {
-                book.cover = `data:image/jpeg;base64,${book.cover}`;
-            }
-        });
-    }
-    return books;
+    return withThumbnails(await ApiService.getBooks());
 }
 
 // Update a book in the backend API (if needed elsewhere)
@@ -31,21 +30,8 @@ window.bookManager = {
 
 const bookListContainer = document.querySelector('.books-grid');
 
-async function renderBooksFromAPI() {
-  try {
-    const books = await window.bookManager.getBooks(); // Use window.bookManager
-    if (bookListContainer) {
-      bookListContainer.innerHTML = '';
-      // Convert the array of books to an object for consistent iteration
-      const booksObject = {};
-      if (Array.isArray(books)) { // Assuming API.getBooks returns array of objects
-          books.forEach(book => { booksObject[book.id] = book; });
-      } else if (books && typeof books === 'object') { // If the API happens to return an object
-          Object.assign(booksObject, books);
-      }
-
-      for (const bookId in booksObject) {
-        const book = booksObject[bookId];
+function renderBookTiles(books) {
+    books.forEach(book => {
         const bookHTML = `
             <a href="bookInfo.html?id=${book.id}" class="book-link">
                 <div class="book">
@@ -64,7 +50,17 @@ async function renderBooksFromAPI() {
             </a>
         `;
         bookListContainer.insertAdjacentHTML('beforeend', bookHTML);
-      }
+    });
+}
+
+async function renderBooksFromAPI() {
+  try {
+    const page = await window.bookManager.getBooks(); // Use window.bookManager
+    if (bookListContainer) {
+      bookListContainer.innerHTML = '';
+      renderBookTiles(page.results);
+      // Further pages only load on request
+      appendLoadMore(bookListContainer, page.next, next => renderBookTiles(withThumbnails(next).results));
     }
   } catch (err) {
     console.error('Error loading books:', err);
@@ -218,18 +214,8 @@ async function handleBorrow(bookId) {
         borrowBtn.disabled = true;
         borrowBtn.textContent = 'Processing...';
         
-        // First check borrow limit
-        const borrowedBooks = await ApiService.getBorrowedBooks();
-        const currentBorrowedCount = borrowedBooks.filter(book => !book.returned).length;
-        
-        if (currentBorrowedCount >= 6) {
-            borrowBtn.disabled = false;
-            borrowBtn.textContent = 'Borrow';
-            alert('You have reached your borrow limit (6 books). Please return some books before borrowing more.');
-            return;
-        }
-        
-        // Call API through ApiService
+        // Call API through ApiService; it rejects borrows over the limit
+        // without listing every loan here first
         await ApiService.borrowBook(bookId);
 
         // Update only the button state
@@ -4,74 +4,70 @@ document.addEventListener('DOMContentLoaded', () => {
 
     loadBorrowedBooks();
 
+    // Return buttons are re-rendered with every page; listen once on the container
+    currentBooksContainer.addEventListener('click', async function (event) {
+        const button = event.target.closest('.return-button');
+        if (!button) return;
+        const bookId = button.getAttribute('data-book-id');
+        try {
+            await ApiService.returnBorrowedBook(bookId);
+            loadBorrowedBooks();
+        } catch (error) {
+            console.error('Error returning book:', error);
+            showError(`Failed to return book: ${error.message}`);
+        }
+    });
+
     async function loadBorrowedBooks() {
         try {
-            const borrowedBooks = await ApiService.getBorrowedBooks();
-            renderBorrowedBooks(borrowedBooks);
+            document.querySelectorAll('.load-more').forEach(button => button.remove());
+            const page = await ApiService.getBorrowedBooks();
+            if (page.results.length === 0) {
+                currentBooksContainer.innerHTML = '<p>No borrowed books yet.</p>';
+                previousBooksContainer.innerHTML = '';
+                return;
+            }
+            currentBooksContainer.innerHTML = '';
+            previousBooksContainer.innerHTML = '';
+            renderBorrowedBooks(page.results);
+            appendLoadMore(previousBooksContainer, page.next, next => renderBorrowedBooks(next.results));
         } catch (error) {
             console.error('Error loading borrowed books:', error);
             showError(`Failed to load borrowed books: ${error.message}`);
         }
     }
 
+    // Append one page of loans to the current and previous lists
     function renderBorrowedBooks(books) {
-        if (books.length === 0) {
-            currentBooksContainer.innerHTML = '<p>No borrowed books yet.</p>';
-            previousBooksContainer.innerHTML = '';
-            return;
-        }
-
         // Separate current and previous books
         const currentBooks = books.filter(book => !book.returned);
         const previousBooks = books.filter(book => book.returned);
 
         // Render current books
-        if (currentBooks.length === 0) {
-            currentBooksContainer.innerHTML = '<p>No currently borrowed books.</p>';
-        } else {
-            currentBooksContainer.innerHTML = currentBooks.map(book => `
-                <div class="books-card">
-                    <img src="${book.cover_url || 'book-cover-placeholder.png'}" alt="Book-cover">
-                    <div class="Book-info">
-                        <h3 class="title">${book.title || 'Unknown Title'}</h3>
-                        <p class="author">${book.author || 'Unknown Author'}</p>
-                        <p class="borrow-date">Borrowed on: ${book.borrow_date}</p>
-                        <button class="return-button" data-book-id="${book.book_id}">Return Book</button>
-                    </div>
+        currentBooksContainer.insertAdjacentHTML('beforeend', currentBooks.map(book => `
+            <div class="books-card">
+                <img src="${book.cover_url || 'book-cover-placeholder.png'}" alt="Book-cover">
+                <div class="Book-info">
+                    <h3 class="title">${book.title || 'Unknown Title'}</h3>
+                    <p class="author">${book.author || 'Unknown Author'}</p>
+                    <p class="borrow-date">Borrowed on: ${book.borrow_date}</p>
+                    <button class="return-button" data-book-id="${book.book_id}">Return Book</button>
                 </div>
-            `).join('');
-        }
+            </div>
+        `).join(''));
 
         // Render previous books
-        if (previousBooks.length === 0) {
-            previousBooksContainer.innerHTML = '<p>No previously borrowed books.</p>';
-        } else {
-            previousBooksContainer.innerHTML = previousBooks.map(book => `
-                <div class="books-card">
-                    <img src="${book.cover_url || 'book-cover-placeholder.png'}" alt="Book-cover">
-                    <div class="Book-info">
-                        <h3 class="title">${book.title || 'Unknown Title'}</h3>
-                        <p class="author">${book.author || 'Unknown Author'}</p>
-                        <p class="borrow-date">Borrowed on: ${book.borrow_date}</p>
-                        <p class="returned">Returned on: ${book.return_date}</p>
-                    </div>
+        previousBooksContainer.insertAdjacentHTML('beforeend', previousBooks.map(book => `
+            <div class="books-card">
+                <img src="${book.cover_url || 'book-cover-placeholder.png'}" alt="Book-cover">
+                <div class="Book-info">
+                    <h3 class="title">${book.title || 'Unknown Title'}</h3>
+                    <p class="author">${book.author || 'Unknown Author'}</p>
+                    <p class="borrow-date">Borrowed on: ${book.borrow_date}</p>
+                    <p class="returned">Returned on: ${book.return_date}</p>
                 </div>
-            `).join('');
-        }
-
-        // Add event listeners to return buttons
-        document.querySelectorAll('.return-button').forEach(button => {
-            button.addEventListener('click', async function () {
-                const bookId = this.getAttribute('data-book-id');
-                try {
-                    await ApiService.returnBorrowedBook(bookId);
-                    loadBorrowedBooks();
-                } catch (error) {
-                    console.error('Error returning book:', error);
-                    showError(`Failed to return book: ${error.message}`);
-                }
-            });
-        });
+            </div>
+        `).join(''));
     }
 
     function showError(message) {
@@ -43,9 +43,10 @@ document.addEventListener("DOMContentLoaded", () => {
     // Function to load available book IDs
     async function loadAvailableBooks() {
         try {
-            const books = await ApiService.getBooks();
-            const availableIds = books.map(book => `BK${String(book.id).padStart(3, "0")}`); 
-            document.querySelector(".id-hint").textContent = `Available IDs: ${availableIds.join(", ")}`;
+            const { results, next } = await ApiService.getBooks();
+            // Only the first page is listed
+            const availableIds = results.map(book => `BK${String(book.id).padStart(3, "0")}`); 
+            document.querySelector(".id-hint").textContent = `Available IDs: ${availableIds.join(", ")}${next ? ", ..." : ""}`;
         } catch (err) {
             console.error("Load books error:", err);
         }
@@ -125,10 +125,10 @@ document.addEventListener("DOMContentLoaded", function() {
 
   async function loadAvailableBooks() {
     try {
-      const books = await ApiService.getBooks();
-      // Format IDs consistently (e.g., BK001)
-      const availableIds = books.map(book => `BK${String(book.id).padStart(3, "0")}`); 
-      idHint.textContent = `Available IDs: ${availableIds.join(", ")}`;
+      const { results, next } = await ApiService.getBooks();
+      // Format IDs consistently (e.g., BK001); only the first page is listed
+      const availableIds = results.map(book => `BK${String(book.id).padStart(3, "0")}`); 
+      idHint.textContent = `Available IDs: ${availableIds.join(", ")}${next ? ", ..." : ""}`;
     } catch (err) {
       idHint.textContent = "Error loading available book IDs.";
       console.error("Load books error:", err);
@@ -137,18 +137,15 @@ document.addEventListener("DOMContentLoaded", function() {
 
   async function loadCategories() {
     try {
-        const categories = await ApiService.getCategories();
+        const page = await ApiService.getCategories();
         categorySelect.innerHTML = ""; // Clear existing
         // Add placeholder
         const placeholder = new Option("Select category", "");
         placeholder.disabled = true;
         placeholder.selected = true;
         categorySelect.add(placeholder);
-        // Add fetched categories
-        categories.forEach(category => {
-            const option = new Option(category.name, category.id);
-            categorySelect.add(option);
-        });
+        // Add fetched categories, a page at a time
+        appendCategoryOptions(categorySelect, page);
     } catch (err) {
         showMessage("Failed to load categories. Please refresh.", "error");
         console.error("Load categories error:", err);
@@ -172,8 +169,15 @@ document.addEventListener("DOMContentLoaded", function() {
         if (categoryOption) {
             categoryOption.selected = true;
         } else {
-            console.warn(`Category ID ${bookCategoryId} not found in dropdown.`);
-            categorySelect.value = ""; // Reset if not found
+            // Only the first page of categories is listed; fetch this one directly
+            categorySelect.value = "";
+            fetch(`${API_BASE_URL}/categories/${bookCategoryId}/`, { credentials: 'include' })
+                .then(response => response.ok ? response.json() : null)
+                .then(category => {
+                    if (!category) return console.warn(`Category ID ${bookCategoryId} not found.`);
+                    categorySelect.add(new Option(category.name, category.id), 1);
+                    categorySelect.value = category.id;
+                });
         }
     } else {
         categorySelect.value = ""; // Reset if no category
@@ -3,23 +3,40 @@ document.addEventListener('DOMContentLoaded', () => {
 
     loadFavoriteBooks();
 
+    // Remove buttons are re-rendered with every page; listen once on the container
+    favBooksContainer.addEventListener('click', async function (event) {
+        const button = event.target.closest('.remove-fav-button');
+        if (!button) return;
+        const bookId = button.getAttribute('data-book-id');
+        try {
+            await ApiService.removeFavoriteBook(bookId);
+            loadFavoriteBooks();
+        } catch (error) {
+            console.error('Error removing from favorites:', error);
+            showError('Failed to remove from favorites. Please try again later.');
+        }
+    });
+
     async function loadFavoriteBooks() {
         try {
-            const favoriteBooks = await ApiService.getFavoriteBooks();
-            renderFavoriteBooks(favoriteBooks);
+            document.querySelectorAll('.load-more').forEach(button => button.remove());
+            const page = await ApiService.getFavoriteBooks();
+            if (page.results.length === 0) {
+                favBooksContainer.innerHTML = '<p>No favorite books yet.</p>';
+                return;
+            }
+            favBooksContainer.innerHTML = '';
+            renderFavoriteBooks(page.results);
+            appendLoadMore(favBooksContainer, page.next, next => renderFavoriteBooks(next.results));
         } catch (error) {
             console.error('Error loading favorite books:', error);
             showError('Failed to load favorite books. Please try again later.');
         }
     }
 
+    // Append one page of favorites
     function renderFavoriteBooks(books) {
-        if (books.length === 0) {
-            favBooksContainer.innerHTML = '<p>No favorite books yet.</p>';
-            return;
-        }
-
-        const renderedBooks = books.map(book => `
+        favBooksContainer.insertAdjacentHTML('beforeend', books.map(book => `
             <div class="books-card">
                 <img src="${book.book_cover_url || 'book-cover-placeholder.png'}" alt="Book-cover">
                 <div class="Book-info">
@@ -28,22 +45,7 @@ document.addEventListener('DOMContentLoaded', () => {
                     <button class="remove-fav-button" data-book-id="${book.book_id}">🗑 Remove from Favourites</button>
                 </div>
             </div>
-        `).join('');
-
-        favBooksContainer.innerHTML = renderedBooks;
-
-        document.querySelectorAll('.remove-fav-button').forEach(button => {
-            button.addEventListener('click', async function () {
-                const bookId = this.getAttribute('data-book-id');
-                try {
-                    await ApiService.removeFavoriteBook(bookId);
-                    loadFavoriteBooks();
-                } catch (error) {
-                    console.error('Error removing from favorites:', error);
-                    showError('Failed to remove from favorites. Please try again later.');
-                }
-            });
-        });
+        `).join(''));
     }
 
     function showError(message) {
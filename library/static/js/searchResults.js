@@ -9,20 +9,21 @@ document.addEventListener('DOMContentLoaded', async function() {
             return;
         }
 
-        const { count, results } = await ApiService.searchBooks(searchTerm);
+        const { results, next } = await ApiService.searchBooks(searchTerm);
         
         const resultsContainer = document.getElementById('search-results');
         const resultsHeader = document.getElementById('results-header');
         
-        if (count === 0) {
+        if (results.length === 0) {
             resultsHeader.textContent = "No Results Found!";
             resultsContainer.innerHTML = '<p class="no-results">No books found matching your search.</p>';
             return;
         }
         
-        resultsHeader.textContent = `Found ${count} Book${count > 1 ? 's' : ''}:`;
+        // Results arrive a page at a time, best matches first, so there is no total
+        resultsHeader.textContent = `Books matching "${searchTerm}":`;
         
-        resultsContainer.innerHTML = results.map(book => `
+        const renderResults = books => resultsContainer.insertAdjacentHTML('beforeend', books.map(book => `
             <a href="bookInfo.html?id=${book.id}" class="book-link">
                 <div class="book">
                     <img src="${book.cover || '../static/images/placeholder.jpg'}" alt="${book.title}">
@@ -37,7 +38,10 @@ document.addEventListener('DOMContentLoaded', async function() {
                     </div>
                 </div>
             </a>
-        `).join('');
+        `).join(''));
+        resultsContainer.innerHTML = '';
+        renderResults(results);
+        appendLoadMore(resultsContainer, next, page => renderResults(page.results.map(searchResult)));
         
         const searchInput = document.getElementById('search');
         if (searchInput) {
@@ -0,0 +1,75 @@
+"""
+Figures for the admin dashboard.
+
+``dashboard()`` computes every figure with a handful of aggregate queries
+and caches the result for ADMIN_STATS_TIMEOUT seconds. Borrows and returns
+drop the cached copy after they commit (``invalidate``, called from
+loan_history.record), so loan figures are current in this process. Other
+workers and catalog or user edits catch up within the timeout.
+
+Loans have no due date: an open loan counts as overdue once it is older
+than LOAN_PERIOD_DAYS. Top titles add the loan events since the last
+rollup_loans run to the daily rollups (loan_history.recent_popular_books),
+so they stay current; the live part grows until rollup_loans runs again.
+"""
+import datetime
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from . import loan_history
+from .models import Book, BorrowedBook, Category
+
+CACHE_KEY = 'library:admin-stats'
+TOP_TITLES = 10
+TOP_TITLES_DAYS = 30
+
+
+def _cache():
+    return caches[getattr(settings, 'ADMIN_STATS_CACHE_ALIAS', 'default')]
+
+
+def compute():
+    """Every dashboard figure, straight from the database in a handful of queries"""
+    today = timezone.localdate()
+    # active_loans is the circulation counter (library.circulation), so open loans need no count
+    books = Book.objects.aggregate(
+        books=Count('id'), copies=Sum('number_of_copies'), active_loans=Sum('active_loans'),
+    )
+    users = get_user_model().objects.aggregate(users=Count('id'), admins=Count('id', filter=Q(is_admin=True)))
+    overdue_before = today - datetime.timedelta(days=settings.LOAN_PERIOD_DAYS)
+    overdue = BorrowedBook.objects.filter(returned=False, borrow_date__lt=overdue_before).count()
+    since = today - datetime.timedelta(days=TOP_TITLES_DAYS - 1)
+    top, rolled_up_through = loan_history.recent_popular_books(since, TOP_TITLES)
+    favorites = (
+        Category.objects.annotate(favorites=Count('books__favorited_by'))
+        .order_by('-favorites', 'name').values('id', 'name', 'favorites')
+    )
+    return {
+        'books': books['books'],
+        'copies': books['copies'] or 0,
+        'users': users['users'],
+        'admins': users['admins'],
+        'active_loans': books['active_loans'] or 0,
+        'overdue_loans': overdue,
+        'top_borrowed': {'since': since, 'rolled_up_through': rolled_up_through, 'books': top},
+        'favorites_per_category': list(favorites),
+        'generated_at': timezone.now(),
+    }
+
+
+def dashboard():
+    """The dashboard figures, from the cache when fresh"""
+    cache = _cache()
+    stats = cache.get(CACHE_KEY)
+    if stats is None:
+        stats = compute()
+        cache.set(CACHE_KEY, stats, getattr(settings, 'ADMIN_STATS_TIMEOUT', 30))
+    return stats
+
+
+def invalidate():
+    _cache().delete(CACHE_KEY)
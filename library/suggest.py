@@ -0,0 +1,317 @@
+"""
+Typeahead suggestions for the search box.
+
+Each worker keeps a prefix index over folded book titles, authors and
+category names. An entry can be found from the start of each of its first
+MAX_WORDS words, so "hobb" finds "The Hobbit". All keys are in one sorted
+list. A prefix lookup is a bisect range of that list, and the entries in
+the range are ranked by popularity:
+
+* a title: its loans plus favorites
+* an author: the sum of their books' popularity
+* a category: its number of books
+
+The index is built at worker start from a few values_list scans (see
+warm_up). Signals in library.signals keep it current for changes made in
+this process. It is rebuilt every SEARCH_SUGGEST_REFRESH seconds to pick
+up new popularity and changes made by other workers. Only the
+SEARCH_SUGGEST_MAX_ENTRIES most popular entries are kept, which bounds
+memory.
+"""
+import bisect
+import heapq
+import logging
+import re
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count
+
+from .models import Book, BorrowedBook, Category, FavoriteBook
+from .search import fold
+
+logger = logging.getLogger(__name__)
+
+MAX_WORDS = 4  # Word starts indexed per entry
+MAX_KEY_LENGTH = 32
+MAX_SCAN = 256  # Prefix ranges wider than this are ranked once and memoized
+MAX_MEMO = 4096
+MEMO_DEPTH = 40
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 20
+
+_separator_re = re.compile(r'[\W_]+')
+
+
+def normalize(text):
+    """Fold case, accents and punctuation: "The Hobbit: Or There" -> "the hobbit or there" """
+    return _separator_re.sub(' ', fold(text or '')).strip()
+
+
+def _keys_for(text):
+    words = normalize(text).split()
+    return {' '.join(words[i:])[:MAX_KEY_LENGTH] for i in range(min(len(words), MAX_WORDS))}
+
+
+class PrefixIndex:
+    """
+    Sorted keys with parallel lists of entry idents (('title', book_id),
+    ('author', normalized name) or ('category', category_id)) and negated
+    entry scores, so a range is ranked by comparing plain tuples. Entries
+    are ``[display text, score, references]``; an author entry is shared by
+    all of their books and goes away with the last one.
+    """
+
+    def __init__(self, entries, max_entries):
+        self.max_entries = max_entries
+        self._entries = entries
+        self._books = {}  # book_id -> (author ident, score), to move author scores on edits
+        pairs = sorted((key, ident) for ident, entry in entries.items() for key in _keys_for(entry[0]))
+        self._keys = [key for key, _ in pairs]
+        self._idents = [ident for _, ident in pairs]
+        self._ranks = [-entries[ident][1] for ident in self._idents]
+        self._memo = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, max_entries):
+        popularity = Counter(dict(
+            BorrowedBook.objects.values('book').annotate(n=Count('id')).values_list('book', 'n')
+        ))
+        popularity.update(dict(
+            FavoriteBook.objects.values('book').annotate(n=Count('id')).values_list('book', 'n')
+        ))
+        entries, books = {}, {}
+        for book_id, title, author in Book.objects.values_list('id', 'title', 'author').iterator(chunk_size=5000):
+            score = popularity[book_id]
+            entries[('title', book_id)] = [title, score, 1]
+            author_ident = ('author', normalize(author))
+            books[book_id] = (author_ident, score)
+            entry = entries.setdefault(author_ident, [author, 0, 0])
+            entry[1] += score
+            entry[2] += 1
+        for category_id, name, book_count in Category.objects.values_list('id', 'name', 'book_count'):
+            entries[('category', category_id)] = [name, book_count, 1]
+
+        if len(entries) > max_entries:
+            keep = heapq.nlargest(max_entries, entries, key=lambda ident: entries[ident][1])
+            entries = {ident: entries[ident] for ident in keep}
+        index = cls(entries, max_entries)
+        index._books = {book_id: book for book_id, book in books.items() if ('title', book_id) in entries}
+        index.warm()
+        return index
+
+    def __len__(self):
+        return len(self._entries)
+
+    def suggest(self, prefix, limit=DEFAULT_LIMIT):
+        prefix = normalize(prefix)[:MAX_KEY_LENGTH]
+        if not prefix:
+            return []
+        with self._lock:
+            ranked = self._memo.get(prefix)
+            if ranked is None:
+                ranked = self._rank_range(prefix)
+            return [self._payload(ident) for ident in ranked[:limit]]
+
+    def _sort_key(self, ident):
+        return -self._entries[ident][1], ident
+
+    def _rank_range(self, prefix):
+        lo = bisect.bisect_left(self._keys, prefix)
+        hi = bisect.bisect_left(self._keys, prefix + '\uffff', lo)
+        # Wide ranges (short prefixes) are ranked once, a little deeper than
+        # needed so that removals rarely force a new scan
+        depth = MEMO_DEPTH if hi - lo > MAX_SCAN else MAX_LIMIT
+        # An entry shows up once per matching word start: over-fetch, then dedupe
+        top = heapq.nsmallest(depth * MAX_WORDS, zip(self._ranks[lo:hi], self._idents[lo:hi]))
+        ranked = list(dict.fromkeys(ident for _, ident in top))[:depth]
+        if depth == MEMO_DEPTH and len(ranked) >= MAX_LIMIT and len(self._memo) < MAX_MEMO:
+            self._memo[prefix] = ranked
+        return ranked
+
+    def warm(self, max_length=2):
+        """Rank every prefix of up to max_length characters that covers a wide range"""
+        prefixes = {key[:length] for key in self._keys for length in range(1, max_length + 1)}
+        with self._lock:
+            for prefix in sorted(prefixes):
+                if prefix not in self._memo:
+                    self._rank_range(prefix)
+
+    def _payload(self, ident):
+        kind, key = ident
+        suggestion = {'text': self._entries[ident][0], 'type': kind}
+        if kind != 'author':
+            suggestion['id'] = key
+        return suggestion
+
+    # ---------------------
+    # INCREMENTAL UPDATES
+    # ---------------------
+    def set_book(self, book_id, title, author):
+        with self._lock:
+            score = self._remove_book(book_id)
+            if score is None:
+                if len(self._entries) >= self.max_entries:
+                    return
+                score = 0
+            author_ident = ('author', normalize(author))
+            self._add(('title', book_id), title, score)
+            self._add(author_ident, author, score)
+            self._books[book_id] = (author_ident, score)
+
+    def remove_book(self, book_id):
+        with self._lock:
+            self._remove_book(book_id)
+
+    def set_category(self, category_id, name, book_count):
+        with self._lock:
+            ident = ('category', category_id)
+            if ident not in self._entries and len(self._entries) >= self.max_entries:
+                return
+            self._remove(ident, 0)
+            self._add(ident, name, book_count)
+
+    def remove_category(self, category_id):
+        with self._lock:
+            self._remove(('category', category_id), 0)
+
+    def _remove_book(self, book_id):
+        """Drop a book's title and its share of its author; returns its score, None if not indexed"""
+        book = self._books.pop(book_id, None)
+        if book is None:
+            return None
+        author_ident, score = book
+        self._remove(('title', book_id), score)
+        self._remove(author_ident, score)
+        return score
+
+    def _add(self, ident, text, score):
+        entry = self._entries.get(ident)
+        if entry is not None:
+            entry[2] += 1
+            self._rescore(ident, entry[1] + score)
+            return
+        self._entries[ident] = [text, score, 1]
+        keys = _keys_for(text)
+        for key in keys:
+            position = bisect.bisect_right(self._keys, key)
+            self._keys.insert(position, key)
+            self._idents.insert(position, ident)
+            self._ranks.insert(position, -score)
+        self._rerank(ident, keys)
+
+    def _remove(self, ident, score):
+        entry = self._entries.get(ident)
+        if entry is None:
+            return
+        entry[2] -= 1
+        if entry[2] > 0:
+            self._rescore(ident, entry[1] - score)
+            return
+        del self._entries[ident]
+        keys = _keys_for(entry[0])
+        for position in self._positions(ident, keys):
+            del self._keys[position]
+            del self._idents[position]
+            del self._ranks[position]
+        self._rerank(ident, keys)
+
+    def _positions(self, ident, keys):
+        """Positions of ident's keys, last first so they can be deleted in order"""
+        positions = []
+        for key in keys:
+            lo = bisect.bisect_left(self._keys, key)
+            hi = bisect.bisect_right(self._keys, key, lo)
+            positions.extend(position for position in range(lo, hi) if self._idents[position] == ident)
+        return sorted(positions, reverse=True)
+
+    def _rescore(self, ident, score):
+        entry = self._entries[ident]
+        entry[1] = score
+        keys = _keys_for(entry[0])
+        for position in self._positions(ident, keys):
+            self._ranks[position] = -score
+        self._rerank(ident, keys)
+
+    def _rerank(self, ident, keys):
+        """Keep memoized rankings under these keys in step with ident's new score, or its removal"""
+        prefixes = {key[:length] for key in keys for length in range(1, len(key) + 1)}
+        for prefix in prefixes & self._memo.keys():
+            ranked = [other for other in self._memo[prefix] if other != ident]
+            # A memo holds the top len(memo) of its range, so anything ranking
+            # below its last entry can stay out
+            if ident in self._entries and self._sort_key(ident) < self._sort_key(ranked[-1]):
+                bisect.insort(ranked, ident, key=self._sort_key)
+                del ranked[MEMO_DEPTH:]
+            if len(ranked) < MAX_LIMIT:
+                del self._memo[prefix]  # Too few left to be sure of the top MAX_LIMIT
+            else:
+                self._memo[prefix] = ranked
+
+
+class Suggester:
+    """Owns this worker's PrefixIndex: builds it once, then refreshes it in the background"""
+
+    def __init__(self, max_entries, refresh):
+        self.max_entries = max_entries
+        self.refresh = refresh
+        self.index = None
+        self.built_at = 0
+        self._build_lock = threading.Lock()
+
+    def get(self):
+        if self.index is None:
+            with self._build_lock:
+                if self.index is None:
+                    self._build()
+        elif time.monotonic() - self.built_at > self.refresh and self._build_lock.acquire(blocking=False):
+            # Other threads keep answering from the current index meanwhile
+            threading.Thread(target=self._rebuild_in_background, daemon=True).start()
+        return self.index
+
+    def warm_up(self):
+        """Build the index in a background thread so the first suggest request finds it ready"""
+        if self._build_lock.acquire(blocking=False):
+            threading.Thread(target=self._rebuild_in_background, daemon=True).start()
+
+    def _rebuild_in_background(self):
+        try:
+            self._build()
+        except Exception:
+            logger.exception('Building the suggestion index failed')
+        finally:
+            self._build_lock.release()
+            connections.close_all()  # This thread's connections
+
+    def _build(self):
+        started = time.monotonic()
+        self.index = PrefixIndex.build(self.max_entries)
+        self.built_at = time.monotonic()
+        logger.info('Built suggestion index: %d entries in %.2fs', len(self.index), self.built_at - started)
+
+    def suggest(self, prefix, limit=DEFAULT_LIMIT):
+        return self.get().suggest(prefix, limit)
+
+    # Signal hooks: only an index that exists needs updating
+    def book_saved(self, book):
+        if self.index is not None:
+            self.index.set_book(book.pk, book.title, book.author)
+
+    def book_deleted(self, book_id):
+        if self.index is not None:
+            self.index.remove_book(book_id)
+
+    def category_saved(self, category):
+        if self.index is not None:
+            self.index.set_category(category.pk, category.name, category.book_count)
+
+    def category_deleted(self, category_id):
+        if self.index is not None:
+            self.index.remove_category(category_id)
+
+
+suggester = Suggester(settings.SEARCH_SUGGEST_MAX_ENTRIES, settings.SEARCH_SUGGEST_REFRESH)
@@ -0,0 +1,567 @@
+import datetime
+import threading
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import close_old_connections
+from django.utils import timezone
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+
+from . import circulation, exports, facets, recommendations, routers, search
+from .authentication import issue_token
+from .backends import user_cache
+from .circulation import BORROW_LIMIT, CirculationError
+from .management.commands.import_books import parse_record
+from .middleware import ReplicaRoutingMiddleware
+from .models import Book, BorrowedBook, Category, LoanEvent, PasswordResetToken, User
+from .tokens import CacheResetTokenStore, DatabaseResetTokenStore, ResetTokenError
+
+
+def make_book(title='Book', **fields):
+    return Book.objects.create(
+        title=title, author='Author', description='', published_date=datetime.date(2000, 1, 1), **fields
+    )
+
+
+def make_users(count):
+    # No password: hashing one takes longer than the whole circulation test
+    return [User.objects.create_user(email=f'reader{i}@example.com') for i in range(count)]
+
+
+class CategoryDeleteConditionalGetTests(TestCase):
+    """Deleting a category changes its books' payloads, so their old ETags must stop matching"""
+
+    def setUp(self):
+        self.kept = Category.objects.create(name='Kept')
+        self.deleted = Category.objects.create(name='Deleted')
+        self.book = Book.objects.create(
+            title='Book', author='Author', description='', published_date=datetime.date(2000, 1, 1),
+        )
+        self.book.categories.add(self.kept, self.deleted)
+        self.client.force_login(User.objects.create_user(email='reader@example.com', password='x'))
+
+    def delete_category(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.deleted.delete()
+
+    def test_list_etag_changes(self):
+        etag = self.client.get('/api/books/')['ETag']
+        self.delete_category()
+        response = self.client.get('/api/books/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['categories'], [self.kept.pk])
+
+    def test_detail_etag_changes(self):
+        url = f'/api/books/{self.book.pk}/'
+        etag = self.client.get(url)['ETag']
+        self.delete_category()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['categories'], [self.kept.pk])
+
+
+class BorrowValidationTests(TestCase):
+    url = '/api/borrowed-books/'
+
+    def setUp(self):
+        self.book = Book.objects.create(
+            title='Book', author='Author', description='', published_date=datetime.date(2000, 1, 1),
+        )
+        self.client.force_login(User.objects.create_user(email='reader@example.com', password='x'))
+
+    def test_rejects_non_integer_ids(self):
+        for value in ['abc', '1', 1.5, True, [1]]:
+            with self.subTest(value=value):
+                response = self.client.post(self.url, {'book': value}, content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+                response = self.client.patch(self.url, {'book_id': value}, content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+        self.assertFalse(self.book.borrowed_by.exists())
+
+    def test_borrow_and_return(self):
+        response = self.client.post(self.url, {'book': self.book.pk}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.patch(self.url, {'book_id': self.book.pk}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['returned'])
+
+
+class BulkBorrowValidationTests(TestCase):
+    url = '/api/borrowed-books/bulk/'
+
+    def setUp(self):
+        self.book = Book.objects.create(
+            title='Book', author='Author', description='', published_date=datetime.date(2000, 1, 1),
+        )
+        self.client.force_login(User.objects.create_user(email='reader@example.com', password='x'))
+
+    def test_rejects_non_integer_ids(self):
+        for value in [1.5, True, '1', None]:
+            with self.subTest(value=value):
+                response = self.client.post(self.url, {'books': [value]}, content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+        self.assertFalse(self.book.borrowed_by.exists())
+
+    def test_accepts_integer_ids(self):
+        response = self.client.post(self.url, {'books': [self.book.pk]}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['results'][0]['success'])
+
+
+class CirculationTests(TestCase):
+    def setUp(self):
+        self.book = make_book(number_of_copies=1)
+        self.reader, self.other = make_users(2)
+
+    def assertActiveLoans(self, book, count):
+        book.refresh_from_db()
+        self.assertEqual(book.active_loans, count)
+
+    def test_borrow_claims_a_copy(self):
+        loan = circulation.borrow_book(self.reader, self.book.pk)
+        self.assertFalse(loan.returned)
+        self.assertActiveLoans(self.book, 1)
+        self.assertEqual(LoanEvent.objects.filter(book=self.book, kind=LoanEvent.BORROW).count(), 1)
+
+    def test_no_copy_left(self):
+        circulation.borrow_book(self.reader, self.book.pk)
+        with self.assertRaisesMessage(CirculationError, 'No copies available'):
+            circulation.borrow_book(self.other, self.book.pk)
+        self.assertActiveLoans(self.book, 1)
+
+    def test_same_book_twice(self):
+        book = make_book(number_of_copies=2)
+        circulation.borrow_book(self.reader, book.pk)
+        with self.assertRaisesMessage(CirculationError, 'already borrowed'):
+            circulation.borrow_book(self.reader, book.pk)
+        self.assertActiveLoans(book, 1)
+
+    def test_unknown_book(self):
+        with self.assertRaises(CirculationError) as raised:
+            circulation.borrow_book(self.reader, 0)
+        self.assertEqual(raised.exception.status, 404)
+
+    def test_borrow_limit(self):
+        for _ in range(BORROW_LIMIT):
+            circulation.borrow_book(self.reader, make_book().pk)
+        extra = make_book()
+        with self.assertRaisesMessage(CirculationError, 'Borrow limit reached'):
+            circulation.borrow_book(self.reader, extra.pk)
+        self.assertActiveLoans(extra, 0)
+
+    def test_bulk_borrow_limit(self):
+        books = [make_book() for _ in range(BORROW_LIMIT + 1)]
+        outcomes = circulation.borrow_books(self.reader, [book.pk for book in books])
+        self.assertEqual([isinstance(outcome, BorrowedBook) for outcome in outcomes.values()],
+                         [True] * BORROW_LIMIT + [False])
+        self.assertActiveLoans(books[-1], 0)
+
+    def test_bulk_borrow_reports_each_book(self):
+        outcomes = circulation.borrow_books(self.reader, [self.book.pk, 0])
+        self.assertIsInstance(outcomes[self.book.pk], BorrowedBook)
+        self.assertEqual(outcomes[0].status, 404)
+        outcomes = circulation.borrow_books(self.other, [self.book.pk])
+        self.assertEqual(outcomes[self.book.pk].message, 'No copies available for this book.')
+        self.assertActiveLoans(self.book, 1)
+
+    def test_return_then_borrow_reopens_the_loan(self):
+        first = circulation.borrow_book(self.reader, self.book.pk)
+        circulation.return_book(self.reader, self.book.pk)
+        self.assertActiveLoans(self.book, 0)
+        again = circulation.borrow_book(self.reader, self.book.pk)
+        self.assertEqual(again.pk, first.pk)
+        self.assertFalse(again.returned)
+        self.assertIsNone(again.return_date)
+        self.assertActiveLoans(self.book, 1)
+        self.assertEqual(BorrowedBook.objects.filter(user=self.reader, book=self.book).count(), 1)
+
+    def test_bulk_borrow_reopens_the_loan(self):
+        first = circulation.borrow_book(self.reader, self.book.pk)
+        circulation.return_books(self.reader, [self.book.pk])
+        again = circulation.borrow_books(self.reader, [self.book.pk])[self.book.pk]
+        self.assertEqual(again.pk, first.pk)
+        self.assertFalse(again.returned)
+
+    def test_return_twice_releases_one_copy(self):
+        circulation.borrow_book(self.reader, self.book.pk)
+        circulation.return_book(self.reader, self.book.pk)
+        with self.assertRaises(CirculationError):
+            circulation.return_book(self.reader, self.book.pk)
+        self.assertEqual(circulation.return_books(self.reader, [self.book.pk])[self.book.pk].status, 404)
+        self.assertActiveLoans(self.book, 0)
+
+    def test_incremental_export_sees_circulation(self):
+        fields = exports.EXPORTS['books'].fields
+        since = timezone.now()
+        self.assertEqual(list(exports.EXPORTS['books'].rows(since)), [])
+        circulation.borrow_book(self.reader, self.book.pk)
+        rows = [dict(zip(fields, row)) for row in exports.EXPORTS['books'].rows(since)]
+        self.assertEqual([(row['id'], row['active_loans']) for row in rows], [(self.book.pk, 1)])
+        since = timezone.now()
+        circulation.return_books(self.reader, [self.book.pk])
+        rows = [dict(zip(fields, row)) for row in exports.EXPORTS['books'].rows(since)]
+        self.assertEqual([(row['id'], row['active_loans']) for row in rows], [(self.book.pk, 0)])
+
+
+# Recommendation updates run on a background pool; keep them out of the threads under test
+@mock.patch('library.recommendations.interactions_added')
+class CirculationConcurrencyTests(TransactionTestCase):
+    """
+    Many threads at once must never lend more copies than exist, or release a
+    copy twice. On SQLite, IMMEDIATE transactions already serialize writers;
+    on other backends the conditional UPDATEs in library.circulation do.
+    """
+
+    def run_concurrently(self, calls):
+        """Start every call at the same moment; returns each call's result or exception"""
+        barrier = threading.Barrier(len(calls))
+        outcomes = [None] * len(calls)
+
+        def run(i, call):
+            try:
+                barrier.wait()
+                outcomes[i] = call()
+            except Exception as error:
+                outcomes[i] = error
+            finally:
+                close_old_connections()
+
+        threads = [threading.Thread(target=run, args=(i, call)) for i, call in enumerate(calls)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return outcomes
+
+    def test_borrows_never_over_lend(self, interactions_added):
+        book = make_book(number_of_copies=3)
+        readers = make_users(12)
+        outcomes = self.run_concurrently([
+            lambda reader=reader: circulation.borrow_book(reader, book.pk) for reader in readers
+        ])
+        self.assertEqual(sum(isinstance(outcome, BorrowedBook) for outcome in outcomes), 3)
+        self.assertTrue(all(
+            isinstance(outcome, (BorrowedBook, CirculationError)) for outcome in outcomes
+        ), outcomes)
+        book.refresh_from_db()
+        self.assertEqual(book.active_loans, 3)
+        self.assertEqual(BorrowedBook.objects.filter(book=book, returned=False).count(), 3)
+
+    def test_bulk_borrows_never_over_lend(self, interactions_added):
+        book = make_book(number_of_copies=3)
+        readers = make_users(12)
+        outcomes = self.run_concurrently([
+            lambda reader=reader: circulation.borrow_books(reader, [book.pk])[book.pk] for reader in readers
+        ])
+        self.assertEqual(sum(isinstance(outcome, BorrowedBook) for outcome in outcomes), 3)
+        book.refresh_from_db()
+        self.assertEqual(book.active_loans, 3)
+
+    def test_borrows_respect_the_limit(self, interactions_added):
+        [reader] = make_users(1)
+        books = [make_book() for _ in range(BORROW_LIMIT + 4)]
+        self.run_concurrently([lambda book=book: circulation.borrow_book(reader, book.pk) for book in books])
+        self.assertEqual(BorrowedBook.objects.filter(user=reader, returned=False).count(), BORROW_LIMIT)
+
+    def test_returns_release_one_copy(self, interactions_added):
+        book = make_book(number_of_copies=1)
+        [reader] = make_users(1)
+        circulation.borrow_book(reader, book.pk)
+        outcomes = self.run_concurrently(
+            [lambda: circulation.return_book(reader, book.pk)] * 3
+            + [lambda: circulation.return_books(reader, [book.pk])[book.pk]] * 3
+        )
+        self.assertEqual(sum(isinstance(outcome, BorrowedBook) for outcome in outcomes), 1)
+        book.refresh_from_db()
+        self.assertEqual(book.active_loans, 0)
+
+
+class FacetCounterTests(TestCase):
+    """The incrementally kept category counters must always match a recount"""
+
+    def setUp(self):
+        self.fiction = Category.objects.create(name='Fiction')
+        self.history = Category.objects.create(name='History')
+        self.single = make_book('Single', number_of_copies=1)
+        self.double = make_book('Double', number_of_copies=2)
+        self.single.categories.add(self.fiction, self.history)
+        self.double.categories.add(self.fiction)
+        self.reader, self.other = make_users(2)
+
+    def counters(self):
+        rows = Category.objects.values_list('name', 'book_count', 'available_book_count')
+        return {name: (books, available) for name, books, available in rows}
+
+    def assertCounters(self, expected):
+        self.assertEqual(self.counters(), expected)
+        facets.recount()
+        self.assertEqual(self.counters(), expected)
+
+    def test_borrow_and_return(self):
+        circulation.borrow_book(self.reader, self.single.pk)
+        self.assertCounters({'Fiction': (2, 1), 'History': (1, 0)})
+        circulation.borrow_book(self.reader, self.double.pk)
+        self.assertCounters({'Fiction': (2, 1), 'History': (1, 0)})
+        circulation.return_books(self.reader, [self.single.pk, self.double.pk])
+        self.assertCounters({'Fiction': (2, 2), 'History': (1, 1)})
+
+    def test_book_delete(self):
+        circulation.borrow_book(self.reader, self.single.pk)
+        self.single.delete()
+        self.assertCounters({'Fiction': (1, 1), 'History': (0, 0)})
+
+    def test_user_delete_releases_loans(self):
+        circulation.borrow_book(self.reader, self.single.pk)
+        circulation.borrow_book(self.other, self.double.pk)
+        self.reader.delete()
+        self.assertCounters({'Fiction': (2, 2), 'History': (1, 1)})
+
+    def test_clear_from_either_side(self):
+        circulation.borrow_book(self.reader, self.single.pk)
+        self.fiction.books.clear()
+        self.assertCounters({'Fiction': (0, 0), 'History': (1, 0)})
+        self.single.categories.clear()
+        self.assertCounters({'Fiction': (0, 0), 'History': (0, 0)})
+
+
+class SignedTokenTests(TestCase):
+    """The cached principal behind a token must follow password and flag changes"""
+
+    def setUp(self):
+        caches[settings.API_TOKEN_USER_CACHE_ALIAS].clear()  # User ids repeat across rolled-back tests
+        self.user = User.objects.create_user(email='reader@example.com', password='old')
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {issue_token(self.user)}'}
+        self.assertEqual(self.client.get('/api/admin/stats/', **self.auth).status_code, 403)  # Caches the user
+
+    def test_password_change_revokes_the_token(self):
+        self.user.set_password('new')
+        self.user.save()
+        response = self.client.get('/api/books/', **self.auth)
+        self.assertEqual(response.status_code, 403)  # Session authentication comes first: no 401
+        self.assertEqual(response.json()['detail'], 'Token has been revoked.')
+
+    def test_deactivation_rejects_the_token(self):
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get('/api/books/', **self.auth)
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.json()['detail'], 'User inactive or deleted.')
+
+    def test_admin_flag_applies_at_once(self):
+        self.user.is_admin = True
+        self.user.save()
+        self.assertEqual(self.client.get('/api/admin/stats/', **self.auth).status_code, 200)
+
+
+class SessionUserCacheTests(TestCase):
+    """Session requests read users from backends.user_cache, which must follow edits"""
+
+    def setUp(self):
+        caches[settings.AUTH_USER_CACHE_ALIAS].clear()
+        user_cache.clear()
+        self.user = User.objects.create_user(email='reader@example.com', password='old')
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/api/admin/stats/').status_code, 403)  # Caches the user
+
+    def test_password_change_ends_the_session(self):
+        self.user.set_password('new')
+        self.user.save()
+        self.assertEqual(self.client.get('/api/books/').status_code, 403)
+
+    def test_admin_flag_applies_at_once(self):
+        self.user.is_admin = True
+        self.user.save()
+        self.assertEqual(self.client.get('/api/admin/stats/').status_code, 200)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+@mock.patch.object(routers.replica_health, 'is_healthy', return_value=True)
+class ReplicaRoutingTests(SimpleTestCase):
+    """Reads go to a replica only until the request, or a recent one from the client, writes"""
+
+    router = routers.PrimaryReplicaRouter()
+
+    def in_request(self, pinned=False):
+        state, token = routers.begin_request(pinned)
+        self.addCleanup(routers.end_request, token)
+        return state
+
+    def test_reads_outside_requests_stay_on_the_primary(self, is_healthy):
+        self.assertEqual(self.router.db_for_read(Book), 'default')
+
+    def test_write_pins_the_rest_of_the_request(self, is_healthy):
+        self.in_request()
+        self.assertEqual(self.router.db_for_read(Book), 'replica')
+        self.assertEqual(self.router.db_for_write(Book), 'default')
+        self.assertEqual(self.router.db_for_read(Book), 'default')
+
+    def test_pinned_request_reads_the_primary(self, is_healthy):
+        self.in_request(pinned=True)
+        self.assertEqual(self.router.db_for_read(Book), 'default')
+
+    def test_unhealthy_replica_is_skipped(self, is_healthy):
+        is_healthy.return_value = False
+        self.in_request()
+        self.assertEqual(self.router.db_for_read(Book), 'default')
+
+    def test_write_sets_the_pin_cookie_for_the_next_request(self, is_healthy):
+        reads = []
+
+        def view(request):
+            if request.method == 'POST':
+                self.router.db_for_write(Book)
+            reads.append(self.router.db_for_read(Book))
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(view)
+        factory = RequestFactory()
+        response = middleware(factory.post('/'))
+        cookie = response.cookies[settings.REPLICA_PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], settings.REPLICA_PIN_SECONDS)
+        pinned = factory.get('/')
+        pinned.COOKIES[settings.REPLICA_PIN_COOKIE] = cookie.value
+        middleware(pinned)
+        middleware(factory.get('/'))
+        self.assertEqual(reads, ['default', 'default', 'replica'])
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        caches['default'].delete(search.CORPUS_STATS_CACHE_KEY)
+
+    def make_books(self, *titles, **fields):
+        with self.captureOnCommitCallbacks(execute=True):  # Index them
+            return [make_book(title, **fields) for title in titles]
+
+    def test_title_match_outranks_description_match(self):
+        mentioned, titled = self.make_books('Sandworms', 'Dune Messiah')
+        mentioned.description = 'A sequel to Dune.'
+        with self.captureOnCommitCallbacks(execute=True):
+            mentioned.save()
+        self.assertEqual(search.search_books('dune'), [titled.pk, mentioned.pk])
+
+    def test_every_term_must_match(self):
+        self.make_books('Harry Potter', 'Dune')
+        self.assertEqual(search.search_books('harry dune'), [])
+
+    def test_last_term_matches_as_prefix(self):
+        potter, = self.make_books('Harry Potter')
+        self.assertEqual(search.search_books('harry pot'), [potter.pk])
+        self.assertEqual(search.search_books('harry pot '), [])  # A finished word matches whole
+
+    @mock.patch.object(search, 'MAX_PREFIX_EXPANSIONS', 2)
+    def test_expansion_cap_keeps_terms_of_matching_books(self):
+        # Alphabetically, potage and potash come before potter and would fill the cap
+        self.make_books('Potage', 'Potash')
+        potter, = self.make_books('Harry Potter')
+        self.assertEqual(list(search.prefix_expansions('pot', ['harry'])), ['potter'])
+        self.assertEqual(search.search_books('harry pot'), [potter.pk])
+
+    @mock.patch.object(search, 'MAX_PREFIX_EXPANSIONS', 2)
+    def test_expansion_cap_drops_the_rarest_terms(self):
+        self.make_books('Potage', 'Potash', 'Potter', 'Potter Returns', 'Potter Again')
+        self.assertEqual(list(search.prefix_expansions('pot')), ['potter', 'potage'])
+
+
+class ExecutorDrainTests(SimpleTestCase):
+    @override_settings(RECOMMENDATION_WORKERS=4)
+    def test_drain_waits_for_every_worker(self):
+        recommendations.drain()
+        done = []
+        for _ in range(8):
+            recommendations.executor().submit(lambda: (time.sleep(0.05), done.append(1)))
+        recommendations.drain()
+        self.assertEqual(len(done), 8)
+
+
+class ImportRecordTests(TestCase):
+    record = {'title': 'Dune', 'author': 'Frank Herbert', 'published_date': '1965-08-01'}
+
+    def test_missing_copies_default_to_one(self):
+        self.assertEqual(parse_record(self.record)[0].number_of_copies, 1)
+        self.assertEqual(parse_record({**self.record, 'number_of_copies': ''})[0].number_of_copies, 1)
+
+    def test_zero_copies_are_kept(self):
+        self.assertEqual(parse_record({**self.record, 'number_of_copies': 0})[0].number_of_copies, 0)
+        self.assertEqual(parse_record({**self.record, 'number_of_copies': '0'})[0].number_of_copies, 0)
+
+    def test_negative_copies_are_rejected(self):
+        with self.assertRaises(ValueError):
+            parse_record({**self.record, 'number_of_copies': -1})
+
+
+class PasswordResetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='reader@example.com', password='old')
+
+    def request_token(self):
+        response = self.client.post('/api/password-reset-request/', {'email': self.user.email},
+                                    content_type='application/json')
+        return response.json()['token']
+
+    def confirm(self, token, uid=None, password='new'):
+        return self.client.post('/api/password-reset-confirm/', {
+            'token': token, 'uid': uid or self.user.pk, 'new_password': password,
+        }, content_type='application/json')
+
+    def test_token_resets_once(self):
+        token = self.request_token()
+        self.assertEqual(self.confirm(token).status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('new'))
+        response = self.confirm(token, password='replayed')
+        self.assertEqual(response.status_code, 400)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('new'))
+
+    def test_expired_token(self):
+        token = self.request_token()
+        PasswordResetToken.objects.update(expires_at=timezone.now())
+        self.assertEqual(self.confirm(token).json()['error'], 'Token has expired')
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('old'))
+
+    def test_other_users_token(self):
+        other = User.objects.create_user(email='other@example.com', password='other')
+        token = self.request_token()
+        self.assertEqual(self.confirm(token, uid=other.pk).status_code, 400)
+        self.assertEqual(self.confirm(token, uid='abc').status_code, 400)
+        # A rejected attempt does not use the token up
+        self.assertEqual(self.confirm(token).status_code, 200)
+
+    def test_cache_store_consumes_once(self):
+        store = CacheResetTokenStore(alias='default')
+        token = store.issue(self.user)
+        with self.assertRaises(ResetTokenError):
+            store.consume(token, self.user.pk + 1)
+        store.consume(token, self.user.pk)
+        with self.assertRaises(ResetTokenError):
+            store.consume(token, self.user.pk)
+
+
+class PasswordResetConcurrencyTests(TransactionTestCase):
+    def test_concurrent_confirms_use_the_token_once(self):
+        user = User.objects.create_user(email='reader@example.com')
+        token = DatabaseResetTokenStore().issue(user)
+        barrier = threading.Barrier(6)
+        outcomes = []
+
+        def confirm():
+            try:
+                barrier.wait()
+                DatabaseResetTokenStore().consume(token, user.pk)
+                outcomes.append('ok')
+            except ResetTokenError:
+                outcomes.append('rejected')
+            finally:
+                close_old_connections()
+
+        threads = [threading.Thread(target=confirm) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(outcomes), ['ok'] + ['rejected'] * 5)
@@ -0,0 +1,122 @@
+"""
+Cover thumbnail renditions.
+
+Every uploaded cover is resized to COVER_RENDITION_WIDTHS and re-encoded as
+WebP and JPEG. The work runs on a small background thread pool after the
+upload transaction commits, so admin requests never wait for Pillow.
+"""
+import hashlib
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+from .models import COVER_RENDITION_FORMATS, COVER_RENDITION_WIDTHS, BookCover, BookCoverRendition
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPES = {'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+QUALITY = 80
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def render(data, width, fmt):
+    """Resize image bytes to at most ``width`` px wide and encode them as ``fmt``"""
+    with Image.open(io.BytesIO(data)) as source:
+        image = ImageOps.exif_transpose(source)
+        if image.width > width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.Resampling.LANCZOS)
+        if fmt == 'jpeg' and image.mode != 'RGB':
+            # JPEG has no alpha channel: flatten onto white
+            background = Image.new('RGB', image.size, 'white')
+            rgba = image.convert('RGBA')
+            background.paste(rgba, mask=rgba.getchannel('A'))
+            image = background
+        elif image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA')
+        output = io.BytesIO()
+        image.save(output, format=fmt.upper(), quality=QUALITY, optimize=True)
+        return output.getvalue()
+
+
+def render_all(data):
+    """Every (width, format, bytes) rendition of a cover; safe to call in a worker process"""
+    return [
+        (width, fmt, render(data, width, fmt))
+        for width in COVER_RENDITION_WIDTHS
+        for fmt in COVER_RENDITION_FORMATS
+    ]
+
+
+def generate_renditions(book_id):
+    """Render every missing or stale rendition of a book's cover. Returns how many were written."""
+    cover = BookCover.objects.filter(book_id=book_id).values('etag', 'data').first()
+    if cover is None:
+        return 0
+    data, source_etag = bytes(cover['data']), cover['etag']
+    current = set(
+        BookCoverRendition.objects.filter(book_id=book_id, source_etag=source_etag)
+        .values_list('width', 'format')
+    )
+    written = 0
+    for width in COVER_RENDITION_WIDTHS:
+        for fmt in COVER_RENDITION_FORMATS:
+            if (width, fmt) in current:
+                continue
+            rendered = render(data, width, fmt)
+            BookCoverRendition.objects.update_or_create(
+                book_id=book_id,
+                width=width,
+                format=fmt,
+                defaults={
+                    'source_etag': source_etag,
+                    'data': rendered,
+                    'content_type': CONTENT_TYPES[fmt],
+                    'etag': hashlib.sha256(rendered).hexdigest(),
+                    'size': len(rendered),
+                },
+            )
+            written += 1
+    return written
+
+
+def _run(book_id):
+    close_old_connections()
+    try:
+        generate_renditions(book_id)
+    except Exception:
+        logger.exception('Failed to generate cover renditions for book %s', book_id)
+    finally:
+        close_old_connections()
+
+
+def executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'COVER_RENDITION_WORKERS', 2),
+                thread_name_prefix='cover-renditions',
+            )
+        return _executor
+
+
+def drain():
+    """Wait for every queued rendition job to finish; the next executor() call starts a new pool"""
+    global _executor
+    with _executor_lock:
+        pool, _executor = _executor, None
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+
+def schedule_renditions(book_id):
+    """Queue rendition generation for after the current transaction commits"""
+    transaction.on_commit(lambda: executor().submit(_run, book_id))
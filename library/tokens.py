@@ -0,0 +1,147 @@
+"""
+Password reset token stores.
+
+Tokens are random strings handed to the user; stores only ever keep their
+SHA-256 hash, keyed for O(1) lookup. Both stores are shared between worker
+processes, so a reset confirmed on any worker finds the token issued on
+another. Pick one with PASSWORD_RESET_TOKEN_STORE.
+"""
+import hashlib
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import PasswordResetToken
+
+
+class ResetTokenError(Exception):
+    pass
+
+
+def hash_token(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class BaseResetTokenStore:
+    def __init__(self, ttl=None):
+        self.ttl = ttl or getattr(settings, 'PASSWORD_RESET_TOKEN_TTL', 24 * 60 * 60)
+
+    def issue(self, user):
+        """Create and store a new token for user and return it"""
+        raise NotImplementedError
+
+    def verify(self, token, user_id):
+        """Raise ResetTokenError unless token is live and belongs to user_id"""
+        raise NotImplementedError
+
+    def discard(self, token):
+        raise NotImplementedError
+
+    def consume(self, token, user_id):
+        """
+        Use up token for user_id: like verify(), but when several requests
+        consume the same token at once, only one of them succeeds
+        """
+        raise NotImplementedError
+
+    def sweep(self):
+        """Delete expired tokens; returns how many were removed"""
+        return 0
+
+
+class DatabaseResetTokenStore(BaseResetTokenStore):
+    """
+    Tokens live in the PasswordResetToken table. verify() rejects expired
+    rows, so the reset request path never deletes them; run the
+    sweep_reset_tokens command periodically to remove them in batches.
+    """
+    sweep_batch_size = 1000
+
+    def issue(self, user):
+        token = secrets.token_urlsafe(32)
+        PasswordResetToken.objects.create(
+            token_hash=hash_token(token),
+            user=user,
+            expires_at=timezone.now() + timedelta(seconds=self.ttl),
+        )
+        return token
+
+    def verify(self, token, user_id):
+        record = PasswordResetToken.objects.filter(token_hash=hash_token(token)).first()
+        if record is None:
+            raise ResetTokenError('Invalid or expired token')
+        if record.expires_at <= timezone.now():
+            record.delete()
+            raise ResetTokenError('Token has expired')
+        if str(record.user_id) != str(user_id):
+            raise ResetTokenError('Invalid user ID')
+
+    def discard(self, token):
+        PasswordResetToken.objects.filter(token_hash=hash_token(token)).delete()
+
+    def consume(self, token, user_id):
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            raise ResetTokenError('Invalid user ID')
+        # The DELETE is the check: of concurrent requests, only one removes the row
+        deleted, _ = PasswordResetToken.objects.filter(
+            token_hash=hash_token(token), user_id=user_id, expires_at__gt=timezone.now()
+        ).delete()
+        if not deleted:
+            self.verify(token, user_id)  # Raises with the reason
+            raise ResetTokenError('Invalid or expired token')
+
+    def sweep(self):
+        removed = 0
+        expired = PasswordResetToken.objects.filter(expires_at__lte=timezone.now())
+        while True:
+            batch = list(expired.values_list('pk', flat=True)[:self.sweep_batch_size])
+            if not batch:
+                return removed
+            removed += PasswordResetToken.objects.filter(pk__in=batch).delete()[0]
+
+
+class CacheResetTokenStore(BaseResetTokenStore):
+    """
+    Tokens live in a Django cache (use a shared backend such as Redis or
+    memcached with several workers). The cache's own TTL expires them.
+    """
+    def __init__(self, ttl=None, alias='default'):
+        super().__init__(ttl)
+        self.alias = getattr(settings, 'PASSWORD_RESET_TOKEN_CACHE', alias)
+
+    def _key(self, token):
+        return f'library:password-reset:{hash_token(token)}'
+
+    def issue(self, user):
+        token = secrets.token_urlsafe(32)
+        caches[self.alias].set(self._key(token), user.pk, self.ttl)
+        return token
+
+    def verify(self, token, user_id):
+        stored_user_id = caches[self.alias].get(self._key(token))
+        if stored_user_id is None:
+            raise ResetTokenError('Invalid or expired token')
+        if str(stored_user_id) != str(user_id):
+            raise ResetTokenError('Invalid user ID')
+
+    def discard(self, token):
+        caches[self.alias].delete(self._key(token))
+
+    def consume(self, token, user_id):
+        self.verify(token, user_id)
+        # delete() reports whether the key was still there, so only one request wins
+        if not caches[self.alias].delete(self._key(token)):
+            raise ResetTokenError('Invalid or expired token')
+
+
+def get_token_store():
+    store_class = import_string(
+        getattr(settings, 'PASSWORD_RESET_TOKEN_STORE', 'library.tokens.DatabaseResetTokenStore')
+    )
+    return store_class()
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
@@ -5,10 +6,12 @@ from .views import (
     UserListCreateView, UserDetailView, AdminUserViewSet,
     AdminBookViewSet, CategoryViewSet, borrowed_books_page, 
     favorite_books_page, PasswordResetRequestView, PasswordResetConfirmView,
-    user_page, admin_page, search_results_page, index, SearchView
+    user_page, admin_page, search_results_page, index, SearchView, book_cover,
+    BookCacheStatsView, BulkBorrowedBookView, ExportView, SearchFacetView,
+    SuggestView, LoanHistoryView, LoanReportView, AdminStatsView
 )
 from django.contrib import admin
-from .views import CurrentUserView
+from .views import CurrentUserView, RecommendationView
 
 from .views import LogoutView  # add at top
 
@@ -28,16 +31,28 @@ urlpatterns = [
     
     # Search endpoint
     path('api/search/', SearchView.as_view(), name='search'),
+    path('api/search/facets/', SearchFacetView.as_view(), name='search-facets'),
+    path('api/search/suggest/', SuggestView.as_view(), name='search-suggest'),
     
     # Password reset endpoints (from urlsA.py)
     path('api/password-reset-request/', PasswordResetRequestView.as_view(), name='password-reset-request'),
     path('api/password-reset-confirm/', PasswordResetConfirmView.as_view(), name='password-reset-confirm'),
 
+    # Book covers are served as raw image bytes, outside the DRF router
+    path('api/books/<int:pk>/cover/', book_cover, name='book-cover'),
+
+    path('api/admin/book-cache/', BookCacheStatsView.as_view(), name='book-cache-stats'),
+    path('api/admin/stats/', AdminStatsView.as_view(), name='admin-stats'),
+    path('api/admin/loan-report/', LoanReportView.as_view(), name='admin-loan-report'),
+    path('api/admin/export/<str:dataset>.<str:fmt>', ExportView.as_view(), name='admin-export'),
+
     # API routes
     path('api/', include(router.urls)),
     path('api/users/', UserListCreateView.as_view(), name='user-list'),
     path('api/users/<int:pk>/', UserDetailView.as_view(), name='user-detail'),
     path('api/borrowed-books/', BorrowedBookView.as_view(), name='api-borrowed-books'),
+    path('api/borrowed-books/bulk/', BulkBorrowedBookView.as_view(), name='api-borrowed-books-bulk'),
+    path('api/borrowed-books/history/', LoanHistoryView.as_view(), name='api-borrowed-books-history'),
 
     # Favorite books routes with delete by book_id in URL
     path('api/favorite-books/', FavoriteBookView.as_view(), name='api-favorite-books'),
@@ -53,7 +68,13 @@ urlpatterns = [
     path('search/', search_results_page, name='search-results'),
 
     path('api/user/me/', CurrentUserView.as_view(), name='current-user'),
+    path('api/user/me/recommendations/', RecommendationView.as_view(), name='user-recommendations'),
 
     # Add this to urlpatterns
     path('api/logout/', LogoutView.as_view(), name='logout'),
-]
\ No newline at end of file
+]
+
+if settings.ASYNC_READ_VIEWS:
+    # ASGI deployments: serve the hot read paths from native async views
+    from .async_views import async_urlpatterns
+    urlpatterns = async_urlpatterns + urlpatterns
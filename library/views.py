@@ -1,8 +1,11 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model, authenticate, login
-from django.db import IntegrityError
-from django.http import JsonResponse
+from django.db import IntegrityError, transaction
+from django.http import Http404, HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
 from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.views.decorators.http import require_safe
 
 
 from rest_framework import viewsets, generics, status
@@ -10,26 +13,34 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
 from rest_framework.decorators import action
+from rest_framework.exceptions import ParseError
 
-from .models import Book, BorrowedBook, FavoriteBook, Category
+from .models import (
+    COVER_RENDITION_FORMATS, COVER_RENDITION_WIDTHS,
+    Book, BookCover, BookCoverRendition, BorrowedBook, FavoriteBook, Category
+)
 from .serializers import (
     BookSerializer, BorrowedBookSerializer,
     FavoriteBookSerializer, UserSerializer,
-    AdminBookSerializer, AdminUserSerializer, CategorySerializer
+    AdminBookSerializer, AdminUserSerializer, CategorySerializer, LoanEventSerializer
 )
 from .permissions import IsCustomAdmin
+from .pagination import HistoryPagination, KeysetPagination, RankedPagination
+from .search import search_books
+from .suggest import suggester
+from .cache import book_cache
+from .conditional import ConditionalGetMixin
+from . import circulation, exports, facets, loan_history, recommendations, stats, suggest
+from .tokens import ResetTokenError, get_token_store
+from .authentication import issue_token
+from .circulation import CirculationError
 
-import uuid
 import datetime
 import re
-from django.db import models
 
 
 User = get_user_model()
 
-# Password reset tokens storage
-password_reset_tokens = {}
-
 # added this
 from django.contrib.auth import logout
 
@@ -87,8 +98,6 @@ class LoginView(APIView):
         if not email or not password:
             return Response({'error': 'Email and password are required.'}, status=400)
 
-        print(email)
-        print(password)
         user = authenticate(request, email=email, password=password)
 
         if user is not None:
@@ -96,7 +105,9 @@ class LoginView(APIView):
             return Response({
                 'message': 'Login successful.',
                 'is_admin': user.is_admin,
-                'email': user.email
+                'email': user.email,
+                'token': issue_token(user),
+                'token_expires_in': settings.API_TOKEN_TTL,
             })
         else:
             return Response({'error': 'Invalid email or password.'}, status=401)
@@ -113,14 +124,8 @@ class PasswordResetRequestView(APIView):
         try:
             user = User.objects.get(email=email)
             
-            # Generate a unique token
-            token = str(uuid.uuid4())
-            
-            # Store the token with user ID and expiration (24 hours)
-            password_reset_tokens[token] = {
-                'user_id': user.id,
-                'expires': datetime.datetime.now() + datetime.timedelta(hours=24)
-            }
+            # Generate and store a token (see PASSWORD_RESET_TOKEN_STORE)
+            token = get_token_store().issue(user)
             
             return Response({
                 'message': 'Password reset instructions sent',
@@ -144,126 +149,318 @@ class PasswordResetConfirmView(APIView):
         if not token or not uid or not new_password:
             return Response({'error': 'Token, user ID, and new password are required'}, status=400)
             
-        # Check if token exists and is valid
-        if token not in password_reset_tokens:
-            return Response({'error': 'Invalid or expired token'}, status=400)
-            
-        token_data = password_reset_tokens[token]
-        
-        # Check if token is expired
-        if datetime.datetime.now() > token_data['expires']:
-            del password_reset_tokens[token]
-            return Response({'error': 'Token has expired'}, status=400)
-            
-        # Check if user ID matches
-        if str(token_data['user_id']) != str(uid):
-            return Response({'error': 'Invalid user ID'}, status=400)
-            
         try:
-            user = User.objects.get(id=uid)
-            user.set_password(new_password)
-            user.save()
-            
-            # Remove the used token
-            del password_reset_tokens[token]
-            
+            with transaction.atomic():
+                # Use the token up first: of two confirms with the same token, only
+                # one gets past this line (a failure below restores a database token)
+                get_token_store().consume(token, uid)
+                user = User.objects.get(id=uid)
+                user.set_password(new_password)
+                user.save()
+
             return Response({'message': 'Password has been reset successfully'})
-            
+
+        except ResetTokenError as e:
+            return Response({'error': str(e)}, status=400)
         except User.DoesNotExist:
             return Response({'error': 'User not found'}, status=404)
         except Exception as e:
             return Response({'error': f'Failed to reset password: {str(e)}'}, status=500)
 
-class BookViewSet(viewsets.ModelViewSet):
-    queryset = Book.objects.all()
+def category_filter(request):
+    """Category ids from ?category=<id>[,<id>...], or None when absent"""
+    value = request.query_params.get('category')
+    if not value:
+        return None
+    try:
+        return facets.parse_category_ids(value)
+    except ValueError:
+        raise ParseError('category must be a comma-separated list of category IDs.')
+
+
+def is_book_id(value):
+    """JSON integers only: booleans are ints in Python, and int() would truncate 1.5 or parse '1'"""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def book_filter(request, queryset):
+    """Narrow a user's loans or favorites to ?book=<id>, so a book page needs a single row"""
+    value = request.query_params.get('book')
+    if value is None:
+        return queryset
+    try:
+        return queryset.filter(book_id=int(value))
+    except ValueError:
+        raise ParseError('book must be a book ID.')
+
+
+def facet_response(category_ids, book_ids=None):
+    """
+    Per-category counts for a result set: the ranked search hits in book_ids,
+    else the books in category_ids, else the whole catalog.
+    """
+    if book_ids is not None:
+        categories = facets.for_books(book_ids)
+    elif category_ids:
+        categories = facets.for_books(facets.filter_books(Book.objects.all(), category_ids))
+    else:
+        categories = facets.catalog()
+    return Response({'categories': categories})
+
+
+def recommendation_response(request, books, missing=None):
+    """Up to ?limit= books (default 10) with their similarity; 404 if empty and missing() says so"""
+    try:
+        limit = min(max(int(request.query_params.get('limit', 10)), 1), settings.RECOMMENDATION_NEIGHBOURS)
+    except ValueError:
+        return Response({'error': 'limit must be an integer'}, status=400)
+    page = list(books[:limit])
+    if not page and missing is not None and missing():
+        raise Http404
+    data = BookSerializer(page, many=True, context={'request': request}).data
+    return Response({
+        'results': [{**book, 'similarity': round(obj.similarity, 4)} for obj, book in zip(page, data)]
+    })
+
+
+def history_response(request, view, events):
+    """One newest-first page of loan events"""
+    events = events.select_related('book').only('kind', 'ts', 'user_id', 'book__title')
+    paginator = HistoryPagination()
+    page = paginator.paginate_queryset(events, request, view=view)
+    return paginator.get_paginated_response(LoanEventSerializer(page, many=True).data)
+
+
+def report_period(request, days=30):
+    """(start, end) dates from ?start= and ?end=, by default the last `days` days up to today"""
+    def date_param(name, default):
+        value = request.query_params.get(name)
+        if not value:
+            return default
+        try:
+            day = parse_date(value)
+        except ValueError:
+            day = None
+        if day is None:
+            raise ParseError(f'{name} must be a YYYY-MM-DD date.')
+        return day
+
+    end = date_param('end', timezone.localdate())
+    start = date_param('start', end - datetime.timedelta(days=days - 1))
+    if start > end:
+        raise ParseError('start must not be after end.')
+    return start, end
+
+
+class BookViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    queryset = Book.objects.prefetch_related('categories')
     serializer_class = BookSerializer
     #permission_classes = [AllowAny]
     permission_classes = [IsAuthenticated]
+    # Borrow/return bump updated_at too, but two can land on the same timestamp
+    validator_fields = ('id', 'updated_at', 'active_loans')
+
+    def get_queryset(self):
+        return self.get_serializer_class().sparse_queryset(super().get_queryset(), self.request)
+
+    def filter_queryset(self, queryset):
+        category_ids = category_filter(self.request)
+        if category_ids:
+            queryset = facets.filter_books(queryset, category_ids)
+        return queryset
 
     @action(detail=False, methods=['get'], url_path='available')
     def available_books(self, request):
-        available_books = Book.objects.all()
-        available_books = [book for book in available_books if book.is_available()]
-        serializer = self.get_serializer(available_books, many=True)
-        return Response(serializer.data)
+        return self.conditional_page(self.filter_queryset(self.get_queryset()).available())
+
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        """Readers who liked this book also liked: its precomputed neighbours, best first"""
+        books = recommendations.similar_books(pk, self.get_queryset())
+        return recommendation_response(request, books, missing=lambda: not Book.objects.filter(pk=pk).exists())
+
+    @action(detail=False, methods=['get'], url_path='facets')
+    def category_facets(self, request):
+        """Book and available counts per category for the list filtered by ?category="""
+        return facet_response(category_filter(request))
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class BookCacheStatsView(APIView):
+    permission_classes = [IsCustomAdmin]
+
+    def get(self, request):
+        return Response(book_cache.stats())
+
+    def delete(self, request):
+        book_cache.reset_stats()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class AdminStatsView(APIView):
+    """Catalog, user and circulation totals for the admin dashboard (see library.stats)"""
+    permission_classes = [IsCustomAdmin]
+
+    def get(self, request):
+        return Response(stats.dashboard())
+
+
+class LoanReportView(APIView):
+    """Most borrowed books and per-category loan counts for ?start=..&end=, read from the daily rollups"""
+    permission_classes = [IsCustomAdmin]
+
+    def get(self, request):
+        start, end = report_period(request)
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 100)
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=400)
+        books = loan_history.popular_books(start, end, limit).values('id', 'title', 'author', 'loans')
+        return Response({
+            'start': start,
+            'end': end,
+            'books': list(books),
+            'categories': loan_history.category_usage(start, end),
+        })
+
+class ExportView(APIView):
+    """Stream a whole table as CSV or JSONL, gzipped unless ?compress=0 (see library.exports)"""
+    permission_classes = [IsCustomAdmin]
+
+    def get(self, request, dataset, fmt):
+        if dataset not in exports.EXPORTS or fmt not in exports.FORMATS:
+            raise Http404
+        since = request.query_params.get('since')
+        if since:
+            try:
+                since = exports.parse_since(since)
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        compress = request.query_params.get('compress', '1') != '0'
+
+        filename = f'{dataset}.{fmt}'
+        response = StreamingHttpResponse(
+            exports.stream(dataset, fmt, since=since or None, compress=compress),
+            content_type='application/gzip' if compress else exports.FORMATS[fmt],
+        )
+        if compress:
+            filename += '.gz'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+class CategoryViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [IsCustomAdmin]
+    # The facet counters move without touching updated_at
+    validator_fields = ('id', 'updated_at', 'book_count', 'available_book_count')
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        # ?name= lets a category page find its category without listing them all
+        name = self.request.query_params.get('name')
+        if name and self.action == 'list':
+            queryset = queryset.filter(name__iexact=name)
+        return queryset
 
 class BorrowedBookView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        borrowed_books = BorrowedBook.objects.filter(user=request.user)
-        serializer = BorrowedBookSerializer(borrowed_books, many=True)
-        return Response(serializer.data)
+        borrowed_books = BorrowedBookSerializer.sparse_queryset(
+            book_filter(request, BorrowedBook.objects.filter(user=request.user)).select_related('book'), request
+        )
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(borrowed_books, request, view=self)
+        serializer = BorrowedBookSerializer(page, many=True, context={'request': request})
+        return paginator.get_paginated_response(serializer.data)
 
     def post(self, request):
-        user = request.user
         book_id = request.data.get('book')
 
         if not book_id:
             return Response({'error': 'Book ID is required.'}, status=status.HTTP_400_BAD_REQUEST)
-
-        # Check user's borrow limit
-        if BorrowedBook.objects.filter(user=user, returned=False).count() >= 6:
-            return Response({'error': 'Borrow limit reached. Return some books first.'}, status=400)
-
-        try:
-            book = Book.objects.get(id=book_id)
-        except Book.DoesNotExist:
-            return Response({'error': 'Book not found.'}, status=404)
-
-        # Check available copies
-        if book.available_copies() <= 0:
-            return Response({'error': 'No copies available for this book.'}, status=400)
+        if not is_book_id(book_id):
+            return Response({'error': 'Book ID must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            borrowed_book = BorrowedBook.objects.get(user=user, book=book)
-            if borrowed_book.returned:
-                borrowed_book.returned = False
-                borrowed_book.return_date = None
-                borrowed_book.borrow_date = timezone.now().date()
-                borrowed_book.save()
-                # Don't decrease copies here - it will be handled in the serializer
-            else:
-                return Response({'error': 'You already borrowed this book.'}, status=400)
-        except BorrowedBook.DoesNotExist:
-            borrowed_book = BorrowedBook(user=user, book=book)
-            borrowed_book.save()
-            # Don't decrease copies here - it will be handled in the serializer
+            borrowed_book = circulation.borrow_book(request.user, book_id)
+        except CirculationError as e:
+            return Response({'error': e.message}, status=e.status)
 
-        serializer = BorrowedBookSerializer(borrowed_book)
+        serializer = BorrowedBookSerializer(borrowed_book, context={'request': request})
         return Response(serializer.data, status=200)
     
     def patch(self, request):
         book_id = request.data.get("book_id")
         if not book_id:
             return Response({"error": "book_id is required."}, status=400)
+        if not is_book_id(book_id):
+            return Response({"error": "book_id must be an integer."}, status=400)
 
         try:
-            borrowed_book = BorrowedBook.objects.get(user=request.user, book_id=book_id, returned=False)
-            borrowed_book.returned = True
-            borrowed_book.return_date = timezone.now().date()
-            borrowed_book.save()
-            # Don't increase copies here - it will be handled in the serializer
+            borrowed_book = circulation.return_book(request.user, book_id)
+        except CirculationError as e:
+            return Response({"error": e.message}, status=e.status)
+
+        serializer = BorrowedBookSerializer(borrowed_book, context={'request': request})
+        return Response(serializer.data, status=200)
+
 
-            serializer = BorrowedBookSerializer(borrowed_book)
-            return Response(serializer.data, status=200)
+class LoanHistoryView(APIView):
+    """The user's borrows and returns, newest first, including loans reopened since"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return history_response(request, self, loan_history.user_history(request.user))
+
+
+class BulkBorrowedBookView(APIView):
+    """Borrow (POST {"books": [...]}) or return (PATCH {"book_ids": [...]}) several books at once"""
+    permission_classes = [IsAuthenticated]
+    max_batch_size = 50
+
+    def _book_ids(self, request, field):
+        book_ids = request.data.get(field)
+        if not isinstance(book_ids, list) or not book_ids:
+            return None, Response({'error': f'{field} must be a non-empty list of book IDs.'}, status=400)
+        if len(book_ids) > self.max_batch_size:
+            return None, Response({'error': f'At most {self.max_batch_size} books per request.'}, status=400)
+        if not all(is_book_id(book_id) for book_id in book_ids):
+            return None, Response({'error': f'{field} must contain integer book IDs.'}, status=400)
+        return book_ids, None
+
+    def _respond(self, request, outcomes):
+        results = []
+        for book_id, outcome in outcomes.items():
+            if isinstance(outcome, CirculationError):
+                results.append({'book_id': book_id, 'success': False, 'error': outcome.message, 'status': outcome.status})
+            else:
+                loan = BorrowedBookSerializer(outcome, context={'request': request}).data
+                results.append({'book_id': book_id, 'success': True, 'loan': loan})
+        return Response({'results': results}, status=200)
+
+    def post(self, request):
+        book_ids, error = self._book_ids(request, 'books')
+        if error:
+            return error
+        return self._respond(request, circulation.borrow_books(request.user, book_ids))
 
-        except BorrowedBook.DoesNotExist:
-            return Response({"error": "No borrowed book found to return."}, status=404)
+    def patch(self, request):
+        book_ids, error = self._book_ids(request, 'book_ids')
+        if error:
+            return error
+        return self._respond(request, circulation.return_books(request.user, book_ids))
 
 
 class FavoriteBookView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        favorite_books = FavoriteBook.objects.filter(user=request.user)
-        serializer = FavoriteBookSerializer(favorite_books, many=True)
-        return Response(serializer.data)
+        favorite_books = FavoriteBookSerializer.sparse_queryset(
+            book_filter(request, FavoriteBook.objects.filter(user=request.user)).select_related('book'), request
+        )
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(favorite_books, request, view=self)
+        serializer = FavoriteBookSerializer(page, many=True, context={'request': request})
+        return paginator.get_paginated_response(serializer.data)
 
     def post(self, request):
         serializer = FavoriteBookSerializer(data=request.data, context={'request': request})
@@ -300,10 +497,13 @@ class AdminUserViewSet(viewsets.ModelViewSet):
     permission_classes = [IsCustomAdmin]
 
 class AdminBookViewSet(viewsets.ModelViewSet):
-    queryset = Book.objects.all()
+    queryset = Book.objects.prefetch_related('categories')
     serializer_class = AdminBookSerializer
     permission_classes = [IsCustomAdmin]
 
+    def get_queryset(self):
+        return AdminBookSerializer.sparse_queryset(super().get_queryset(), self.request)
+
     def perform_create(self, serializer):
         serializer.save(added_by=self.request.user)
 
@@ -315,6 +515,11 @@ class AdminBookViewSet(viewsets.ModelViewSet):
             )
         return super().update(request,*args, **kwargs)
 
+    @action(detail=True, methods=['get'], url_path='loan-history')
+    def loan_history(self, request, pk=None):
+        book = self.get_object()
+        return history_response(request, self, loan_history.book_history(book.pk))
+
     def destroy(self, request, pk=None, *args, **kwargs):
         try:
             book = self.get_object()
@@ -371,24 +576,144 @@ class SearchView(APIView):
         if not query:
             return Response({'error': 'Search query is required'}, status=400)
 
-        # Search in books (title and author)
-        books = Book.objects.filter(
-            models.Q(title__icontains=query) | 
-            models.Q(author__icontains=query)
-        )
+        # Rank matching books from the inverted index, then load one page of them
+        ranked_ids = search_in_categories(query, category_filter(request))
+        paginator = RankedPagination()
+        page_ids = paginator.paginate_list(ranked_ids, request)
+        books = Book.objects.prefetch_related('categories').in_bulk(page_ids)
+        page = [books[book_id] for book_id in page_ids if book_id in books]
+
+        serializer = BookSerializer(page, many=True, context={'request': request})
+        return paginator.get_paginated_response(serializer.data)
+    
+
+class SuggestView(APIView):
+    """Typeahead: ?q=<prefix>[&limit=n] -> the most popular matching titles, authors and categories"""
+    permission_classes = [AllowAny]
+    authentication_classes = []  # Same answer for everyone; skip the session lookup on every keystroke
+
+    def get(self, request):
+        try:
+            limit = min(int(request.query_params.get('limit', suggest.DEFAULT_LIMIT)), suggest.MAX_LIMIT)
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=400)
+        query = request.query_params.get('q', '')
+        return Response({'query': query, 'suggestions': suggester.suggest(query, max(limit, 1))})
 
-        # Search in categories
-        category_books = Book.objects.filter(
-            categories__name__icontains=query
+
+class SearchFacetView(APIView):
+    """Per-category counts for the hits of a SearchView query (same ?q= and ?category=)"""
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'Search query is required'}, status=400)
+        category_ids = category_filter(request)
+        return facet_response(category_ids, search_in_categories(query, category_ids))
+
+
+def search_in_categories(query, category_ids):
+    """Ranked search hits, narrowed to books in any of category_ids if given"""
+    ranked_ids = search_books(query)
+    if category_ids and ranked_ids:
+        matching = set(
+            facets.filter_books(Book.objects.filter(pk__in=ranked_ids), category_ids).values_list('pk', flat=True)
         )
+        ranked_ids = [book_id for book_id in ranked_ids if book_id in matching]
+    return ranked_ids
 
-        # Combine and remove duplicates
-        all_books = (books | category_books).distinct()
 
-        # Serialize the results
-        serializer = BookSerializer(all_books, many=True)
-        return Response(serializer.data)
-    
+COVER_IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+COVER_REVALIDATE_CACHE_CONTROL = 'public, max-age=0, must-revalidate'
+
+
+def _parse_byte_range(header, size):
+    """
+    Parse a single-range ``Range: bytes=...`` header.
+    Returns (start, end) inclusive, None to ignore the header, or False if unsatisfiable.
+    """
+    match = re.fullmatch(r'\s*bytes=(\d*)-(\d*)\s*', header)
+    if not match or match.group(1) == match.group(2) == '':
+        return None
+    first, last = match.groups()
+    if first == '':
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+@require_safe
+def book_cover(request, pk):
+    """
+    Serve a book cover blob with a strong ETag and byte-range support.
+    ?w=<width>&fmt=<webp|jpeg> selects a thumbnail rendition; until it has been
+    generated the original image is served. Versioned URLs (?v=<etag prefix>)
+    are cached as immutable.
+    """
+    images = BookCover.objects.filter(book_id=pk)
+    meta = images.values('etag', 'content_type', 'size').first()
+    if meta is None:
+        raise Http404('Book has no cover')
+    source_etag = meta['etag']
+
+    rendition_pending = False
+    width = request.GET.get('w')
+    if width is not None:
+        fmt = request.GET.get('fmt', 'jpeg')
+        if not width.isdigit() or int(width) not in COVER_RENDITION_WIDTHS or fmt not in COVER_RENDITION_FORMATS:
+            raise Http404('Unknown cover rendition')
+        renditions = BookCoverRendition.objects.filter(
+            book_id=pk, width=int(width), format=fmt, source_etag=source_etag
+        )
+        rendition = renditions.values('etag', 'content_type', 'size').first()
+        if rendition is None:
+            rendition_pending = True
+        else:
+            images, meta = renditions, rendition
+
+    etag = f'"{meta["etag"]}"'
+    version = request.GET.get('v')
+    if version and source_etag.startswith(version) and not rendition_pending:
+        cache_control = COVER_IMMUTABLE_CACHE_CONTROL
+    else:
+        cache_control = COVER_REVALIDATE_CACHE_CONTROL
+
+    if_none_match = request.headers.get('If-None-Match', '')
+    if etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*':
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        response['Cache-Control'] = cache_control
+        return response
+
+    size = meta['size']
+    byte_range = None
+    range_header = request.headers.get('Range')
+    if range_header and request.headers.get('If-Range', etag) == etag:
+        byte_range = _parse_byte_range(range_header, size)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    data = bytes(images.values_list('data', flat=True).get())
+    if byte_range:
+        start, end = byte_range
+        response = HttpResponse(data[start:end + 1], content_type=meta['content_type'], status=206)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    else:
+        response = HttpResponse(data, content_type=meta['content_type'])
+    response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
 
 class CurrentUserView(APIView):
     permission_classes = [IsAuthenticated]
@@ -398,4 +723,13 @@ class CurrentUserView(APIView):
         return Response(serializer.data)
 
 
+class RecommendationView(APIView):
+    """Books similar to the ones the user favorited or borrowed, excluding those"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        books = BookSerializer.sparse_queryset(Book.objects.prefetch_related('categories'), request)
+        return recommendation_response(request, recommendations.for_user(request.user, books))
+
+
 